@@ -0,0 +1,184 @@
+# analytics.py
+"""Multi-period trend analytics over service records.
+
+All records of a period are read in one columnar fetch (integers only:
+month key, service type, price, vehicle) into NumPy arrays, and every
+aggregate is a bincount over those arrays instead of a GROUP BY per metric.
+NumPy is already installed as a dependency of matplotlib.
+"""
+import itertools
+from datetime import date
+import numpy as np
+from database import get_connection, get_tip_usluge_list, attach_archive
+
+# Broj vozila / modela u top listama
+TOP_N = 10
+TREND_YEARS = 5
+
+# Kolone koje se citaju za svaki zapis; mesec je year * 12 + month - 1
+COLUMNS_SELECT = '''
+    SELECT CAST(substr(datum, 1, 4) AS INTEGER) * 12 + CAST(substr(datum, 6, 2) AS INTEGER) - 1,
+           tip_usluge_id, coalesce(cena, -1), coalesce(vehicle_id, 0)
+    FROM records
+    WHERE datum >= ? AND datum < ?
+'''
+COLUMN_COUNT = 4
+
+
+def trend_range(years=TREND_YEARS, today=None):
+    """Return the [start, end) date strings of the last years full years up to and including this month."""
+    today = today or date.today()
+    end = date(today.year + 1, 1, 1) if today.month == 12 else date(today.year, today.month + 1, 1)
+    start = date(end.year - years, end.month, 1)
+    return start.isoformat(), end.isoformat()
+
+
+def _month_key(value):
+    return int(value[:4]) * 12 + int(value[5:7]) - 1
+
+
+def _month_label(key):
+    return f'{key // 12:04d}-{key % 12 + 1:02d}'
+
+
+def fetch_columns(start, end):
+    """Fetch (month, tip_usluge_id, cena, vehicle_id) for every record in [start, end) as an (n, 4) int64 array.
+
+    cena is -1 where it is NULL and vehicle_id 0 where the record has no vehicle.
+    Archived records in the range are appended from the archive's columns.
+    """
+    conn = get_connection()
+    # ATTACH ne sme unutar transakcije
+    archive = attach_archive(conn)
+    with conn:
+        # Broj i redovi iz istog snimka baze, inace upis izmedju njih menja broj redova
+        conn.execute('BEGIN')
+        count = conn.execute('SELECT COUNT(*) FROM records WHERE datum >= ? AND datum < ?', (start, end)).fetchone()[0]
+        cursor = conn.execute(COLUMNS_SELECT, (start, end))
+        # Bez liste torki: vrednosti idu direktno iz kursora u niz
+        values = np.fromiter(itertools.chain.from_iterable(cursor), dtype=np.int64, count=count * COLUMN_COUNT)
+        columns = values.reshape(count, COLUMN_COUNT)
+        if archive is not None:
+            columns = np.concatenate((archive.fetch_columns(conn, start, end), columns))
+    return columns
+
+
+def _growth(current, previous):
+    """Relative change in percent; NaN where there is nothing to compare with."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(previous > 0, (current - previous) / previous * 100, np.nan)
+
+
+class Trends:
+    """Aggregates of one period; arrays are indexed by month, year or service type."""
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.months = []            # 'YYYY-MM' labels
+        self.years = []
+        self.record_count = 0
+        self.revenue = None         # prihod po mesecu
+        self.services = None        # broj servisa po mesecu
+        self.services_priced = None # broj servisa sa upisanom cenom po mesecu
+        self.average_ticket = None  # prosecna cena po mesecu (samo zapisi sa cenom)
+        self.revenue_growth = None  # % promene prihoda u odnosu na prethodni mesec
+        self.service_names = []
+        self.service_revenue = None  # [tip, godina]
+        self.service_growth = None   # % promene poslednjih 12 meseci prema prethodnih 12, po tipu
+        self.top_vehicles = []       # (broj_sasije, marka_model, broj servisa, prihod)
+        self.top_models = []         # (marka_model, broj servisa, prihod)
+
+    @property
+    def total_revenue(self):
+        return float(self.revenue.sum())
+
+    @property
+    def total_average_ticket(self):
+        priced = self.services_priced.sum()
+        return float(self.revenue.sum() / priced) if priced else 0.0
+
+
+def compute_trends(start, end, top_n=TOP_N):
+    """Compute month-over-month revenue, per-service growth, top vehicles/models and average ticket."""
+    columns = fetch_columns(start, end)
+    trends = Trends(start, end)
+    first_month = _month_key(start)
+    month_count = max(_month_key(end) - first_month, 1)
+    trends.months = [_month_label(first_month + offset) for offset in range(month_count)]
+    trends.years = sorted({int(label[:4]) for label in trends.months})
+    trends.record_count = len(columns)
+
+    month = columns[:, 0] - first_month
+    tip = columns[:, 1]
+    cena = columns[:, 2]
+    vehicle = columns[:, 3]
+    has_price = cena >= 0
+    price = np.where(has_price, cena, 0)
+
+    # Po mesecu
+    trends.revenue = np.bincount(month, weights=price, minlength=month_count)
+    trends.services = np.bincount(month, minlength=month_count)
+    trends.services_priced = np.bincount(month, weights=has_price, minlength=month_count)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        trends.average_ticket = np.where(trends.services_priced > 0, trends.revenue / trends.services_priced, 0.0)
+    trends.revenue_growth = np.concatenate(([np.nan], _growth(trends.revenue[1:], trends.revenue[:-1])))
+
+    # Po tipu usluge: matrica [tip, mesec], iz nje godine i rast
+    tipovi = sorted(get_tip_usluge_list(include_retired=True))
+    tip_index = np.full(max([row[0] for row in tipovi] + [int(tip.max()) if len(tip) else 0]) + 1, -1)
+    for position, (tip_id, _) in enumerate(tipovi):
+        tip_index[tip_id] = position
+    trends.service_names = [naziv for _, naziv in tipovi]
+    known = tip_index[tip] >= 0
+    cells = tip_index[tip[known]] * month_count + month[known]
+    service_month = np.bincount(cells, weights=price[known],
+                                minlength=len(tipovi) * month_count).reshape(len(tipovi), month_count)
+    month_year = np.array([int(label[:4]) for label in trends.months]) - trends.years[0]
+    trends.service_revenue = np.zeros((len(tipovi), len(trends.years)))
+    for year_index in range(len(trends.years)):
+        trends.service_revenue[:, year_index] = service_month[:, month_year == year_index].sum(axis=1)
+    # Poslednjih 12 meseci prema 12 pre njih, da nepotpuna godina ne izgleda kao pad
+    if month_count >= 24:
+        trends.service_growth = _growth(service_month[:, -12:].sum(axis=1), service_month[:, -24:-12].sum(axis=1))
+    else:
+        trends.service_growth = np.full(len(tipovi), np.nan)
+
+    # Top vozila i modeli
+    if len(vehicle):
+        vehicle_revenue = np.bincount(vehicle, weights=price)
+        vehicle_services = np.bincount(vehicle)
+        vehicle_revenue[0] = 0  # zapisi bez vozila
+        trends.top_vehicles, trends.top_models = _top_vehicles_and_models(vehicle_revenue, vehicle_services, top_n)
+    return trends
+
+
+def _top_vehicles_and_models(vehicle_revenue, vehicle_services, top_n):
+    conn = get_connection()
+    ids = np.flatnonzero(vehicle_services)
+    ids = ids[ids > 0]
+    if not len(ids):
+        return [], []
+
+    # Model svakog vozila kao celobrojni kod, pa zbir po kodu
+    model_codes = {}
+    rows = conn.execute('SELECT id, marka_model FROM vehicles WHERE id < ?', (len(vehicle_revenue),)).fetchall()
+    vehicle_model = np.full(len(vehicle_revenue), -1)
+    vehicle_model[np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))] = \
+        [model_codes.setdefault(marka_model, len(model_codes)) for _, marka_model in rows]
+    models = vehicle_model[ids]
+    valid = models >= 0
+    model_revenue = np.bincount(models[valid], weights=vehicle_revenue[ids][valid], minlength=len(model_codes))
+    model_services = np.bincount(models[valid], weights=vehicle_services[ids][valid], minlength=len(model_codes))
+    model_names = list(model_codes)
+    top_model_codes = np.argsort(model_revenue)[::-1][:top_n]
+    top_models = [(model_names[code], int(model_services[code]), float(model_revenue[code]))
+                  for code in top_model_codes if model_services[code]]
+
+    top_ids = ids[np.argsort(vehicle_revenue[ids])[::-1][:top_n]]
+    placeholders = ', '.join('?' * len(top_ids))
+    names = {row[0]: row[1:] for row in conn.execute(
+        f'SELECT id, broj_sasije, marka_model FROM vehicles WHERE id IN ({placeholders})', [int(i) for i in top_ids])}
+    top_vehicles = [names[int(i)] + (int(vehicle_services[i]), float(vehicle_revenue[i]))
+                    for i in top_ids if int(i) in names]
+    return top_vehicles, top_models
@@ -0,0 +1,362 @@
+# api_client.py
+"""Client mode: run the desktop app against server.py instead of a local file.
+
+Setting DPFPA_SERVER=http://host:8765 makes database.py call install() on
+import, which replaces its public functions with the remote versions below,
+so the rest of the app keeps calling database functions unchanged. GET
+responses are cached by ETag and revalidated with If-None-Match. Changes made
+by any workstation arrive through a long-polling thread and are passed to the
+local change listeners, exactly as local writes would be. If the server
+requires a token, set the same DPFPA_TOKEN on every workstation.
+"""
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+import http.client
+from urllib.parse import urlsplit, urlencode, quote
+import database
+from diagnostics import profiled
+
+# Pauza pre ponovnog povezivanja kad server nije dostupan
+RECONNECT_DELAY = 2
+CHANGES_TIMEOUT = 25
+REQUEST_TIMEOUT = 60
+TOKEN_HEADER = 'X-DPFPA-Token'
+# Najvise odgovora zapamcenih za If-None-Match (najstariji koriscen se izbacuje)
+ETAG_CACHE_SIZE = 256
+
+RECORD_FIELDS = ('datum', 'broj_sasije', 'registarska_oznaka', 'marka_model', 'tip_usluge_id', 'opis_rada', 'cena')
+
+
+class ApiError(Exception):
+    def __init__(self, status, message, details=None):
+        super().__init__(f'{status}: {message}')
+        self.status = status
+        self.message = message
+        self.details = details or {}  # ceo JSON odgovor greske
+
+
+def _rows(rows):
+    return [tuple(row) for row in rows]
+
+
+class ApiClient:
+    """HTTP/1.1 keep-alive client, one connection per thread."""
+
+    def __init__(self, url, token=None):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.token = token if token is not None else os.environ.get('DPFPA_TOKEN')
+        self._local = threading.local()
+        self._etags = OrderedDict()  # path -> (etag, value), LRU
+        self._etags_lock = threading.Lock()
+        self.not_modified = 0
+
+    def _connection(self, timeout):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+            self._local.conn = conn
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn
+
+    def request(self, method, path, body=None, timeout=REQUEST_TIMEOUT, cache=True):
+        """Send one request; returns (status, headers, body bytes)."""
+        headers = {TOKEN_HEADER: self.token} if self.token else {}
+        if body is not None:
+            body = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        cached = None
+        if method == 'GET' and cache:
+            with self._etags_lock:
+                cached = self._etags.get(path)
+                if cached is not None:
+                    self._etags.move_to_end(path)
+            if cached is not None:
+                headers['If-None-Match'] = cached[0]
+        # Server je mogao da zatvori neaktivnu konekciju; tada se pokusa jos jednom
+        for attempt in (1, 2):
+            conn = self._connection(timeout)
+            try:
+                conn.request(method, path, body, headers)
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except (ConnectionError, http.client.HTTPException, OSError):
+                conn.close()
+                self._local.conn = None
+                if attempt == 2:
+                    raise
+        if response.status >= 400:
+            try:
+                details = json.loads(data)
+                message = details['error']
+            except (ValueError, KeyError, TypeError):
+                details, message = None, response.reason
+            raise ApiError(response.status, message, details)
+        return response.status, response.headers, data
+
+    def get_json(self, path, cache=True, **params):
+        """GET path as JSON; cache=False skips the ETag cache (one-off pages of a long listing)."""
+        if params:
+            path += '?' + urlencode({name: value for name, value in params.items() if value is not None})
+        status, headers, data = self.request('GET', path, cache=cache)
+        if status == 304:
+            self.not_modified += 1
+            with self._etags_lock:
+                return self._etags[path][1]
+        value = json.loads(data)
+        etag = headers.get('ETag')
+        if etag and cache:
+            with self._etags_lock:
+                self._etags[path] = (etag, value)
+                self._etags.move_to_end(path)
+                while len(self._etags) > ETAG_CACHE_SIZE:
+                    self._etags.popitem(last=False)
+        return value
+
+    def get_bytes(self, path, **params):
+        if params:
+            path += '?' + urlencode(params)
+        return self.request('GET', path)[2]
+
+    def send_json(self, method, path, body=None):
+        return json.loads(self.request(method, path, body)[2])
+
+
+_client = None
+
+
+# Udaljene verzije funkcija iz database.py (isti potpis i isti oblik rezultata)
+
+def connect(backup=True):
+    _client.get_json('/health')
+
+
+def schema_version():
+    return _client.get_json('/health')['schema_version']
+
+
+def insert_record(datum, broj_sasije, registarska_oznaka, marka_model, tip_usluge_id, opis_rada, cena):
+    return _client.send_json('POST', '/records', dict(zip(RECORD_FIELDS, (
+        datum, broj_sasije, registarska_oznaka, marka_model, tip_usluge_id, opis_rada, cena))))['id']
+
+
+def insert_records(rows):
+    return _client.send_json('POST', '/records/batch', [dict(zip(RECORD_FIELDS, row)) for row in rows])['ids']
+
+
+def _record_write(method, path, body):
+    # Ista greska kao lokalno kad su neki od zapisa arhivirani
+    try:
+        return _client.send_json(method, path, body)
+    except ApiError as e:
+        if e.status == 409:
+            raise database.ArchivedRecordError(e.details.get('ids', []))
+        raise
+
+
+def update_record(record_id, datum, broj_sasije, registarska_oznaka, marka_model, tip_usluge_id, opis_rada, cena):
+    _record_write('PUT', f'/records/{int(record_id)}', dict(zip(RECORD_FIELDS, (
+        datum, broj_sasije, registarska_oznaka, marka_model, tip_usluge_id, opis_rada, cena))))
+
+
+def update_records(record_ids, tip_usluge_id=None, cena=None):
+    _record_write('POST', '/records/update', {'ids': list(record_ids), 'tip_usluge_id': tip_usluge_id, 'cena': cena})
+
+
+def delete_records(record_ids):
+    _record_write('POST', '/records/delete', {'ids': list(record_ids)})
+
+
+def get_report(start, end):
+    return _rows(_client.get_json('/reports', start=start, end=end))
+
+
+def get_monthly_totals(start, end):
+    return _rows(_client.get_json('/reports/monthly-totals', start=start, end=end))
+
+
+def get_monthly_report():
+    return _rows(_client.get_json('/reports/monthly'))
+
+
+def get_yearly_report():
+    return _rows(_client.get_json('/reports/yearly'))
+
+
+def _search_params(text, column, mode):
+    return {'q': text, 'column': column or '', 'mode': mode}
+
+
+def search_records(text, column='broj_sasije', mode='contains', limit=None):
+    return _rows(_client.get_json('/records/search', limit=limit, **_search_params(text, column, mode)))
+
+
+def search_records_page(text, after_id=0, limit=200, column='broj_sasije', mode='contains',
+                        start=None, end=None, tip_usluge_id=None):
+    # Samo prva strana se ponovo trazi (osvezavanje tabele); dalje strane bi samo punile kes
+    return _rows(_client.get_json('/records', cache=not after_id, after_id=after_id, limit=limit,
+                                  start=start, end=end, tip_usluge_id=tip_usluge_id,
+                                  **_search_params(text, column, mode)))
+
+
+def iter_search_records(text, column='broj_sasije', mode='contains', batch_size=1000,
+                        start=None, end=None, tip_usluge_id=None):
+    after_id = 0
+    while True:
+        rows = search_records_page(text, after_id, batch_size, column, mode, start, end, tip_usluge_id)
+        if not rows:
+            break
+        yield from rows
+        after_id = rows[-1][0]
+
+
+def search_records_by_ids(text, record_ids, column='broj_sasije', mode='contains'):
+    results = []
+    for chunk in database._id_chunks(record_ids):
+        results.extend(_rows(_client.get_json('/records/by-ids', ids=','.join(map(str, chunk)),
+                                              **_search_params(text, column, mode))))
+    return results
+
+
+def count_search_records(text, column='broj_sasije', mode='contains', start=None, end=None, tip_usluge_id=None):
+    return _client.get_json('/records/count', start=start, end=end, tip_usluge_id=tip_usluge_id,
+                            **_search_params(text, column, mode))
+
+
+def archived_record_ids(record_ids):
+    results = []
+    for chunk in database._id_chunks(record_ids):
+        results.extend(_client.get_json('/records/archived', ids=','.join(map(str, chunk))))
+    return results
+
+
+def get_all_records():
+    return list(iter_search_records('', column=None))
+
+
+def get_tip_usluge_list(include_retired=False):
+    return _rows(_client.get_json('/tip-usluge', include_retired=int(include_retired)))
+
+
+def _tip_usluge_write(method, path, body):
+    # Ista greska kao lokalno (prazan ili postojeci naziv, nepoznat id)
+    try:
+        return _client.send_json(method, path, body)
+    except ApiError as e:
+        if e.status == 400:
+            raise ValueError(e.message)
+        raise
+
+
+def add_tip_usluge(naziv):
+    return _tip_usluge_write('POST', '/tip-usluge', {'naziv': naziv})['id']
+
+
+def rename_tip_usluge(tip_usluge_id, naziv):
+    _tip_usluge_write('PUT', f'/tip-usluge/{int(tip_usluge_id)}', {'naziv': naziv})
+
+
+def retire_tip_usluge(tip_usluge_id, retired=True):
+    _tip_usluge_write('POST', f'/tip-usluge/{int(tip_usluge_id)}/retire', {'retired': retired})
+
+
+def get_record_by_id(record_id):
+    try:
+        return tuple(_client.get_json(f'/records/{int(record_id)}'))
+    except ApiError as e:
+        if e.status == 404:
+            return None
+        raise
+
+
+def search_vehicles(prefix, limit=20):
+    return _rows(_client.get_json('/vehicles', prefix=prefix, limit=limit))
+
+
+def _vehicle_path(broj_sasije, suffix=''):
+    return f"/vehicles/{quote(broj_sasije, safe='')}{suffix}"
+
+
+def get_vehicle(broj_sasije):
+    try:
+        return tuple(_client.get_json(_vehicle_path(broj_sasije)))
+    except ApiError as e:
+        if e.status == 404:
+            return None
+        raise
+
+
+def get_vehicle_history(broj_sasije):
+    try:
+        history = _client.get_json(_vehicle_path(broj_sasije, '/history'))
+    except ApiError as e:
+        if e.status == 404:
+            return None
+        raise
+    return dict(history, vehicle=tuple(history['vehicle']), services=_rows(history['services']))
+
+
+REMOTE_FUNCTIONS = (
+    'connect', 'schema_version', 'insert_record', 'insert_records', 'update_record', 'update_records',
+    'delete_records', 'get_report', 'get_monthly_totals', 'get_monthly_report', 'get_yearly_report',
+    'search_records', 'iter_search_records', 'search_records_page', 'search_records_by_ids',
+    'count_search_records', 'archived_record_ids', 'get_all_records', 'get_tip_usluge_list',
+    'get_record_by_id', 'search_vehicles', 'get_vehicle', 'get_vehicle_history', 'add_tip_usluge',
+    'rename_tip_usluge', 'retire_tip_usluge',
+)
+
+
+# PDF-ovi koji zahtevaju celu bazu prave se na serveru
+
+def _save_pdf(data):
+    from reports import _temp_pdf_path
+    path = _temp_pdf_path()
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def download_trend_report(start, end, report_title, progress=None):
+    """Fetch the trend report PDF built by the server; returns the local path (PdfJob builder signature)."""
+    if progress is not None:
+        progress(10)
+    path = _save_pdf(_client.get_bytes('/reports/trend.pdf', start=start, end=end, title=report_title))
+    if progress is not None:
+        progress(100)
+    return path
+
+
+def _poll_changes():
+    """Long-poll /changes forever and replay every change to the local listeners."""
+    client = ApiClient(f'http://{_client.host}:{_client.port}', _client.token)
+    since = None
+    while True:
+        try:
+            result = client.get_json('/changes', since=since, timeout=CHANGES_TIMEOUT)
+            seq, reset, changes = result['seq'], result['reset'], result['changes']
+        except Exception:
+            # Nit mora da prezivi svaku gresku servera, inace izmene prestaju da stizu
+            time.sleep(RECONNECT_DELAY)
+            continue
+        if reset:
+            # Propustene izmene se ne mogu nabrojati; prikaz se ucitava iz pocetka
+            database._notify('reset', [])
+        for _, kind, record_ids in changes:
+            database._notify(kind, record_ids)
+        since = seq
+
+
+def install(url):
+    """Switch database.py to the server at url and start following its changes."""
+    global _client
+    _client = ApiClient(url)
+    for name in REMOTE_FUNCTIONS:
+        setattr(database, name, profiled(globals()[name]))
+    threading.Thread(target=_poll_changes, name='api-changes', daemon=True).start()
@@ -0,0 +1,548 @@
+# archive.py
+"""Columnar archive of old service records.
+
+Records older than a cutoff are moved out of the live records table into
+<db>_archive.db next to the database (app_data.db -> app_data_archive.db),
+so everyday queries, the search index and backups only deal with recent
+work. Each archiving run stores one segment per year. A segment holds every
+column as its own zlib-compressed array; text columns are dictionary encoded
+(distinct values + one code per row), which makes repeated VINs, plates,
+models and dates nearly free. The archive also keeps its own monthly_totals,
+so whole-month reports never decode a segment.
+
+database.py attaches the archive to each connection when the file exists
+and unions archived rows into searches, record lookups, vehicle history and
+reports; nothing else in the app needs to know about it. Archived records
+are read-only: database.py raises ArchivedRecordError for writes to them.
+
+    python archive.py [--before 2022-01-01 | --keep-years 3] [--no-vacuum]
+    python archive.py --info
+"""
+import json
+import zlib
+import heapq
+import argparse
+import itertools
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import date, datetime
+import numpy as np
+import database
+
+# Koliko poslednjih punih godina (uz tekucu) ostaje u zivoj bazi
+KEEP_YEARS = 3
+# Broj dekodiranih segmenata koji se drze u memoriji
+SEGMENT_CACHE_SIZE = 8
+# zlib nivo; visi nivoi su znatno sporiji za skoro isti odnos
+COMPRESS_LEVEL = 6
+# Redovi se iz segmenta prave u komadima koji rastu do ROW_CHUNK, da stranica od 200 ne dekodira ceo segment
+FIRST_ROW_CHUNK = 64
+ROW_CHUNK = 4096
+# Razdvaja vrednosti u spojenom tekstu po kome se pretrazuje
+SEPARATOR = '\x00'
+
+# (kolona, kodiranje): 'dict' = razlicite vrednosti + kod po redu, 'int' = int64 niz
+COLUMNS = [
+    ('id', 'int'), ('datum', 'dict'), ('broj_sasije', 'dict'), ('registarska_oznaka', 'dict'),
+    ('marka_model', 'dict'), ('tip_usluge_id', 'int'), ('opis_rada', 'dict'), ('cena', 'int'),
+    ('vehicle_id', 'int'),
+]
+# NULL u celobrojnim kolonama (kao u analytics.py)
+NULL_CENA = -1
+NULL_VEHICLE = 0
+
+Segment = namedtuple('Segment', 'id godina prvi_datum poslednji_datum min_id max_id broj')
+
+_cache = OrderedDict()  # (putanja, segment id) -> {kolona: dekodirana vrednost}
+_cache_lock = threading.Lock()
+
+
+def create_schema(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS archive.segments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            godina INTEGER NOT NULL,
+            prvi_datum TEXT NOT NULL,
+            poslednji_datum TEXT NOT NULL,
+            min_id INTEGER NOT NULL,
+            max_id INTEGER NOT NULL,
+            broj INTEGER NOT NULL,
+            arhivirano TEXT NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS archive.segment_columns (
+            segment_id INTEGER NOT NULL REFERENCES segments(id),
+            kolona TEXT NOT NULL,
+            podaci BLOB NOT NULL,
+            PRIMARY KEY (segment_id, kolona)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS archive.monthly_totals (
+            mesec TEXT NOT NULL,
+            tip_usluge_id INTEGER NOT NULL,
+            broj INTEGER NOT NULL DEFAULT 0,
+            broj_cena INTEGER NOT NULL DEFAULT 0,
+            ukupno INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (mesec, tip_usluge_id)
+        ) WITHOUT ROWID
+    ''')
+
+
+# Kodiranje kolona
+
+def _pack_ints(values):
+    return zlib.compress(np.asarray(values, dtype=np.int64).tobytes(), COMPRESS_LEVEL)
+
+
+def _unpack_ints(data):
+    return np.frombuffer(zlib.decompress(data), dtype=np.int64)
+
+
+def _pack_dict(values):
+    """Dictionary-encode text values: (distinct values as JSON, int32 code per row)."""
+    codes = {}
+    row_codes = [codes.setdefault(value, len(codes)) for value in values]
+    return (zlib.compress(json.dumps(list(codes), ensure_ascii=False).encode('utf-8'), COMPRESS_LEVEL),
+            zlib.compress(np.asarray(row_codes, dtype=np.int32).tobytes(), COMPRESS_LEVEL))
+
+
+def _unpack_dict(values, codes):
+    return json.loads(zlib.decompress(values)), np.frombuffer(zlib.decompress(codes), dtype=np.int32)
+
+
+def _encode_segment(rows):
+    """Turn (id, datum, ..., vehicle_id) rows sorted by id into {kolona: blob}."""
+    blobs = {}
+    for (name, kind), values in zip(COLUMNS, zip(*rows)):
+        if name == 'cena':
+            values = [NULL_CENA if value is None else value for value in values]
+        elif name == 'vehicle_id':
+            values = [NULL_VEHICLE if value is None else value for value in values]
+        if kind == 'int':
+            blobs[name] = _pack_ints(values)
+        else:
+            blobs[name + '.values'], blobs[name] = _pack_dict(values)
+    return blobs
+
+
+# Citanje
+
+def _is_pending(conn, segment):
+    """True if the segment's records are still in the live table (a move that was not finished).
+
+    _delete_live removes a whole segment in one transaction and archived ids
+    can no longer be written, so checking the first and last id is enough.
+    """
+    return conn.execute('SELECT 1 FROM records WHERE id IN (?, ?) LIMIT 1',
+                        (segment.min_id, segment.max_id)).fetchone() is not None
+
+
+def segments(conn, start=None, end=None, pending=False):
+    """Archive segments ordered by first id, optionally only those with records in [start, end).
+
+    Segments whose records are still live are left out unless pending is
+    True, so a half-finished move is never read from both places.
+    """
+    sql = 'SELECT id, godina, prvi_datum, poslednji_datum, min_id, max_id, broj FROM archive.segments'
+    clauses, params = [], []
+    if start is not None:
+        clauses.append('poslednji_datum >= ?')
+        params.append(start)
+    if end is not None:
+        clauses.append('prvi_datum < ?')
+        params.append(end)
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+    results = [Segment(*row) for row in conn.execute(sql + ' ORDER BY min_id', params)]
+    return results if pending else [segment for segment in results if not _is_pending(conn, segment)]
+
+
+def _search_index(values):
+    """Casefolded distinct values joined into one string, plus the offset of the separator before each.
+
+    A search then runs str.find over the whole column in C instead of a
+    Python loop over every distinct value.
+    """
+    folded = [value.casefold() if value is not None else '' for value in values]
+    lengths = np.fromiter((len(value) + 1 for value in folded), dtype=np.int64, count=len(folded))
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    return SEPARATOR + SEPARATOR.join(folded) + SEPARATOR, starts
+
+
+def _columns(conn, segment):
+    """Decoded columns of a segment, cached; dict columns also get a search index."""
+    key = (database.archive_path(), segment.id)
+    with _cache_lock:
+        columns = _cache.get(key)
+        if columns is not None:
+            _cache.move_to_end(key)
+            return columns
+    blobs = dict(conn.execute('SELECT kolona, podaci FROM archive.segment_columns WHERE segment_id = ?',
+                              (segment.id,)))
+    columns = {}
+    for name, kind in COLUMNS:
+        if kind == 'int':
+            columns[name] = _unpack_ints(blobs[name])
+        else:
+            values, codes = _unpack_dict(blobs[name + '.values'], blobs[name])
+            columns[name] = (values, codes, _search_index(values))
+    with _cache_lock:
+        _cache[key] = columns
+        while len(_cache) > SEGMENT_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return columns
+
+
+def _matching_codes(index, text, mode):
+    """Boolean array over the distinct values of a column: does the value match the search."""
+    joined, starts = index
+    text = text.casefold()
+    if mode == 'exact':
+        needle = SEPARATOR + text + SEPARATOR
+    elif mode == 'prefix':
+        needle = SEPARATOR + text
+    else:
+        needle = text
+    positions = []
+    position = joined.find(needle)
+    while position != -1:
+        positions.append(position)
+        # +1 a ne +len: kod exact se susedni pogoci dele separator
+        position = joined.find(needle, position + 1)
+    matches = np.zeros(len(starts), dtype=bool)
+    if positions:
+        matches[np.searchsorted(starts, positions, side='right') - 1] = True
+    return matches
+
+
+def _search_mask(columns, text, column, mode):
+    """Boolean row mask of a segment for the same search semantics as database._search_filter."""
+    mask = np.zeros(len(columns['id']), dtype=bool)
+    for name in ([column] if column else database.SEARCH_COLUMNS):
+        _, codes, index = columns[name]
+        mask |= _matching_codes(index, text, mode)[codes]
+    return mask
+
+
+def _rows(columns, positions, names):
+    """Build RECORD_SELECT-shaped rows for the given row positions of a segment."""
+    values = []
+    for name in ('datum', 'broj_sasije', 'registarska_oznaka', 'marka_model', 'opis_rada'):
+        distinct, codes, _ = columns[name]
+        values.append([distinct[code] for code in codes[positions].tolist()])
+    ids = columns['id'][positions].tolist()
+    tips = columns['tip_usluge_id'][positions].tolist()
+    prices = [None if cena == NULL_CENA else cena for cena in columns['cena'][positions].tolist()]
+    datumi, vins, plates, models, opisi = values
+    return [(ids[i], datumi[i], vins[i], plates[i], models[i], names.get(tips[i]), opisi[i], prices[i])
+            for i in range(len(ids))]
+
+
+def _filter_mask(columns, start, end, tip_usluge_id):
+    """Boolean row mask for start <= datum < end and one service type, or None if nothing is filtered."""
+    mask = None
+    if start is not None or end is not None:
+        mask = _in_range(columns, start, end)
+    if tip_usluge_id is not None:
+        same_tip = columns['tip_usluge_id'] == tip_usluge_id
+        mask = same_tip if mask is None else mask & same_tip
+    return mask
+
+
+def _iter_segment(conn, segment, text, column, mode, after_id, record_ids, names, start, end, tip_usluge_id):
+    columns = _columns(conn, segment)
+    ids = columns['id']
+    mask = ids > after_id
+    if record_ids is not None:
+        mask &= np.isin(ids, record_ids)
+    filtered = _filter_mask(columns, start, end, tip_usluge_id)
+    if filtered is not None:
+        mask &= filtered
+    if text:
+        mask &= _search_mask(columns, text, column, mode)
+    positions = np.flatnonzero(mask)
+    start, size = 0, FIRST_ROW_CHUNK
+    while start < len(positions):
+        yield from _rows(columns, positions[start:start + size], names)
+        start += size
+        size = min(size * 2, ROW_CHUNK)
+
+
+def iter_search(conn, text, column='broj_sasije', mode='contains', after_id=0, record_ids=None,
+                start=None, end=None, tip_usluge_id=None):
+    """Yield archived records matching a search (see database.iter_search_records), ordered by id.
+
+    Only segments whose id and date ranges can still contain a match are decoded.
+    """
+    if record_ids is not None:
+        record_ids = np.asarray(sorted(set(record_ids)), dtype=np.int64)
+    candidates = []
+    for segment in segments(conn, start, end):
+        if segment.max_id <= after_id:
+            continue
+        if record_ids is not None:
+            inside = np.searchsorted(record_ids, [segment.min_id, segment.max_id + 1])
+            if inside[0] == inside[1]:
+                continue
+        candidates.append(segment)
+    if not candidates:
+        return
+    names = database.tip_usluge_names()
+    yield from heapq.merge(*(_iter_segment(conn, segment, text, column, mode, after_id, record_ids, names,
+                                           start, end, tip_usluge_id)
+                             for segment in candidates), key=lambda row: row[0])
+
+
+def search(conn, text, column='broj_sasije', mode='contains', after_id=0, record_ids=None, limit=None):
+    return list(itertools.islice(iter_search(conn, text, column, mode, after_id, record_ids), limit))
+
+
+def archived_ids(conn, record_ids):
+    """Return those of record_ids that are in the archive, including segments that are still live."""
+    record_ids = np.asarray(sorted(set(record_ids)), dtype=np.int64)
+    results = []
+    for segment in segments(conn, pending=True):
+        inside = np.searchsorted(record_ids, [segment.min_id, segment.max_id + 1])
+        if inside[0] != inside[1]:
+            ids = _columns(conn, segment)['id']
+            results.extend(ids[np.isin(ids, record_ids[inside[0]:inside[1]])].tolist())
+    return sorted(results)
+
+
+def count(conn, text, column='broj_sasije', mode='contains', start=None, end=None, tip_usluge_id=None):
+    """Number of archived records matching a search (and period and service type, if given)."""
+    total = 0
+    for segment in segments(conn, start, end):
+        whole = ((start is None or segment.prvi_datum >= start) and (end is None or segment.poslednji_datum < end)
+                 and tip_usluge_id is None)
+        if not text and whole:
+            total += segment.broj
+            continue
+        columns = _columns(conn, segment)
+        mask = None if whole else _filter_mask(columns, start, end, tip_usluge_id)
+        if text:
+            matches = _search_mask(columns, text, column, mode)
+            mask = matches if mask is None else mask & matches
+        total += int(mask.sum())
+    return total
+
+
+def vehicle_services(conn, vehicle_id):
+    """Archived records of one vehicle, as RECORD_SELECT rows ordered by id."""
+    names = database.tip_usluge_names()
+    results = []
+    for segment in segments(conn):
+        columns = _columns(conn, segment)
+        results.extend(_rows(columns, np.flatnonzero(columns['vehicle_id'] == vehicle_id), names))
+    return results
+
+
+def _in_range(columns, start, end):
+    distinct, codes, _ = columns['datum']
+    return np.array([(start is None or start <= value) and (end is None or value < end)
+                     for value in distinct], dtype=bool)[codes]
+
+
+def totals(conn, start, end):
+    """Per tip_usluge_id [broj, broj_cena, ukupno] of archived records with start <= datum < end."""
+    results = {}
+    for segment in segments(conn, start, end):
+        columns = _columns(conn, segment)
+        mask = _in_range(columns, start, end)
+        tips = columns['tip_usluge_id'][mask]
+        prices = columns['cena'][mask]
+        priced = prices != NULL_CENA
+        size = int(tips.max()) + 1 if len(tips) else 0
+        counts = np.bincount(tips, minlength=size)
+        priced_counts = np.bincount(tips, weights=priced, minlength=size)
+        sums = np.bincount(tips, weights=np.where(priced, prices, 0), minlength=size)
+        for tip in np.flatnonzero(counts).tolist():
+            total = results.setdefault(tip, [0, 0, 0])
+            total[0] += int(counts[tip])
+            total[1] += int(priced_counts[tip])
+            total[2] += int(sums[tip])
+    return results
+
+
+def pending_totals(conn, start, end):
+    """Per (mesec, tip_usluge_id) [broj, broj_cena, ukupno] of still-live segments in [start, end).
+
+    archive.monthly_totals already counts such a segment, and so does the live
+    monthly_totals; callers that add the two subtract this once.
+    """
+    results = {}
+    for segment in segments(conn, start, end, pending=True):
+        if not _is_pending(conn, segment):
+            continue
+        columns = _columns(conn, segment)
+        mask = _in_range(columns, start, end)
+        distinct, codes, _ = columns['datum']
+        months = [value[:7] for value in distinct]
+        for code, tip, cena in zip(codes[mask].tolist(), columns['tip_usluge_id'][mask].tolist(),
+                                   columns['cena'][mask].tolist()):
+            total = results.setdefault((months[code], tip), [0, 0, 0])
+            total[0] += 1
+            if cena != NULL_CENA:
+                total[1] += 1
+                total[2] += cena
+    return results
+
+
+def fetch_columns(conn, start, end):
+    """Archived (month, tip_usluge_id, cena, vehicle_id) rows in [start, end), shaped like analytics.fetch_columns."""
+    parts = [np.empty((0, 4), dtype=np.int64)]
+    for segment in segments(conn, start, end):
+        columns = _columns(conn, segment)
+        mask = _in_range(columns, start, end)
+        distinct, codes, _ = columns['datum']
+        month_of_code = np.array([int(value[:4]) * 12 + int(value[5:7]) - 1 for value in distinct], dtype=np.int64)
+        parts.append(np.column_stack((month_of_code[codes[mask]], columns['tip_usluge_id'][mask],
+                                      columns['cena'][mask], columns['vehicle_id'][mask])))
+    return np.concatenate(parts)
+
+
+def info(conn):
+    """Per segment (godina, broj, prvi_datum, poslednji_datum, compressed bytes)."""
+    return conn.execute('''
+        SELECT godina, broj, prvi_datum, poslednji_datum,
+               (SELECT SUM(length(podaci)) FROM archive.segment_columns WHERE segment_id = segments.id)
+        FROM archive.segments
+        ORDER BY godina, id
+    ''').fetchall()
+
+
+# Arhiviranje
+
+def default_cutoff(keep_years=KEEP_YEARS, today=None):
+    """First day of the oldest year that stays live: keep_years full years plus the current one."""
+    today = today or date.today()
+    return date(today.year - keep_years, 1, 1).isoformat()
+
+
+def archive_records(before, backup=True, vacuum=True, progress=None):
+    """Move every record with datum < before into the archive; returns the number of records moved.
+
+    The live database is in WAL mode, where SQLite does not commit a
+    transaction across attached databases atomically, so every year is moved
+    in two steps: its segment and monthly totals are committed (and synced)
+    to the archive first, then the same ids are deleted from the live table.
+    A run interrupted between the two leaves those records in both files;
+    reads skip such a segment, and database.connect or the next run removes
+    the live copies (finish_moves). Afterwards the
+    search index is optimized and the live database vacuumed (vacuum=False
+    skips that, e.g. while the app is in use elsewhere).
+    progress(done_years, total_years) is called after every year.
+    """
+    conn = database.get_connection()
+    if database.attach_archive(conn) is not None:
+        finish_moves(conn)
+    years = [row[0] for row in conn.execute(
+        'SELECT DISTINCT substr(datum, 1, 4) FROM records WHERE datum < ? ORDER BY 1', (before,))]
+    if not years:
+        return 0
+    if backup:
+        from backup import create_backup
+        print(f'Backup before archiving: {create_backup(database.DB_PATH)}')
+
+    database.attach_archive(conn, create=True)
+    # Segment mora biti na disku pre nego sto se zapisi obrisu iz zive baze
+    conn.execute('PRAGMA archive.synchronous = FULL')
+    with conn:
+        conn.execute('BEGIN IMMEDIATE')
+        create_schema(conn)
+    moved = 0
+    for done, year in enumerate(years, start=1):
+        # Opseg jedne godine, odsecen na granici arhiviranja
+        start, end = year, min(str(int(year) + 1), before)
+        with conn:
+            # Menja se samo arhiva; iz zive baze se samo cita
+            conn.execute('BEGIN')
+            rows = conn.execute('''
+                SELECT id, datum, broj_sasije, registarska_oznaka, marka_model, tip_usluge_id, opis_rada, cena, vehicle_id
+                FROM records WHERE datum >= ? AND datum < ? ORDER BY id
+            ''', (start, end)).fetchall()
+            cursor = conn.execute('''
+                INSERT INTO archive.segments (godina, prvi_datum, poslednji_datum, min_id, max_id, broj, arhivirano)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (int(year), min(row[1] for row in rows), max(row[1] for row in rows), rows[0][0], rows[-1][0],
+                  len(rows), datetime.now().isoformat(timespec='seconds')))
+            conn.executemany('INSERT INTO archive.segment_columns (segment_id, kolona, podaci) VALUES (?, ?, ?)',
+                             [(cursor.lastrowid, name, data) for name, data in _encode_segment(rows).items()])
+            conn.execute('''
+                INSERT INTO archive.monthly_totals (mesec, tip_usluge_id, broj, broj_cena, ukupno)
+                SELECT substr(datum, 1, 7), tip_usluge_id, COUNT(*), COUNT(cena), coalesce(SUM(cena), 0)
+                FROM records WHERE datum >= ? AND datum < ?
+                GROUP BY substr(datum, 1, 7), tip_usluge_id
+                ON CONFLICT (mesec, tip_usluge_id) DO UPDATE SET
+                    broj = broj + excluded.broj,
+                    broj_cena = broj_cena + excluded.broj_cena,
+                    ukupno = ukupno + excluded.ukupno
+            ''', (start, end))
+        _delete_live(conn, [row[0] for row in rows])
+        moved += len(rows)
+        if progress is not None:
+            progress(done, len(years))
+
+    if vacuum:
+        if database._has_search_index(conn):
+            with conn:
+                conn.execute("INSERT INTO records_fts (records_fts) VALUES ('optimize')")
+        conn.execute('VACUUM main')
+    return moved
+
+
+def _delete_live(conn, record_ids):
+    """Delete the live copies of archived records by id; safe to repeat."""
+    deleted = 0
+    with conn:
+        conn.execute('BEGIN IMMEDIATE')
+        for chunk in database._id_chunks(record_ids):
+            # Okidaci brisu i iz pretraznog indeksa i iz monthly_totals zive baze
+            deleted += conn.execute(f'DELETE FROM records WHERE id IN ({", ".join("?" * len(chunk))})',
+                                    chunk).rowcount
+    return deleted
+
+
+def finish_moves(conn):
+    """Delete live records that are already archived; returns how many were deleted.
+
+    This only finds something after archive_records was interrupted between
+    committing a segment and deleting its records from the live table. Ids
+    are never reused (AUTOINCREMENT), so a live record with an archived id
+    is always such a leftover copy. database.connect calls it on startup.
+    """
+    deleted = 0
+    for segment in segments(conn, pending=True):
+        if _is_pending(conn, segment):
+            deleted += _delete_live(conn, _columns(conn, segment)['id'].tolist())
+    return deleted
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Arhiviranje starih servisnih zapisa')
+    parser.add_argument('--before', help='arhivira zapise pre ovog datuma (yyyy-MM-dd)')
+    parser.add_argument('--keep-years', type=int, default=KEEP_YEARS,
+                        help='punih godina koje ostaju u bazi uz tekucu (ako nije dat --before)')
+    parser.add_argument('--no-vacuum', action='store_true')
+    parser.add_argument('--no-backup', action='store_true')
+    parser.add_argument('--info', action='store_true', help='samo prikazi sadrzaj arhive')
+    args = parser.parse_args()
+
+    database.connect()
+    if not args.info:
+        before = args.before or default_cutoff(args.keep_years)
+        moved = archive_records(before, backup=not args.no_backup, vacuum=not args.no_vacuum,
+                                progress=lambda done, total: print(f'{done}/{total} godina'))
+        print(f'Archived {moved} records older than {before}')
+    conn = database.get_connection()
+    if database.attach_archive(conn) is None:
+        print('No archive')
+        return
+    for godina, broj, prvi, poslednji, size in info(conn):
+        print(f'{godina}: {broj} records, {prvi} .. {poslednji}, {size or 0} bytes')
+
+
+if __name__ == '__main__':
+    main()
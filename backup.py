@@ -0,0 +1,184 @@
+# backup.py
+"""Online backups of the records database.
+
+Backups are taken with sqlite3's Connection.backup in small page steps, so
+the live database stays usable while the copy runs and the result is always
+a consistent snapshot (unlike copying the file while it is being written).
+Each backup is checked with PRAGMA integrity_check before it is kept, may
+be gzip-compressed, and old backups are pruned to a fixed count.
+
+    python backup.py [--compress] [--verify FILE]
+"""
+import os
+import gzip
+import zlib
+import shutil
+import logging
+import sqlite3
+import argparse
+import tempfile
+import threading
+from datetime import datetime, timedelta
+import database
+
+BACKUP_DIR = 'backups'
+BACKUP_PREFIX = 'backup_app_data_'
+# Nova rezervna kopija se pravi ako je poslednja starija od ovoga
+BACKUP_MAX_AGE = timedelta(days=30)
+# Koliko poslednjih kopija se cuva
+KEEP_BACKUPS = 12
+# Stranice po koraku backup-a; izmedju koraka baza je slobodna za druge
+PAGES_PER_STEP = 1024
+STEP_SLEEP = 0.005
+
+# RLock: backup_in_background drzi zakljucavanje dok create_backup radi
+_backup_lock = threading.RLock()
+logger = logging.getLogger(__name__)
+
+
+class BackupError(Exception):
+    pass
+
+
+def list_backups(backup_dir=BACKUP_DIR):
+    """Return backup file paths, newest first."""
+    if not os.path.isdir(backup_dir):
+        return []
+    names = [name for name in os.listdir(backup_dir)
+             if name.startswith(BACKUP_PREFIX) and (name.endswith('.db') or name.endswith('.db.gz'))]
+    return sorted((os.path.join(backup_dir, name) for name in names), reverse=True)
+
+
+def backup_due(backup_dir=BACKUP_DIR, max_age=BACKUP_MAX_AGE):
+    backups = list_backups(backup_dir)
+    if not backups:
+        return True
+    newest = datetime.fromtimestamp(os.path.getmtime(backups[0]))
+    return datetime.now() - newest > max_age
+
+
+def _check_integrity(path):
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        result = conn.execute('PRAGMA integrity_check').fetchone()[0]
+    except sqlite3.DatabaseError as e:
+        # Osteceno zaglavlje ili stranica: SQLite ne stigne ni do izvestaja
+        raise BackupError(f'Integrity check failed for {path}: {e}') from e
+    finally:
+        conn.close()
+    if result != 'ok':
+        raise BackupError(f'Integrity check failed for {path}: {result}')
+
+
+def verify_backup(path):
+    """Raise BackupError unless the (optionally gzipped) backup passes integrity_check."""
+    if not path.endswith('.gz'):
+        _check_integrity(path)
+        return
+    fd, tmp_path = tempfile.mkstemp(suffix='.db')
+    try:
+        try:
+            with os.fdopen(fd, 'wb') as out, gzip.open(path, 'rb') as src:
+                shutil.copyfileobj(src, out)
+        except (gzip.BadGzipFile, EOFError, zlib.error) as e:
+            raise BackupError(f'Cannot decompress {path}: {e}') from e
+        _check_integrity(tmp_path)
+    finally:
+        os.remove(tmp_path)
+
+
+def prune_backups(backup_dir=BACKUP_DIR, keep=KEEP_BACKUPS):
+    """Delete all but the newest keep backups; return the removed paths."""
+    removed = list_backups(backup_dir)[keep:]
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def create_backup(db_path=None, backup_dir=BACKUP_DIR, compress=False, keep=KEEP_BACKUPS, progress=None):
+    """Take an online backup of db_path and return the path of the verified copy.
+
+    The copy is written to a .partial file, checked with integrity_check,
+    optionally gzipped, and only then renamed into place, so an interrupted
+    backup never looks like a valid one. progress(remaining, total) is called
+    after every step of PAGES_PER_STEP pages.
+    """
+    db_path = db_path or database.DB_PATH
+    os.makedirs(backup_dir, exist_ok=True)
+    name = BACKUP_PREFIX + datetime.now().strftime('%Y%m%d_%H%M%S') + '.db'
+    final_path = os.path.join(backup_dir, name + ('.gz' if compress else ''))
+    partial_path = os.path.join(backup_dir, name + '.partial')
+    compressed_partial_path = final_path + '.partial'
+
+    with _backup_lock:
+        try:
+            source = sqlite3.connect(db_path)
+            target = sqlite3.connect(partial_path)
+            try:
+                source.backup(target, pages=PAGES_PER_STEP, sleep=STEP_SLEEP,
+                              progress=(lambda status, remaining, total: progress(remaining, total))
+                              if progress else None)
+                # Kopija je samostalan fajl, bez -wal/-shm pratilaca
+                target.execute('PRAGMA journal_mode = DELETE')
+            finally:
+                target.close()
+                source.close()
+            _check_integrity(partial_path)
+
+            if compress:
+                with open(partial_path, 'rb') as src, gzip.open(compressed_partial_path, 'wb') as out:
+                    shutil.copyfileobj(src, out)
+                os.replace(compressed_partial_path, final_path)
+            else:
+                os.replace(partial_path, final_path)
+        finally:
+            for path in (partial_path, compressed_partial_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        prune_backups(backup_dir, keep)
+    return final_path
+
+
+def backup_in_background(db_path=None, backup_dir=BACKUP_DIR, max_age=BACKUP_MAX_AGE, compress=False):
+    """Start a daemon thread that takes a backup if the newest one is older than max_age.
+
+    Returns the thread immediately; nothing is read or written on the caller's thread.
+    The age is checked again under the backup lock, so callers that start at
+    the same time produce one backup, not one each. The outcome is logged
+    (logger 'backup'): the windowed app has no console to print to.
+    """
+    def run():
+        # Kopija je vec u toku; kad se zavrsi, nova nije potrebna
+        if not _backup_lock.acquire(blocking=False):
+            return
+        try:
+            if backup_due(backup_dir, max_age):
+                path = create_backup(db_path, backup_dir, compress=compress)
+                logger.info('Backup created: %s', path)
+        except (OSError, sqlite3.Error, BackupError) as e:
+            logger.error('Backup failed: %s', e)
+        finally:
+            _backup_lock.release()
+
+    thread = threading.Thread(target=run, name='db-backup', daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rezervna kopija baze')
+    parser.add_argument('--compress', action='store_true', help='gzip kopije')
+    parser.add_argument('--keep', type=int, default=KEEP_BACKUPS)
+    parser.add_argument('--verify', metavar='FILE', help='samo proveri postojecu kopiju')
+    args = parser.parse_args()
+
+    if args.verify:
+        verify_backup(args.verify)
+        print(f'{args.verify}: ok')
+    else:
+        path = create_backup(compress=args.compress, keep=args.keep)
+        print(f'Backup created: {path}')
+
+
+if __name__ == '__main__':
+    main()
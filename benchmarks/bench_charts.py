@@ -0,0 +1,95 @@
+# benchmarks/bench_charts.py
+"""Compare report chart rendering: legacy pyplot + chart.png vs in-memory Figure.
+
+Run from the repository root:
+
+    python benchmarks/bench_charts.py [--repeat N]
+
+Prints one JSON object with wall time and peak traced memory per variant.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from fpdf import FPDF
+from reports import create_chart_with_legend
+
+REPORT_DATA = [
+    ('MEHANIKA', 120, 8500.0, 1020000),
+    ('DPF', 45, 22000.0, 990000),
+    ('GUME', 210, 3000.0, 630000),
+    ('DOPUNA KLIME', 80, 4500.0, 360000),
+    ('SERVIS KLIME', 30, 9000.0, 270000),
+]
+
+
+def legacy_chart(pdf):
+    # Put pre izmene: pyplot, chart.png na disku, pa brisanje
+    tip_usluge = [row[0] for row in REPORT_DATA]
+    sum_cena = [row[3] for row in REPORT_DATA]
+    plt.figure(figsize=(8, 8))
+    wedges, texts, autotexts = plt.pie(sum_cena, autopct='%1.1f%%', startangle=140)
+    plt.legend(wedges, tip_usluge, title="Tip usluge", loc="center left", bbox_to_anchor=(1, 0, 0.5, 1))
+    plt.axis('equal')
+    chart_path = 'chart.png'
+    plt.savefig(chart_path, bbox_inches='tight')
+    plt.close()
+    pdf.image(chart_path, x=10, y=40, w=pdf.w - 20)
+    os.remove(chart_path)
+
+
+def memory_chart(fmt):
+    def run(pdf):
+        pdf.image(create_chart_with_legend(REPORT_DATA, 'Benchmark', fmt=fmt), x=10, y=40, w=pdf.w - 20)
+    return run
+
+
+def measure(render, repeat):
+    timings = []
+    peak = 0
+    size = 0
+    for _ in range(repeat):
+        pdf = FPDF()
+        pdf.add_page()
+        tracemalloc.start()
+        start = time.perf_counter()
+        render(pdf)
+        output = pdf.output()
+        timings.append(time.perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        size = len(output)
+    timings.sort()
+    return {
+        'median_s': timings[len(timings) // 2],
+        'min_s': timings[0],
+        'peak_bytes': peak,
+        'pdf_bytes': size,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    # Prvi poziv ucitava fontove i kesira ih; ne racuna se u merenje
+    measure(memory_chart('png'), 1)
+    results = {
+        'legacy_pyplot_png_file': measure(legacy_chart, args.repeat),
+        'figure_png_bytesio': measure(memory_chart('png'), args.repeat),
+        'figure_svg_bytesio': measure(memory_chart('svg'), args.repeat),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# benchmarks/bench_listing_export.py
+"""Streaming listing export: time and peak memory per format and scale.
+
+Run from the repository root:
+
+    python benchmarks/bench_listing_export.py [--scales 10000,100000] [--fpdf-scales 10000]
+
+For every scale (databases are shared with bench_suite.py) the whole table is
+exported to PDF, CSV and XLSX with listing_export.export_listing, once for
+the time and once under tracemalloc for the peak Python memory, which should
+not grow with the number of rows. For the scales in --fpdf-scales the same
+listing is also built the old way, as one FPDF document in memory, for
+comparison. Results are printed (or written) as JSON.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import listing_export
+from bench_suite import build_database
+
+DEFAULT_SCALES = [10000, 100000]
+DEFAULT_FPDF_SCALES = [10000]
+
+
+def measure(func):
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def fpdf_listing(path):
+    # Ceo dokument u memoriji do output(), kako bi ga napravio reports.py
+    from reports import new_pdf
+    pdf = new_pdf(bold=False)
+    pdf.set_auto_page_break(True, listing_export.MARGIN)
+    pdf.add_page(orientation='L')
+    pdf.set_font('DejaVu', size=listing_export.FONT_SIZE)
+    widths = [width * 25.4 / 72 for width in listing_export.PDF_COLUMN_WIDTHS]
+    for row in database.iter_search_records('', column=None):
+        for width, value in zip(widths, (row[0],) + tuple(row[1:])):
+            pdf.cell(width, 4, str(value if value is not None else '')[:60], border=0)
+        pdf.ln()
+    pdf.output(path)
+
+
+def bench_scale(scale, directory, with_fpdf):
+    results = {}
+    for fmt in listing_export.FORMATS:
+        path = os.path.join(directory, f'listing.{fmt}')
+        seconds, peak = measure(lambda: listing_export.export_listing(path, column=None))
+        results[fmt] = {
+            'seconds': seconds,
+            'rows_per_second': scale / seconds,
+            'peak_python_mb': peak / 2 ** 20,
+            'file_mb': os.path.getsize(path) / 2 ** 20,
+        }
+    if with_fpdf:
+        path = os.path.join(directory, 'listing_fpdf.pdf')
+        seconds, peak = measure(lambda: fpdf_listing(path))
+        results['fpdf_in_memory'] = {
+            'seconds': seconds,
+            'rows_per_second': scale / seconds,
+            'peak_python_mb': peak / 2 ** 20,
+            'file_mb': os.path.getsize(path) / 2 ** 20,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', default=','.join(str(scale) for scale in DEFAULT_SCALES))
+    parser.add_argument('--fpdf-scales', default=','.join(str(scale) for scale in DEFAULT_FPDF_SCALES))
+    parser.add_argument('--db-dir', default=os.path.join('benchmarks', 'data'))
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    os.makedirs(args.db_dir, exist_ok=True)
+    fpdf_scales = {int(value) for value in args.fpdf_scales.split(',') if value}
+    results = {
+        'python': platform.python_version(),
+        'sqlite': database.sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'scales': {},
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for scale in (int(value) for value in args.scales.split(',')):
+            path = os.path.join(args.db_dir, f'bench_{scale}.db')
+            print(f'scale {scale}: {path}', file=sys.stderr)
+            build_database(path, scale)
+            results['scales'][str(scale)] = bench_scale(scale, directory, scale in fpdf_scales)
+    database.close_connections()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
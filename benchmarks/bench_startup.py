@@ -0,0 +1,106 @@
+# benchmarks/bench_startup.py
+"""Measure cold start of dpfpa.py headlessly (offscreen Qt platform).
+
+Run from the repository root:
+
+    python benchmarks/bench_startup.py [--repeat N] [--top N]
+
+Reports the slowest imports from `python -X importtime -c "import dpfpa"`
+and the time from process launch to the first paint of MainWindow, as JSON.
+A throwaway database is used, so app_data.db is never touched.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_PAINT_SCRIPT = '''
+import json, os, sys, time
+from PyQt5.QtCore import QObject, QEvent
+from PyQt5.QtWidgets import QApplication
+import database
+import dpfpa
+
+database.connect()
+app = QApplication(sys.argv)
+window = dpfpa.MainWindow()
+
+class FirstPaint(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            elapsed = time.time() - float(os.environ['BENCH_LAUNCH_TIME'])
+            print(json.dumps({'first_paint_s': elapsed}), flush=True)
+            app.quit()
+        return False
+
+paint_filter = FirstPaint()
+window.installEventFilter(paint_filter)
+window.show()
+app.exec_()
+'''
+
+
+def child_env(db_path):
+    env = dict(os.environ)
+    env['QT_QPA_PLATFORM'] = 'offscreen'
+    env['DPFPA_DB_PATH'] = db_path
+    return env
+
+
+def import_breakdown(env, top):
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import dpfpa'],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        entries.append({
+            'module': name.strip(),
+            'self_ms': int(self_us) / 1000,
+            'cumulative_ms': int(cumulative_us) / 1000,
+        })
+    total_ms = sum(entry['self_ms'] for entry in entries)
+    entries.sort(key=lambda entry: entry['cumulative_ms'], reverse=True)
+    return {'total_ms': total_ms, 'slowest': entries[:top]}
+
+
+def first_paint(env):
+    env = dict(env, BENCH_LAUNCH_TIME=repr(time.time()))
+    result = subprocess.run(
+        [sys.executable, '-c', FIRST_PAINT_SCRIPT],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    for line in result.stdout.splitlines():
+        if line.startswith('{'):
+            return json.loads(line)['first_paint_s']
+    raise RuntimeError('MainWindow was never painted:\n' + result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = child_env(os.path.join(tmp_dir, 'bench.db'))
+        paints = sorted(first_paint(env) for _ in range(args.repeat))
+        results = {
+            'imports': import_breakdown(env, args.top),
+            'first_paint_median_s': paints[len(paints) // 2],
+            'first_paint_min_s': paints[0],
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+# benchmarks/bench_suite.py
+"""Headless benchmarks for the data and reporting layers.
+
+Run from the repository root:
+
+    python benchmarks/bench_suite.py [--scales 10000,100000,1000000] [--output results.json]
+
+For every scale a synthetic database is generated once (and reused from
+--db-dir on later runs), then insert_record throughput, search_records
+latency percentiles, report query times and PDF generation time/peak memory
+are measured. Results are printed (or written) as JSON so runs of different
+versions can be compared.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import database
+
+DEFAULT_SCALES = [10000, 100000]
+SEED = 20240101
+
+# WMI prefiksi i modeli koji se najcesce javljaju u servisu
+MAKES = [
+    ('WVW', 'VW Golf'), ('WVW', 'VW Passat'), ('WVG', 'VW Tiguan'), ('WBA', 'BMW 320d'),
+    ('WDD', 'Mercedes C220'), ('VF1', 'Renault Megane'), ('VF3', 'Peugeot 308'),
+    ('ZFA', 'Fiat Punto'), ('TMB', 'Skoda Octavia'), ('WAU', 'Audi A4'), ('KMH', 'Hyundai i30'),
+]
+PLATE_CITIES = ['BG', 'NS', 'NI', 'KG', 'SU', 'SA', 'PA', 'KV', 'CA', 'ZR']
+# (tip_usluge_id, tezina, raspon cene)
+SERVICE_MIX = [(1, 45, (3000, 40000)), (2, 15, (15000, 45000)), (3, 25, (2000, 8000)),
+               (4, 10, (3000, 6000)), (5, 5, (5000, 12000))]
+VIN_CHARS = 'ABCDEFGHJKLMNPRSTUVWXYZ0123456789'
+YEARS_OF_HISTORY = 5
+
+
+def _vin(rng, wmi):
+    return wmi + ''.join(rng.choice(VIN_CHARS) for _ in range(14))
+
+
+def _plate(rng):
+    return f"{rng.choice(PLATE_CITIES)}-{rng.randint(100, 9999)}-{rng.choice('ABCDEFGHJKLMNPRSTUVZ')}{rng.choice('ABCDEFGHJKLMNPRSTUVZ')}"
+
+
+def generate_rows(count, rng):
+    """Yield insert tuples; about a third of the cars come back more than once."""
+    today = date.today()
+    first_day = today - timedelta(days=365 * YEARS_OF_HISTORY)
+    span = (today - first_day).days
+    fleet = []
+    service_ids = [service[0] for service in SERVICE_MIX]
+    weights = [service[1] for service in SERVICE_MIX]
+    prices = {service[0]: service[2] for service in SERVICE_MIX}
+    for _ in range(count):
+        if fleet and rng.random() < 0.35:
+            vin, plate, model = rng.choice(fleet)
+        else:
+            wmi, model = rng.choice(MAKES)
+            vin, plate = _vin(rng, wmi), _plate(rng)
+            fleet.append((vin, plate, model))
+        tip = rng.choices(service_ids, weights)[0]
+        datum = (first_day + timedelta(days=rng.randrange(span + 1))).isoformat()
+        yield (datum, vin, plate, model, tip, 'Redovan servis i provera', rng.randint(*prices[tip]))
+
+
+def build_database(path, count):
+    """Create (or reuse) a database with count synthetic records."""
+    database.set_db_path(path)
+    database.connect(backup=False)
+    existing = database.get_connection().execute('SELECT COUNT(*) FROM records').fetchone()[0]
+    if existing == count:
+        return 0.0
+    if existing:
+        database.close_connections()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        database.connect(backup=False)
+    rng = random.Random(SEED + count)
+    start = time.perf_counter()
+    chunk = []
+    with database.search_index_deferred():
+        for row in generate_rows(count, rng):
+            chunk.append(row)
+            if len(chunk) == 10000:
+                database.insert_records(chunk)
+                chunk = []
+        if chunk:
+            database.insert_records(chunk)
+    database.get_connection().execute('ANALYZE')
+    return time.perf_counter() - start
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+
+    def pick(fraction):
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+    return {
+        'count': len(samples),
+        'p50_ms': pick(0.50) * 1000,
+        'p90_ms': pick(0.90) * 1000,
+        'p99_ms': pick(0.99) * 1000,
+        'max_ms': samples[-1] * 1000,
+    }
+
+
+def bench_insert(count):
+    rng = random.Random(SEED)
+    rows = list(generate_rows(count, rng))
+    start = time.perf_counter()
+    ids = [database.insert_record(*row) for row in rows]
+    elapsed = time.perf_counter() - start
+    database.delete_records(ids)
+    return {'rows': count, 'seconds': elapsed, 'rows_per_s': count / elapsed}
+
+
+def bench_search(queries):
+    conn = database.get_connection()
+    vins = [row[0] for row in conn.execute('SELECT broj_sasije FROM records ORDER BY random() LIMIT ?', (queries,))]
+    plates = [row[0] for row in conn.execute('SELECT registarska_oznaka FROM records ORDER BY random() LIMIT ?', (queries,))]
+    rng = random.Random(SEED)
+    cases = {
+        'vin_substring': [(vin[rng.randrange(3, 10):][:6],) for vin in vins],
+        'vin_prefix': [(vin[:8], 'broj_sasije', 'prefix') for vin in vins],
+        'plate_exact': [(plate, 'registarska_oznaka', 'exact') for plate in plates],
+        'short_query': [(vin[5:7],) for vin in vins[:max(1, queries // 10)]],
+    }
+    results = {}
+    for name, calls in cases.items():
+        timings = []
+        for args in calls:
+            start = time.perf_counter()
+            database.search_records(*args)
+            timings.append(time.perf_counter() - start)
+        results[name] = percentiles(timings)
+    return results
+
+
+def bench_reports(repeat):
+    results = {}
+    for name, func in (('monthly', database.get_monthly_report), ('yearly', database.get_yearly_report),
+                       ('raw_year_range', lambda: database.get_report(
+                           date.today().replace(month=1, day=2).isoformat(), date.today().isoformat()))):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        results[name] = percentiles(timings)
+    return results
+
+
+def measure_memory(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    path = func(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    os.remove(path)
+    return {'seconds': elapsed, 'peak_bytes': peak}
+
+
+def bench_trends():
+    import analytics
+    start, end = analytics.trend_range()
+    begin = time.perf_counter()
+    analytics.compute_trends(start, end)
+    return {'compute_s': time.perf_counter() - begin}
+
+
+def bench_pdf():
+    import reports
+    import analytics
+    report_data = database.get_yearly_report() or [('MEHANIKA', 1, 1000.0, 1000)]
+    record = database.get_record_by_id(database.get_connection().execute('SELECT MAX(id) FROM records').fetchone()[0])
+    records = database.search_records_page('', limit=80)
+    # Prvi poziv parsira fontove; meri se i hladan i topao slucaj
+    return {
+        'report_cold': measure_memory(reports.build_report_pdf, report_data, 'Godisnji Izvestaj'),
+        'report_warm': measure_memory(reports.build_report_pdf, report_data, 'Godisnji Izvestaj'),
+        'work_order': measure_memory(reports.build_work_order_pdf, record),
+        'work_orders_80': measure_memory(reports.build_work_orders_pdf, records),
+        'trend_report': measure_memory(reports.build_trend_report_pdf, *analytics.trend_range(), 'Trend Izvestaj'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', default=','.join(str(scale) for scale in DEFAULT_SCALES))
+    parser.add_argument('--db-dir', default=os.path.join('benchmarks', 'data'))
+    parser.add_argument('--inserts', type=int, default=500)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    os.makedirs(args.db_dir, exist_ok=True)
+    results = {
+        'python': platform.python_version(),
+        'sqlite': database.sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'scales': {},
+    }
+    for scale in (int(value) for value in args.scales.split(',')):
+        path = os.path.join(args.db_dir, f'bench_{scale}.db')
+        print(f'scale {scale}: {path}', file=sys.stderr)
+        results['scales'][str(scale)] = {
+            'generate_s': build_database(path, scale),
+            'insert_record': bench_insert(args.inserts),
+            'search_records': bench_search(args.queries),
+            'reports': bench_reports(args.repeat),
+            'trends': bench_trends(),
+            'pdf': bench_pdf(),
+        }
+    database.close_connections()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+# benchmarks/bench_tip_usluge.py
+"""Service type registry versus JOINing tip_usluge on every query.
+
+Run from the repository root:
+
+    python benchmarks/bench_tip_usluge.py [--scales 100000,1000000] [--repeat 5]
+
+For every scale (databases are shared with bench_suite.py) the old queries,
+which join records to tip_usluge to resolve names, are timed against the
+current ones, which take names from database.py's memoized registry: a full
+listing, keyset pages, a search, reports over raw and whole-month ranges and
+the service type lookup done by every InsertForm. Results are printed (or
+written) as JSON.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from bench_suite import build_database, percentiles
+
+DEFAULT_SCALES = [100000, 1000000]
+
+# Upiti kakvi su bili pre registra
+JOIN_SELECT = '''
+    SELECT records.id, datum, broj_sasije, registarska_oznaka, marka_model, tip_usluge.naziv, opis_rada, cena
+    FROM records
+    JOIN tip_usluge ON records.tip_usluge_id = tip_usluge.id
+'''
+JOIN_REPORT = '''
+    SELECT tip_usluge.naziv, COUNT(*), AVG(cena), SUM(cena)
+    FROM records
+    JOIN tip_usluge ON records.tip_usluge_id = tip_usluge.id
+    WHERE datum >= ? AND datum < ?
+    GROUP BY tip_usluge.naziv
+'''
+JOIN_MONTH_REPORT = '''
+    SELECT tip_usluge.naziv, SUM(broj),
+           CAST(SUM(ukupno) AS REAL) / NULLIF(SUM(broj_cena), 0),
+           CASE WHEN SUM(broj_cena) > 0 THEN SUM(ukupno) END
+    FROM monthly_totals
+    JOIN tip_usluge ON monthly_totals.tip_usluge_id = tip_usluge.id
+    WHERE mesec >= ? AND mesec < ? AND broj > 0
+    GROUP BY tip_usluge.naziv
+'''
+
+
+def timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return percentiles(timings)
+
+
+def compare(join, registry, repeat):
+    # Isti rezultat je uslov da poredjenje ima smisla
+    if join() != registry():
+        raise AssertionError('JOIN and registry results differ')
+    result = {'join': timed(join, repeat), 'registry': timed(registry, repeat)}
+    result['speedup'] = result['join']['p50_ms'] / result['registry']['p50_ms']
+    return result
+
+
+def rounded(report):
+    # AVG iz SQLite-a i prosek izracunat u Pythonu se razlikuju tek na poslednjoj decimali
+    return [(naziv, broj, prosek if prosek is None else round(prosek, 6), ukupno)
+            for naziv, broj, prosek, ukupno in report]
+
+
+def fetch(sql, params=()):
+    return database.get_connection().execute(sql, params).fetchall()
+
+
+def pages(select, count=50, size=200):
+    # Keyset stranice kao u RecordsModel
+    after_id, rows = 0, []
+    for _ in range(count):
+        page = fetch(select + ' WHERE records.id > ? ORDER BY records.id LIMIT ?', (after_id, size))
+        rows.extend(page)
+        after_id = page[-1][0]
+    return rows
+
+
+def bench_scale(repeat):
+    registry = database._service_types().record_select
+    where, params = database._search_filter(database.get_connection(), 'WVW', 'broj_sasije', 'contains')
+    search = f' WHERE {where} ORDER BY records.id'
+    today = date.today()
+    raw_range = (date(today.year - 1, 1, 2).isoformat(), today.isoformat())
+    month_range = database.year_range(today.year - 1)
+
+    results = {
+        'listing_all': compare(lambda: fetch(JOIN_SELECT + ' ORDER BY records.id'),
+                               lambda: fetch(registry + ' ORDER BY records.id'), repeat),
+        'listing_pages_50x200': compare(lambda: pages(JOIN_SELECT), lambda: pages(registry), repeat * 4),
+        'search_contains': compare(lambda: fetch(JOIN_SELECT + search, params),
+                                   lambda: fetch(registry + search, params), repeat),
+        'report_raw_range': compare(lambda: rounded(fetch(JOIN_REPORT, raw_range)),
+                                    lambda: rounded(database.get_report(*raw_range)), repeat),
+        'report_months': compare(
+            lambda: rounded(fetch(JOIN_MONTH_REPORT, (month_range[0][:7], month_range[1][:7]))),
+            lambda: rounded(database.get_report(*month_range)), repeat * 20),
+        # Svako otvaranje InsertForm-a
+        'tip_usluge_list_x1000': compare(
+            lambda: [fetch('SELECT id, naziv FROM tip_usluge') for _ in range(1000)][-1],
+            lambda: [database.get_tip_usluge_list() for _ in range(1000)][-1], repeat),
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', default=','.join(str(scale) for scale in DEFAULT_SCALES))
+    parser.add_argument('--db-dir', default=os.path.join('benchmarks', 'data'))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    os.makedirs(args.db_dir, exist_ok=True)
+    results = {
+        'python': platform.python_version(),
+        'sqlite': database.sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'scales': {},
+    }
+    for scale in (int(value) for value in args.scales.split(',')):
+        path = os.path.join(args.db_dir, f'bench_{scale}.db')
+        print(f'scale {scale}: {path}', file=sys.stderr)
+        build_database(path, scale)
+        results['scales'][str(scale)] = bench_scale(args.repeat)
+    database.close_connections()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
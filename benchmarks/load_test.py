@@ -0,0 +1,230 @@
+# benchmarks/load_test.py
+"""Load test for server.py with simulated workstations.
+
+Run from the repository root:
+
+    python benchmarks/load_test.py [--records 100000] [--clients 8] [--seconds 20]
+
+A copy of a synthetic database (built by bench_suite.py and cached in
+--db-dir) is served by server.py in a subprocess. Every client thread is
+one workstation with its own keep-alive connection and ETag cache, doing a
+front-desk mix of browsing, searching, autocomplete, history lookups,
+reports and writes. Throughput, latency percentiles per operation, the
+share of 304 answers and the server's write batching are printed as JSON.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import argparse
+import tempfile
+import platform
+import threading
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.pop('DPFPA_SERVER', None)
+
+from api_client import ApiClient, ApiError, RECORD_FIELDS
+from bench_suite import SEED, build_database, generate_rows, percentiles
+import database
+
+# (operacija, tezina): uglavnom citanje, svaki deseti zahtev je upis
+MIX = [
+    ('browse', 30), ('search', 20), ('autocomplete', 15), ('history', 8), ('record', 10),
+    ('report', 5), ('insert', 8), ('update', 3), ('delete', 1),
+]
+# Pauza izmedju dva zahteva jedne radne stanice (sekundi); 0 = bez pauze
+THINK_TIME = 0.0
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(db_path, port, readers):
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'server.py'), '--db', db_path, '--port', str(port),
+         '--readers', str(readers), '--no-backup'],
+        cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    client = ApiClient(f'http://127.0.0.1:{port}')
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            client.get_json('/health')
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('server did not start:\n' + process.stdout.read())
+
+
+class Workstation(threading.Thread):
+    def __init__(self, number, url, stop, vins, max_id):
+        super().__init__(name=f'client-{number}', daemon=True)
+        self.client = ApiClient(url)
+        self.rng = random.Random(SEED + number)
+        self.stop = stop
+        self.vins = vins
+        self.max_id = max_id
+        self.rows = generate_rows(10 ** 6, random.Random(SEED + 1000 + number))
+        self.inserted = []
+        self.timings = {name: [] for name, _ in MIX}
+        self.errors = 0
+
+    def run(self):
+        names = [name for name, _ in MIX]
+        weights = [weight for _, weight in MIX]
+        while not self.stop.is_set():
+            name = self.rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                getattr(self, name)()
+            except (ApiError, OSError):
+                self.errors += 1
+                continue
+            self.timings[name].append(time.perf_counter() - start)
+            if THINK_TIME:
+                time.sleep(self.rng.expovariate(1 / THINK_TIME))
+
+    # Operacije jedne radne stanice
+
+    def browse(self):
+        # Vecina gleda prvu stranu (najnoviji unosi su na vrhu posle osvezavanja)
+        after_id = 0 if self.rng.random() < 0.7 else self.rng.randrange(self.max_id)
+        self.client.get_json('/records', q='', after_id=after_id, limit=200)
+
+    def search(self):
+        vin = self.rng.choice(self.vins)
+        self.client.get_json('/records/search', q=vin[self.rng.randrange(3, 10):][:6], limit=1001)
+
+    def autocomplete(self):
+        self.client.get_json('/vehicles', prefix=self.rng.choice(self.vins)[:self.rng.randint(3, 6)])
+
+    def history(self):
+        self.client.get_json(f'/vehicles/{self.rng.choice(self.vins)}/history')
+
+    def record(self):
+        try:
+            self.client.get_json(f'/records/{self.rng.randrange(1, self.max_id)}')
+        except ApiError as e:
+            if e.status != 404:
+                raise
+
+    def report(self):
+        self.client.get_json(self.rng.choice(['/reports/monthly', '/reports/yearly']))
+
+    def insert(self):
+        row = next(self.rows)
+        self.inserted.append(self.client.send_json('POST', '/records', dict(zip(RECORD_FIELDS, row)))['id'])
+
+    def update(self):
+        if self.inserted:
+            self.client.send_json('POST', '/records/update', {'ids': [self.rng.choice(self.inserted)],
+                                                              'cena': self.rng.randint(1000, 9000)})
+
+    def delete(self):
+        if self.inserted:
+            self.client.send_json('POST', '/records/delete', {'ids': [self.inserted.pop()]})
+
+
+def run_load(url, clients, seconds, vins, max_id):
+    stop = threading.Event()
+    workers = [Workstation(number, url, stop, vins, max_id) for number in range(clients)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    time.sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    timings = {name: [] for name, _ in MIX}
+    for worker in workers:
+        for name, samples in worker.timings.items():
+            timings[name].extend(samples)
+    requests = sum(len(samples) for samples in timings.values())
+    gets = sum(len(timings[name]) for name in ('browse', 'search', 'autocomplete', 'history', 'record', 'report'))
+    return {
+        'clients': clients,
+        'seconds': elapsed,
+        'requests': requests,
+        'requests_per_s': requests / elapsed,
+        'errors': sum(worker.errors for worker in workers),
+        'not_modified_share': sum(worker.client.not_modified for worker in workers) / max(gets, 1),
+        'all': percentiles([sample for samples in timings.values() for sample in samples]),
+        'operations': {name: percentiles(samples) for name, samples in timings.items() if samples},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=100000)
+    parser.add_argument('--clients', default='1,8,32', help='comma separated client counts, one run each')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--db-dir', default=os.path.join('benchmarks', 'data'))
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    os.makedirs(args.db_dir, exist_ok=True)
+    source = os.path.join(args.db_dir, f'bench_{args.records}.db')
+    print(f'database {source}', file=sys.stderr)
+    build_database(source, args.records)
+    conn = database.get_connection()
+    vins = [row[0] for row in conn.execute('SELECT broj_sasije FROM vehicles ORDER BY random() LIMIT 2000')]
+    max_id = conn.execute('SELECT MAX(id) FROM records').fetchone()[0]
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    database.close_connections()
+
+    # Server radi nad kopijom, kesirana baza ostaje netaknuta
+    workdir = tempfile.mkdtemp(prefix='dpfpa_load_')
+    db_path = os.path.join(workdir, 'load.db')
+    shutil.copyfile(source, db_path)
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'records': args.records,
+        'readers': args.readers,
+        'runs': [],
+    }
+    port = free_port()
+    server = start_server(db_path, port, args.readers)
+    url = f'http://127.0.0.1:{port}'
+    try:
+        for clients in (int(value) for value in args.clients.split(',')):
+            print(f'{clients} clients', file=sys.stderr)
+            before = ApiClient(url).get_json('/stats')
+            run = run_load(url, clients, args.seconds, vins, max_id)
+            after = ApiClient(url).get_json('/stats')
+            writes = after.get('writes', 0) - before.get('writes', 0)
+            batches = after.get('write_batches', 0) - before.get('write_batches', 0)
+            run['server'] = {
+                'response_cache_hits': after.get('cache_hits', 0) - before.get('cache_hits', 0),
+                'writes': writes,
+                'write_batches': batches,
+                'writes_per_batch': writes / batches if batches else 0,
+            }
+            results['runs'].append(run)
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# bulk_edit_form.py
+from PyQt5.QtWidgets import (
+    QDialog, QFormLayout, QCheckBox, QComboBox, QLineEdit, QDialogButtonBox, QMessageBox
+)
+from PyQt5.QtGui import QIcon
+from database import update_records, get_tip_usluge_list
+
+
+class BulkEditForm(QDialog):
+    """Change the service type and/or price of many records at once."""
+
+    def __init__(self, record_ids, parent=None):
+        super().__init__(parent)
+        self.record_ids = list(record_ids)
+        self.setWindowTitle(f'Izmena {len(self.record_ids)} zapisa')
+        self.setWindowIcon(QIcon('./tb.ico'))
+        self.initUI()
+
+    def initUI(self):
+        layout = QFormLayout()
+
+        # Menja se samo ono sto je cekirano
+        self.tip_usluge_check = QCheckBox('Tip usluge:')
+        self.tip_usluge_input = QComboBox()
+        for tip in get_tip_usluge_list():
+            self.tip_usluge_input.addItem(tip[1], tip[0])  # tip[1]=naziv, tip[0]=id
+        self.tip_usluge_input.setEnabled(False)
+        self.tip_usluge_check.toggled.connect(self.tip_usluge_input.setEnabled)
+
+        self.cena_check = QCheckBox('Cena:')
+        self.cena_input = QLineEdit()
+        self.cena_input.setEnabled(False)
+        self.cena_check.toggled.connect(self.cena_input.setEnabled)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.submit)
+        buttons.rejected.connect(self.reject)
+
+        layout.addRow(self.tip_usluge_check, self.tip_usluge_input)
+        layout.addRow(self.cena_check, self.cena_input)
+        layout.addRow(buttons)
+        self.setLayout(layout)
+
+    def submit(self):
+        tip_usluge_id = self.tip_usluge_input.currentData() if self.tip_usluge_check.isChecked() else None
+        cena = None
+        if self.cena_check.isChecked():
+            cena_text = self.cena_input.text()
+            if not cena_text.isdigit():
+                QMessageBox.warning(self, 'Error', 'Cena mora biti broj.')
+                return
+            cena = int(cena_text)
+        if tip_usluge_id is None and cena is None:
+            QMessageBox.warning(self, 'Error', 'Izaberite sta se menja.')
+            return
+
+        # Jedan UPDATE ... WHERE id IN za sve izabrane zapise
+        update_records(self.record_ids, tip_usluge_id=tip_usluge_id, cena=cena)
+        self.accept()
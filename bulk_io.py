@@ -0,0 +1,190 @@
+# bulk_io.py
+"""Bulk import and export of service records (CSV and JSON Lines).
+
+Import streams the input file, validates each row, resolves tip_usluge by
+name and inserts in chunks of CHUNK_SIZE rows, one transaction per chunk.
+Export streams rows from a search cursor, so memory use does not depend on
+the number of records.
+
+    python bulk_io.py import records.csv
+    python bulk_io.py export records.jsonl [--search WVW]
+"""
+import os
+import csv
+import json
+import argparse
+import contextlib
+from datetime import date
+from database import (
+    connect, insert_records, iter_search_records, get_tip_usluge_list, search_index_deferred
+)
+
+# Broj redova po transakciji pri uvozu
+CHUNK_SIZE = 5000
+# Za vece fajlove se pretrazni indeks gradi jednom na kraju umesto red po red
+DEFER_INDEX_BYTES = 5 * 1024 * 1024
+
+FIELDS = ['id', 'datum', 'broj_sasije', 'registarska_oznaka', 'marka_model', 'tip_usluge', 'opis_rada', 'cena']
+REQUIRED_FIELDS = ['datum', 'broj_sasije', 'registarska_oznaka', 'marka_model', 'tip_usluge']
+
+
+class ImportResult:
+    def __init__(self):
+        self.inserted = 0
+        self.errors = []  # (line number, message)
+
+    def __repr__(self):
+        return f'ImportResult(inserted={self.inserted}, errors={len(self.errors)})'
+
+
+def _detect_format(path, fmt):
+    if fmt:
+        return fmt
+    ext = os.path.splitext(path)[1].lower()
+    return 'jsonl' if ext in ('.jsonl', '.ndjson') else 'csv'
+
+
+def _read_rows(path, fmt):
+    """Yield (line number, dict) pairs from a CSV or JSON Lines file."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_num, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_num, json.loads(line)
+                except ValueError as e:
+                    yield line_num, e
+
+
+def _tip_usluge_ids():
+    # Naziv -> id; stari zapisi smeju da imaju i povucen tip usluge
+    return {naziv.strip().upper(): tip_id for tip_id, naziv in get_tip_usluge_list(include_retired=True)}
+
+
+def _validate(row, tip_ids):
+    """Convert an input row to an insert tuple, or raise ValueError."""
+    if not isinstance(row, dict):
+        raise ValueError(f'Neispravan red: {row}')
+    for field in REQUIRED_FIELDS:
+        if not str(row.get(field) or '').strip():
+            raise ValueError(f'Nedostaje polje {field}')
+
+    datum = str(row['datum']).strip()
+    if len(datum) != 10:
+        raise ValueError(f'Datum mora biti u formatu yyyy-mm-dd: {datum}')
+    date.fromisoformat(datum)
+
+    tip_usluge = str(row['tip_usluge']).strip()
+    tip_usluge_id = tip_ids.get(tip_usluge.upper())
+    if tip_usluge_id is None:
+        raise ValueError(f'Nepoznat tip usluge: {tip_usluge}')
+
+    cena = row.get('cena')
+    if cena in (None, ''):
+        cena = None
+    else:
+        cena = int(cena)
+
+    return (datum, str(row['broj_sasije']).strip(), str(row['registarska_oznaka']).strip(),
+            str(row['marka_model']).strip(), tip_usluge_id, str(row.get('opis_rada') or ''), cena)
+
+
+def import_records(path, fmt=None, chunk_size=CHUNK_SIZE, progress=None, defer_index=None):
+    """Import records from a CSV or JSON Lines file.
+
+    Columns/keys are the FIELDS names (id is ignored, tip_usluge is the
+    service type name). Invalid rows are skipped and reported in the
+    returned ImportResult; valid rows are inserted chunk by chunk.
+    progress, if given, is called with the number of rows inserted so far.
+    defer_index rebuilds the search index once at the end; by default this
+    is done for files of DEFER_INDEX_BYTES or more.
+    """
+    fmt = _detect_format(path, fmt)
+    if defer_index is None:
+        defer_index = os.path.getsize(path) >= DEFER_INDEX_BYTES
+    with search_index_deferred() if defer_index else contextlib.nullcontext():
+        return _import_rows(path, fmt, chunk_size, progress)
+
+
+def _import_rows(path, fmt, chunk_size, progress):
+    tip_ids = _tip_usluge_ids()
+    result = ImportResult()
+    chunk = []
+
+    def flush():
+        insert_records(chunk)
+        result.inserted += len(chunk)
+        chunk.clear()
+        if progress is not None:
+            progress(result.inserted)
+
+    for line_num, row in _read_rows(path, fmt):
+        try:
+            if isinstance(row, Exception):
+                raise row
+            chunk.append(_validate(row, tip_ids))
+        except ValueError as e:
+            result.errors.append((line_num, str(e)))
+            continue
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return result
+
+
+def export_records(path, fmt=None, search='', progress=None, progress_every=CHUNK_SIZE):
+    """Stream records matching search (all records by default) to a CSV or JSON Lines file.
+
+    Returns the number of rows written.
+    """
+    fmt = _detect_format(path, fmt)
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f) if fmt == 'csv' else None
+        if writer:
+            writer.writerow(FIELDS)
+        for row in iter_search_records(search, batch_size=CHUNK_SIZE):
+            if writer:
+                writer.writerow(row)
+            else:
+                f.write(json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False))
+                f.write('\n')
+            count += 1
+            if progress is not None and count % progress_every == 0:
+                progress(count)
+    if progress is not None:
+        progress(count)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Uvoz i izvoz servisnih zapisa (CSV / JSON Lines)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    import_parser = subparsers.add_parser('import')
+    import_parser.add_argument('path')
+    import_parser.add_argument('--format', choices=['csv', 'jsonl'])
+    export_parser = subparsers.add_parser('export')
+    export_parser.add_argument('path')
+    export_parser.add_argument('--format', choices=['csv', 'jsonl'])
+    export_parser.add_argument('--search', default='', help='Broj sasije (deo) za filtriranje')
+    args = parser.parse_args()
+
+    connect()
+    if args.command == 'import':
+        result = import_records(args.path, args.format, progress=lambda n: print(f'{n} uneto', end='\r'))
+        print(f'\n{result.inserted} zapisa uneto, {len(result.errors)} gresaka')
+        for line_num, message in result.errors[:50]:
+            print(f'  red {line_num}: {message}')
+    else:
+        count = export_records(args.path, args.format, args.search)
+        print(f'{count} zapisa izvezeno u {args.path}')
+
+
+if __name__ == '__main__':
+    main()
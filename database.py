@@ -1,10 +1,237 @@
 # database.py
+import os
+import heapq
+import atexit
 import sqlite3
-from datetime import datetime
+import logging
+import itertools
+import contextlib
+import threading
+import weakref
+from datetime import date, datetime
+from diagnostics import profiled
 
-def connect():
-    conn = sqlite3.connect('app_data.db')
-    cursor = conn.cursor()
+# Putanja do baze; moze se promeniti preko DPFPA_DB_PATH ili set_db_path()
+DB_PATH = os.environ.get('DPFPA_DB_PATH', 'app_data.db')
+# Adresa server.py (npr. http://192.168.1.10:8765); ako je postavljena, baza se ne otvara lokalno
+SERVER_URL = os.environ.get('DPFPA_SERVER')
+
+# Pragme koje se postavljaju na svaku novu konekciju
+PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -16000),      # ~16 MB page cache
+    ('mmap_size', 268435456),    # 256 MB memory-mapped I/O
+    ('temp_store', 'MEMORY'),
+    ('busy_timeout', 5000),
+)
+
+# Broj pripremljenih upita koje sqlite3 kesira po konekciji
+CACHED_STATEMENTS = 256
+
+# Kolone pokrivene FTS5 trigram indeksom
+SEARCH_COLUMNS = ('broj_sasije', 'registarska_oznaka', 'marka_model', 'opis_rada')
+# Kolone sa b-tree indeksom za exact/prefix pretragu
+INDEXED_COLUMNS = ('broj_sasije', 'registarska_oznaka')
+# Trigram indeks ne moze da pomogne za krace upite
+MIN_TRIGRAM_LENGTH = 3
+
+# Naziv tipa usluge dolazi iz registra (_service_types), ne iz JOIN-a na tip_usluge
+RECORD_SELECT = '''
+    SELECT records.id, datum, broj_sasije, registarska_oznaka, marka_model, {tip_usluge_naziv}, opis_rada, cena
+    FROM records
+'''
+
+# Najvise id-jeva u jednoj IN (...) listi (SQLite ogranicava broj parametara)
+ID_CHUNK_SIZE = 500
+
+# Id vozila za dati broj sasije (jedinstveni indeks na vehicles)
+VEHICLE_ID = '(SELECT id FROM vehicles WHERE broj_sasije = ?)'
+INSERT_RECORD = f'''
+    INSERT INTO records (datum, broj_sasije, registarska_oznaka, marka_model, tip_usluge_id, opis_rada, cena, vehicle_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, {VEHICLE_ID})
+'''
+
+logger = logging.getLogger(__name__)
+_local = threading.local()
+_connections = weakref.WeakSet()  # _ThreadConnection svih zivih niti
+_connections_lock = threading.Lock()
+_change_listeners = []
+_trace_callback = None
+_service_types_snapshot = None
+_service_types_lock = threading.Lock()
+
+
+def set_db_path(path):
+    """Switch the database file used by all functions in this module."""
+    global DB_PATH
+    close_connections()
+    DB_PATH = path
+    reload_tip_usluge()
+
+
+class _ThreadConnection:
+    """Owns one thread's connection and closes it when the thread exits.
+
+    Only the thread's _local refers to it, so when the thread ends (an idle
+    QThreadPool worker, a server request thread) its locals are dropped and
+    the connection with its WAL and shm file handles is closed right away.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def close(self):
+        try:
+            self.conn.close()
+        except sqlite3.ProgrammingError:
+            pass
+
+    def __del__(self):
+        self.close()
+
+
+def get_connection():
+    """Return the long-lived connection for the calling thread.
+
+    Each thread gets its own connection which is opened once, configured with
+    PRAGMAS and then reused, so the statement cache survives between calls.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.path == DB_PATH:
+        return conn
+    conn = sqlite3.connect(DB_PATH, cached_statements=CACHED_STATEMENTS, check_same_thread=False)
+    for name, value in PRAGMAS:
+        conn.execute(f'PRAGMA {name} = {value}')
+    if _trace_callback is not None:
+        conn.set_trace_callback(_trace_callback)
+    owner = _ThreadConnection(conn)
+    _local.owner = owner
+    _local.conn = conn
+    _local.path = DB_PATH
+    _local.has_fts = None
+    _local.archive_attached = False
+    with _connections_lock:
+        _connections.add(owner)
+    return conn
+
+
+def close_connections():
+    """Close every connection opened by this module (all threads)."""
+    with _connections_lock:
+        owners = list(_connections)
+        _connections.clear()
+    for owner in owners:
+        owner.close()
+    _local.__dict__.clear()
+
+
+atexit.register(close_connections)
+
+
+def set_trace_callback(callback):
+    """Install callback(sql) on every open and future connection (None removes it)."""
+    global _trace_callback
+    _trace_callback = callback
+    with _connections_lock:
+        owners = list(_connections)
+    for owner in owners:
+        owner.conn.set_trace_callback(callback)
+
+
+class SchemaError(Exception):
+    pass
+
+
+class ArchivedRecordError(Exception):
+    """Raised when a write targets archived (read-only) records."""
+
+    def __init__(self, record_ids):
+        super().__init__(f'Archived records are read-only: {", ".join(map(str, record_ids))}')
+        self.record_ids = record_ids
+
+
+def connect(backup=True):
+    """Bring the database schema up to SCHEMA_VERSION.
+
+    The schema version lives in PRAGMA user_version, so a current database
+    costs a single pragma read on startup and no DDL at all. backup=False
+    skips the pre-migration backup (for throwaway databases).
+    """
+    conn = get_connection()
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version != SCHEMA_VERSION:
+        migrate(conn, version, backup)
+        reload_tip_usluge()
+    _local.has_fts = None
+    repair_search_index(conn)
+    # Arhiviranje prekinuto izmedju upisa segmenta i brisanja ostavlja zapise na oba mesta
+    archive = attach_archive(conn)
+    if archive is not None and conn.execute(
+            "SELECT 1 FROM archive.sqlite_master WHERE name = 'segments'").fetchone() is not None:
+        archive.finish_moves(conn)
+
+
+SEARCH_INDEX_TRIGGERS = ('records_fts_ai', 'records_fts_ad', 'records_fts_au')
+
+
+def repair_search_index(conn):
+    """Recreate missing FTS triggers and rebuild the index; True if a repair was needed.
+
+    search_index_deferred drops the insert trigger for the duration of a bulk
+    import; if the process dies before it is restored, rows inserted later
+    would never reach the index and substring search would miss them.
+    """
+    wanted = ('records_fts',) + SEARCH_INDEX_TRIGGERS
+    names = {row[0] for row in conn.execute(
+        f"SELECT name FROM sqlite_master WHERE name IN ({', '.join('?' * len(wanted))})", wanted)}
+    if 'records_fts' not in names or names.issuperset(SEARCH_INDEX_TRIGGERS):
+        return False
+    with conn:
+        create_search_index(conn.cursor(), rebuild=True)
+    return True
+
+
+def migrate(conn, version, backup=True):
+    """Apply every migration newer than version, each in its own transaction.
+
+    A backup of the database is taken first (unless it holds no records), so
+    a failed upgrade can always be rolled back by restoring it. Progress is
+    logged (logger 'database'), never printed: the caller may be the GUI, the
+    server or a benchmark writing JSON to stdout.
+    """
+    if version > SCHEMA_VERSION:
+        raise SchemaError(f'Baza je verzije {version}, aplikacija podrzava najvise {SCHEMA_VERSION}')
+    if backup and _has_records(conn):
+        from backup import create_backup
+        path = create_backup(DB_PATH)
+        logger.info('Backup before migration: %s', path)
+    for target, description, upgrade in MIGRATIONS:
+        if target <= version:
+            continue
+        with conn:
+            # DDL ne otvara transakciju sam od sebe; BEGIN IMMEDIATE i zbog drugih procesa
+            conn.execute('BEGIN IMMEDIATE')
+            if conn.execute('PRAGMA user_version').fetchone()[0] >= target:
+                continue
+            upgrade(conn.cursor())
+            conn.execute(f'PRAGMA user_version = {target}')
+        logger.info('Migrated database to version %d: %s', target, description)
+
+
+def schema_version():
+    return get_connection().execute('PRAGMA user_version').fetchone()[0]
+
+
+def _has_records(conn):
+    if DB_PATH == ':memory:':
+        return False
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'records'").fetchone():
+        return False
+    return conn.execute('SELECT 1 FROM records LIMIT 1').fetchone() is not None
+
+
+def create_tables(cursor):
     # Create the records table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS records (
@@ -16,7 +243,9 @@ def connect():
             tip_usluge_id INTEGER NOT NULL,
             opis_rada TEXT,
             cena INTEGER,
-            FOREIGN KEY (tip_usluge_id) REFERENCES tip_usluge(id)
+            vehicle_id INTEGER,
+            FOREIGN KEY (tip_usluge_id) REFERENCES tip_usluge(id),
+            FOREIGN KEY (vehicle_id) REFERENCES vehicles(id)
         )
     ''')
     # Create the tip_usluge table
@@ -33,111 +262,879 @@ def connect():
         # Insert some default service types
         tipovi_usluge = ['MEHANIKA', 'DPF', 'GUME', 'DOPUNA KLIME', 'SERVIS KLIME']
         cursor.executemany('INSERT INTO tip_usluge (naziv) VALUES (?)', [(tip,) for tip in tipovi_usluge])
-    conn.commit()
-    conn.close()
 
-def insert_record(datum, broj_sasije, registarska_oznaka, marka_model, tip_usluge_id, opis_rada, cena):
-    conn = sqlite3.connect('app_data.db')
-    cursor = conn.cursor()
+
+def create_indexes(cursor):
+    # B-tree indexes for exact/prefix VIN and plate lookups
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_records_broj_sasije ON records(broj_sasije COLLATE NOCASE)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_records_registarska_oznaka ON records(registarska_oznaka COLLATE NOCASE)')
+    # Covering index so date-range reports are an index range scan
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_records_datum ON records(datum, tip_usluge_id, cena)')
+
+
+def create_search_index(cursor, rebuild=False):
+    """Create the FTS5 trigram index over the searchable columns.
+
+    The index is an external-content table kept in sync with records by
+    triggers. Missing triggers are recreated and the index is rebuilt when
+    the table is new or rebuild is True. Returns False when this SQLite build
+    lacks FTS5 or the trigram tokenizer; search_records then falls back to
+    LIKE scans.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'records_fts'")
+    if not cursor.fetchone():
+        try:
+            cursor.execute(f'''
+                CREATE VIRTUAL TABLE records_fts USING fts5(
+                    {', '.join(SEARCH_COLUMNS)},
+                    content='records', content_rowid='id', tokenize='trigram'
+                )
+            ''')
+        except sqlite3.OperationalError:
+            return False
+        rebuild = True
+    columns = ', '.join(SEARCH_COLUMNS)
+    new_values = ', '.join(f'new.{column}' for column in SEARCH_COLUMNS)
+    old_values = ', '.join(f'old.{column}' for column in SEARCH_COLUMNS)
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS records_fts_ai AFTER INSERT ON records BEGIN
+            INSERT INTO records_fts (rowid, {columns}) VALUES (new.id, {new_values});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS records_fts_ad AFTER DELETE ON records BEGIN
+            INSERT INTO records_fts (records_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS records_fts_au AFTER UPDATE OF {columns} ON records BEGIN
+            INSERT INTO records_fts (records_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO records_fts (rowid, {columns}) VALUES (new.id, {new_values});
+        END
+    ''')
+    if rebuild:
+        # Index rows that existed before the FTS table (or trigger) was created
+        cursor.execute("INSERT INTO records_fts (records_fts) VALUES ('rebuild')")
+    return True
+
+
+@contextlib.contextmanager
+def search_index_deferred():
+    """Suspend FTS maintenance on insert and rebuild the index once on exit.
+
+    Rebuilding the trigram index in one pass is several times cheaper than
+    updating it row by row, which matters for large bulk imports.
+    """
+    conn = get_connection()
+    if not _has_search_index(conn):
+        yield
+        return
+    with conn:
+        conn.execute('DROP TRIGGER IF EXISTS records_fts_ai')
+    try:
+        yield
+    finally:
+        with conn:
+            create_search_index(conn.cursor(), rebuild=True)
+
+
+def create_vehicles(cursor):
+    """Create the vehicles table and link existing records to it.
+
+    Every distinct broj_sasije becomes one vehicle holding its most recent
+    plate and make/model; records.vehicle_id points at it, so the history of
+    a car is an index lookup instead of a text scan. Runs only once, when the
+    table does not exist yet.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'vehicles'")
+    if cursor.fetchone():
+        return
     cursor.execute('''
-        INSERT INTO records (datum, broj_sasije, registarska_oznaka, marka_model, tip_usluge_id, opis_rada, cena)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (datum, broj_sasije, registarska_oznaka, marka_model, tip_usluge_id, opis_rada, cena))
-    conn.commit()
-    conn.close()
+        CREATE TABLE vehicles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            broj_sasije TEXT NOT NULL UNIQUE COLLATE NOCASE,
+            registarska_oznaka TEXT NOT NULL,
+            marka_model TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX idx_vehicles_registarska_oznaka ON vehicles(registarska_oznaka COLLATE NOCASE)')
+    columns = [row[1] for row in cursor.execute('PRAGMA table_info(records)')]
+    if 'vehicle_id' not in columns:
+        cursor.execute('ALTER TABLE records ADD COLUMN vehicle_id INTEGER REFERENCES vehicles(id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_records_vehicle_id ON records(vehicle_id, datum)')
 
-def update_record(record_id, datum, broj_sasije, registarska_oznaka, marka_model, tip_usluge_id, opis_rada, cena):
-    """Update an existing record by its ID."""
-    conn = sqlite3.connect('app_data.db')
-    cursor = conn.cursor()
+    # Redosled po datumu: poslednji servis odredjuje tablice i model vozila
+    cursor.execute('''
+        INSERT INTO vehicles (broj_sasije, registarska_oznaka, marka_model)
+        SELECT broj_sasije, registarska_oznaka, marka_model FROM records
+        WHERE broj_sasije != ''
+        ORDER BY datum, id
+        ON CONFLICT (broj_sasije) DO UPDATE SET
+            registarska_oznaka = excluded.registarska_oznaka,
+            marka_model = excluded.marka_model
+    ''')
+    # vehicle_id nije u pretraznom indeksu; stari okidac bi ga azurirao za svaki red
+    cursor.execute('DROP TRIGGER IF EXISTS records_fts_au')
+    cursor.execute('''
+        UPDATE records SET vehicle_id = (SELECT id FROM vehicles WHERE vehicles.broj_sasije = records.broj_sasije)
+    ''')
+
+
+def create_monthly_totals(cursor):
+    """Create the per-month, per-service summary table and its triggers.
+
+    monthly_totals holds COUNT(*), COUNT(cena) and SUM(cena) for every
+    (mesec, tip_usluge_id) pair and is maintained by triggers on records, so
+    reports read months x service types rows instead of every record.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'monthly_totals'")
+    if cursor.fetchone():
+        return
+    cursor.execute('''
+        CREATE TABLE monthly_totals (
+            mesec TEXT NOT NULL,
+            tip_usluge_id INTEGER NOT NULL,
+            broj INTEGER NOT NULL DEFAULT 0,
+            broj_cena INTEGER NOT NULL DEFAULT 0,
+            ukupno INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (mesec, tip_usluge_id)
+        ) WITHOUT ROWID
+    ''')
+    add_new = '''
+        INSERT INTO monthly_totals (mesec, tip_usluge_id, broj, broj_cena, ukupno)
+        VALUES (substr(new.datum, 1, 7), new.tip_usluge_id, 1, new.cena IS NOT NULL, coalesce(new.cena, 0))
+        ON CONFLICT (mesec, tip_usluge_id) DO UPDATE SET
+            broj = broj + 1,
+            broj_cena = broj_cena + excluded.broj_cena,
+            ukupno = ukupno + excluded.ukupno;
+    '''
+    remove_old = '''
+        UPDATE monthly_totals SET
+            broj = broj - 1,
+            broj_cena = broj_cena - (old.cena IS NOT NULL),
+            ukupno = ukupno - coalesce(old.cena, 0)
+        WHERE mesec = substr(old.datum, 1, 7) AND tip_usluge_id = old.tip_usluge_id;
+    '''
+    cursor.execute(f'CREATE TRIGGER monthly_totals_ai AFTER INSERT ON records BEGIN {add_new} END')
+    cursor.execute(f'CREATE TRIGGER monthly_totals_ad AFTER DELETE ON records BEGIN {remove_old} END')
+    cursor.execute(f'''
+        CREATE TRIGGER monthly_totals_au AFTER UPDATE OF datum, tip_usluge_id, cena ON records BEGIN
+            {remove_old} {add_new}
+        END
+    ''')
+    _fill_monthly_totals(cursor)
+
+
+def cover_vehicle_in_datum_index(cursor):
+    # Analitika cita i vehicle_id za opseg datuma; indeks ostaje pokrivajuci
+    cursor.execute('DROP INDEX IF EXISTS idx_records_datum')
+    cursor.execute('CREATE INDEX idx_records_datum ON records(datum, tip_usluge_id, cena, vehicle_id)')
+
+
+def add_tip_usluge_aktivan(cursor):
+    # Povuceni tipovi ostaju zbog starih zapisa, ali se ne nude za nove
+    cursor.execute('ALTER TABLE tip_usluge ADD COLUMN aktivan INTEGER NOT NULL DEFAULT 1')
+
+
+# (verzija, opis, funkcija(cursor)). Nove izmene seme se dodaju na kraj; postojece se ne menjaju.
+# Migracije 1-5 su idempotentne jer baze od pre user_version mogu vec imati deo seme.
+MIGRATIONS = [
+    (1, 'records and tip_usluge tables', create_tables),
+    (2, 'lookup and report indexes', create_indexes),
+    (3, 'vehicles table', create_vehicles),
+    (4, 'FTS5 search index', create_search_index),
+    (5, 'monthly_totals summary table', create_monthly_totals),
+    (6, 'vehicle_id in the date index', cover_vehicle_in_datum_index),
+    (7, 'aktivan flag on tip_usluge', add_tip_usluge_aktivan),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def _fill_monthly_totals(cursor):
+    cursor.execute('DELETE FROM monthly_totals')
     cursor.execute('''
-        UPDATE records
-        SET datum = ?, broj_sasije = ?, registarska_oznaka = ?, marka_model = ?, tip_usluge_id = ?, opis_rada = ?, cena = ?
-        WHERE id = ?
-    ''', (datum, broj_sasije, registarska_oznaka, marka_model, tip_usluge_id, opis_rada, cena, record_id))
-    conn.commit()
-    conn.close()
+        INSERT INTO monthly_totals (mesec, tip_usluge_id, broj, broj_cena, ukupno)
+        SELECT substr(datum, 1, 7), tip_usluge_id, COUNT(*), COUNT(cena), coalesce(SUM(cena), 0)
+        FROM records
+        GROUP BY substr(datum, 1, 7), tip_usluge_id
+    ''')
+
+
+def rebuild_monthly_totals():
+    """Recompute monthly_totals from records, e.g. after manual edits of the file."""
+    conn = get_connection()
+    with conn:
+        _fill_monthly_totals(conn.cursor())
+
+
+def _has_search_index(conn):
+    if _local.has_fts is None:
+        row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'records_fts'").fetchone()
+        _local.has_fts = row is not None
+    return _local.has_fts
+
+def archive_path():
+    """Path of the archive next to DB_PATH (see archive.py): app_data.db -> app_data_archive.db."""
+    return os.path.splitext(DB_PATH)[0] + '_archive.db'
+
+
+def attach_archive(conn, create=False):
+    """Attach the archive to conn as schema 'archive' and return the archive module.
+
+    Returns None when there is no archive file (unless create is True), so
+    databases that were never archived do not even import archive.py.
+    """
+    if not _local.archive_attached:
+        path = archive_path()
+        if DB_PATH == ':memory:' or not (create or os.path.exists(path)):
+            return None
+        conn.execute('ATTACH DATABASE ? AS archive', (path,))
+        _local.archive_attached = True
+    import archive
+    return archive
+
+
+def _merge_by_id(hot, archived, limit=None):
+    """Merge two id-ordered row streams (live and archived records), keeping at most limit rows."""
+    rows = heapq.merge(hot, archived, key=lambda row: row[0])
+    return list(rows if limit is None else itertools.islice(rows, limit))
+
+
+def archived_record_ids(record_ids):
+    """Return those of record_ids that are archived (read-only)."""
+    conn = get_connection()
+    archive = attach_archive(conn)
+    return archive.archived_ids(conn, record_ids) if archive is not None else []
+
+
+def add_change_listener(callback):
+    """Register callback(kind, record_ids), called after records are committed.
+
+    kind is 'inserted', 'updated' or 'deleted' ('reset' with no ids when a
+    service type changed, or in client mode when changes were missed).
+    Callbacks run on the thread that made the change.
+    """
+    _change_listeners.append(callback)
+
+def remove_change_listener(callback):
+    if callback in _change_listeners:
+        _change_listeners.remove(callback)
+
+def _notify(kind, record_ids):
+    for callback in list(_change_listeners):
+        callback(kind, list(record_ids))
+
+def _add_vehicles(conn, vehicles):
+    """Insert (broj_sasije, registarska_oznaka, marka_model) rows for cars not in vehicles yet."""
+    conn.executemany('''
+        INSERT INTO vehicles (broj_sasije, registarska_oznaka, marka_model) VALUES (?, ?, ?)
+        ON CONFLICT (broj_sasije) DO NOTHING
+    ''', [vehicle for vehicle in vehicles if vehicle[0]])
+
+
+def _refresh_vehicles(conn, vins):
+    """Take the plate and make/model of each car from its newest record (by datum, then id).
+
+    Called after records are written, so the result does not depend on the
+    order in which records were entered, edited or imported; create_vehicles
+    uses the same order. Cars left without records keep their last values.
+    """
+    conn.executemany('''
+        UPDATE vehicles SET (registarska_oznaka, marka_model) = (
+            SELECT registarska_oznaka, marka_model FROM records
+            WHERE records.vehicle_id = vehicles.id
+            ORDER BY datum DESC, id DESC LIMIT 1
+        )
+        WHERE broj_sasije = ? AND EXISTS (SELECT 1 FROM records WHERE records.vehicle_id = vehicles.id)
+    ''', [(vin,) for vin in set(vins) if vin])
+
+def insert_record(datum, broj_sasije, registarska_oznaka, marka_model, tip_usluge_id, opis_rada, cena):
+    conn = get_connection()
+    with conn:
+        _add_vehicles(conn, [(broj_sasije, registarska_oznaka, marka_model)])
+        cursor = conn.execute(INSERT_RECORD, (datum, broj_sasije, registarska_oznaka, marka_model,
+                                              tip_usluge_id, opis_rada, cena, broj_sasije))
+        _refresh_vehicles(conn, [broj_sasije])
+    _notify('inserted', [cursor.lastrowid])
+    return cursor.lastrowid
+
+def insert_records(rows):
+    """Insert many records in one transaction.
+
+    rows is an iterable of (datum, broj_sasije, registarska_oznaka,
+    marka_model, tip_usluge_id, opis_rada, cena) tuples. Returns the new
+    record ids in the order of rows.
+    """
+    rows = list(rows)
+    conn = get_connection()
+    with conn:
+        _add_vehicles(conn, [row[1:4] for row in rows])
+        cursor = conn.executemany(INSERT_RECORD, [tuple(row) + (row[1],) for row in rows])
+        _refresh_vehicles(conn, [row[1] for row in rows])
+        # AUTOINCREMENT ids inside one write transaction are consecutive
+        last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+    record_ids = list(range(last_id - cursor.rowcount + 1, last_id + 1)) if cursor.rowcount > 0 else []
+    if record_ids:
+        _notify('inserted', record_ids)
+    return record_ids
+
+def _check_not_archived(conn, record_ids):
+    # Arhivirani zapisi nisu u records, pa bi UPDATE/DELETE nad njima tiho prosao bez efekta
+    archive = attach_archive(conn)
+    archived = archive.archived_ids(conn, record_ids) if archive is not None else []
+    if archived:
+        raise ArchivedRecordError(archived)
+
+def update_record(record_id, datum, broj_sasije, registarska_oznaka, marka_model, tip_usluge_id, opis_rada, cena):
+    """Update an existing record by its ID; raises ArchivedRecordError for an archived record."""
+    conn = get_connection()
+    _check_not_archived(conn, [record_id])
+    with conn:
+        # Vozilo sa kog je zapis eventualno premesten takodje se osvezava
+        previous = conn.execute('SELECT broj_sasije FROM records WHERE id = ?', (record_id,)).fetchone()
+        _add_vehicles(conn, [(broj_sasije, registarska_oznaka, marka_model)])
+        conn.execute(f'''
+            UPDATE records
+            SET datum = ?, broj_sasije = ?, registarska_oznaka = ?, marka_model = ?, tip_usluge_id = ?, opis_rada = ?, cena = ?,
+                vehicle_id = {VEHICLE_ID}
+            WHERE id = ?
+        ''', (datum, broj_sasije, registarska_oznaka, marka_model, tip_usluge_id, opis_rada, cena, broj_sasije, record_id))
+        _refresh_vehicles(conn, [broj_sasije] + list(previous or ()))
+    _notify('updated', [record_id])
+
+def _id_chunks(record_ids):
+    """Split ids into lists small enough for one IN (...) list of bound parameters."""
+    record_ids = sorted(set(record_ids))
+    for start in range(0, len(record_ids), ID_CHUNK_SIZE):
+        yield record_ids[start:start + ID_CHUNK_SIZE]
 
 def delete_records(record_ids):
-    conn = sqlite3.connect('app_data.db')
-    cursor = conn.cursor()
-    cursor.executemany('DELETE FROM records WHERE id = ?', [(record_id,) for record_id in record_ids])
-    conn.commit()
-    conn.close()
+    """Delete records by id, all in one transaction; raises ArchivedRecordError if any is archived."""
+    record_ids = list(record_ids)
+    conn = get_connection()
+    _check_not_archived(conn, record_ids)
+    with conn:
+        vins = []
+        for chunk in _id_chunks(record_ids):
+            placeholders = ', '.join('?' * len(chunk))
+            vins.extend(row[0] for row in conn.execute(
+                f'SELECT broj_sasije FROM records WHERE id IN ({placeholders})', chunk))
+            conn.execute(f'DELETE FROM records WHERE id IN ({placeholders})', chunk)
+        # Posle brisanja najnovijeg servisa vozilo dobija podatke prethodnog
+        _refresh_vehicles(conn, vins)
+    _notify('deleted', record_ids)
+
+def update_records(record_ids, tip_usluge_id=None, cena=None):
+    """Set tip_usluge_id and/or cena on many records with one UPDATE ... WHERE id IN per chunk.
+
+    Arguments left as None are not changed. All chunks share one transaction.
+    Raises ArchivedRecordError if any of the records is archived.
+    """
+    assignments = []
+    values = []
+    if tip_usluge_id is not None:
+        assignments.append('tip_usluge_id = ?')
+        values.append(tip_usluge_id)
+    if cena is not None:
+        assignments.append('cena = ?')
+        values.append(cena)
+    record_ids = list(record_ids)
+    if not assignments or not record_ids:
+        return
+    conn = get_connection()
+    _check_not_archived(conn, record_ids)
+    with conn:
+        for chunk in _id_chunks(record_ids):
+            conn.execute(f'''
+                UPDATE records SET {', '.join(assignments)}
+                WHERE id IN ({', '.join('?' * len(chunk))})
+            ''', values + chunk)
+    _notify('updated', record_ids)
+
+def month_range(year, month):
+    """Return the [start, end) date strings covering one month."""
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start.isoformat(), end.isoformat()
+
+def quarter_range(year, quarter):
+    """Return the [start, end) date strings covering quarter 1-4 of a year."""
+    first_month = 3 * (quarter - 1) + 1
+    start, _ = month_range(year, first_month)
+    _, end = month_range(year, first_month + 2)
+    return start, end
+
+def year_range(year):
+    """Return the [start, end) date strings covering one year."""
+    return date(year, 1, 1).isoformat(), date(year + 1, 1, 1).isoformat()
+
+def _is_month_start(value):
+    return len(value) == 10 and value.endswith('-01')
+
+def _report_rows(sums):
+    """Turn {tip_usluge_id: [broj, broj_cena, ukupno]} into (naziv, count, avg, total) rows sorted by naziv."""
+    names = tip_usluge_names(sums)
+    by_name = {}
+    for tip_usluge_id, (broj, broj_cena, ukupno) in sums.items():
+        if broj and tip_usluge_id in names:
+            total = by_name.setdefault(names[tip_usluge_id], [0, 0, 0])
+            total[0] += broj
+            total[1] += broj_cena
+            total[2] += ukupno
+    return [(naziv, broj, ukupno / broj_cena if broj_cena else None, ukupno if broj_cena else None)
+            for naziv, (broj, broj_cena, ukupno) in sorted(by_name.items())]
+
+def get_report(start, end):
+    """Per service type count, average and total price for start <= datum < end.
+
+    start and end are 'yyyy-MM-dd' strings (see month_range, quarter_range and
+    year_range). Whole-month ranges are answered from monthly_totals; other
+    ranges compare datum directly against the bounds, which lets SQLite use
+    idx_records_datum as a range scan instead of evaluating strftime per row.
+    Archived records are included only when the range reaches into the archive.
+    SQL groups by tip_usluge_id; names come from the service type registry.
+    """
+    conn = get_connection()
+    archive = attach_archive(conn)
+    archived = archive is not None and bool(archive.segments(conn, start, end))
+    sums = {}
+    if _is_month_start(start) and _is_month_start(end):
+        totals = 'monthly_totals'
+        if archived:
+            totals = '(SELECT * FROM main.monthly_totals UNION ALL SELECT * FROM archive.monthly_totals)'
+            # Nedovrseno premestanje je u oba zbira; jednom se oduzima
+            for (_, tip_usluge_id), counts in archive.pending_totals(conn, start, end).items():
+                total = sums.setdefault(tip_usluge_id, [0, 0, 0])
+                for index, value in enumerate(counts):
+                    total[index] -= value
+        cursor = conn.execute(f'''
+            SELECT tip_usluge_id, SUM(broj), SUM(broj_cena), SUM(ukupno)
+            FROM {totals} AS totals
+            WHERE mesec >= ? AND mesec < ? AND broj > 0
+            GROUP BY tip_usluge_id
+        ''', (start[:7], end[:7]))
+    else:
+        if archived:
+            # Zbirovi zive baze i arhive se sabiraju pre racunanja proseka
+            sums = archive.totals(conn, start, end)
+        cursor = conn.execute('''
+            SELECT tip_usluge_id, COUNT(*), COUNT(cena), coalesce(SUM(cena), 0)
+            FROM records
+            WHERE datum >= ? AND datum < ?
+            GROUP BY tip_usluge_id
+        ''', (start, end))
+    for tip_usluge_id, broj, broj_cena, ukupno in cursor:
+        total = sums.setdefault(tip_usluge_id, [0, 0, 0])
+        total[0] += broj
+        total[1] += broj_cena
+        total[2] += ukupno
+    return _report_rows(sums)
+
+def get_monthly_totals(start, end):
+    """Per month and service type (mesec, naziv, count, total) for trend reports.
+
+    start and end are 'yyyy-MM-dd' month starts; the result comes straight
+    from monthly_totals (and the archive's, for archived months), ordered by
+    month and name.
+    """
+    conn = get_connection()
+    archive = attach_archive(conn)
+    totals = 'monthly_totals'
+    pending = {}
+    if archive is not None and archive.segments(conn, start, end):
+        totals = '(SELECT * FROM main.monthly_totals UNION ALL SELECT * FROM archive.monthly_totals)'
+        pending = archive.pending_totals(conn, start, end)
+    rows = conn.execute(f'''
+        SELECT mesec, tip_usluge_id, SUM(broj), SUM(ukupno)
+        FROM {totals} AS totals
+        WHERE mesec >= ? AND mesec < ? AND broj > 0
+        GROUP BY mesec, tip_usluge_id
+    ''', (start[:7], end[:7])).fetchall()
+    names = tip_usluge_names({row[1] for row in rows})
+    by_name = {}
+    for mesec, tip_usluge_id, broj, ukupno in rows:
+        if tip_usluge_id in names:
+            # Nedovrseno premestanje je i u zivoj i u arhivskoj tabeli
+            pending_broj, _, pending_ukupno = pending.get((mesec, tip_usluge_id), (0, 0, 0))
+            total = by_name.setdefault((mesec, names[tip_usluge_id]), [0, 0])
+            total[0] += broj - pending_broj
+            total[1] += ukupno - pending_ukupno
+    return [(mesec, naziv, broj, ukupno) for (mesec, naziv), (broj, ukupno) in sorted(by_name.items())]
 
 def get_monthly_report():
-    conn = sqlite3.connect('app_data.db')
+    now = datetime.now()
+    return get_report(*month_range(now.year, now.month))
+
+def get_yearly_report():
+    return get_report(*year_range(datetime.now().year))
+
+def _search_filter(conn, text, column, mode):
+    """Build the WHERE clause for a search, picking the cheapest strategy.
+
+    Returns (sql, params); sql is empty when every record matches. Exact and
+    prefix lookups on INDEXED_COLUMNS become a b-tree range scan, substrings
+    of at least MIN_TRIGRAM_LENGTH characters go through the FTS5 trigram
+    index, and anything else falls back to a plain LIKE scan.
+    """
+    if column is not None and column not in SEARCH_COLUMNS:
+        raise ValueError(f'Unknown search column: {column}')
+    if mode not in ('contains', 'prefix', 'exact'):
+        raise ValueError(f'Unknown search mode: {mode}')
+    if not text:
+        return '', ()
+
+    columns = [column] if column else list(SEARCH_COLUMNS)
+    if mode == 'exact':
+        pattern = text
+    elif mode == 'prefix':
+        pattern = text + '%'
+    else:
+        pattern = '%' + text + '%'
+
+    if mode != 'contains' and column in INDEXED_COLUMNS:
+        # LIKE 'abc%' is rewritten to a range on the NOCASE index
+        operator = '=' if mode == 'exact' else 'LIKE'
+        return f'records.{column} {operator} ? COLLATE NOCASE', (pattern,)
+    if mode == 'contains' and len(text) >= MIN_TRIGRAM_LENGTH and _has_search_index(conn):
+        if column:
+            fts_where, fts_param = f'{column} LIKE ?', pattern
+        else:
+            # A quoted phrase matches the substring in any indexed column
+            fts_where, fts_param = 'records_fts MATCH ?', '"' + text.replace('"', '""') + '"'
+        return f'records.id IN (SELECT rowid FROM records_fts WHERE {fts_where})', (fts_param,)
+    where = ' OR '.join(f'records.{name} LIKE ?' for name in columns)
+    return f'({where})', (pattern,) * len(columns)
+
+def _listing_filter(conn, text, column, mode, start=None, end=None, tip_usluge_id=None):
+    """_search_filter narrowed to start <= datum < end and one service type (each optional)."""
+    where, params = _search_filter(conn, text, column, mode)
+    clauses = [where] if where else []
+    params = list(params)
+    # Opseg datuma i tip idu na idx_records_datum (datum, tip_usluge_id, ...)
+    for clause, value in (('records.datum >= ?', start), ('records.datum < ?', end),
+                          ('records.tip_usluge_id = ?', tip_usluge_id)):
+        if value is not None:
+            clauses.append(clause)
+            params.append(value)
+    return ' AND '.join(clauses), tuple(params)
+
+def _search_cursor(text, column, mode, start=None, end=None, tip_usluge_id=None):
+    conn = get_connection()
     cursor = conn.cursor()
-    current_month = datetime.now().strftime('%Y-%m')
-    cursor.execute('''
-        SELECT tip_usluge.naziv, COUNT(*), AVG(cena), SUM(cena)
-        FROM records
-        JOIN tip_usluge ON records.tip_usluge_id = tip_usluge.id
-        WHERE strftime('%Y-%m', datum) = ?
-        GROUP BY tip_usluge.naziv
-    ''', (current_month,))
-    results = cursor.fetchall()
-    conn.close()
+    where, params = _listing_filter(conn, text, column, mode, start, end, tip_usluge_id)
+    cursor.execute(_service_types().record_select + f'''
+        {'WHERE ' + where if where else ''}
+        ORDER BY records.id
+    ''', params)
+    return cursor
+
+def search_records(text, column='broj_sasije', mode='contains', limit=None):
+    """Search records by chassis number (default), plate or other text.
+
+    column is one of SEARCH_COLUMNS, or None to search all of them; mode is
+    'contains', 'prefix' or 'exact'. With limit, at most that many rows are
+    fetched. Archived records are merged in by id.
+    """
+    cursor = _search_cursor(text, column, mode)
+    results = cursor.fetchall() if limit is None else cursor.fetchmany(limit)
+    cursor.close()
+    conn = get_connection()
+    archive = attach_archive(conn)
+    if archive is not None:
+        results = _merge_by_id(results, archive.iter_search(conn, text, column, mode), limit)
     return results
 
-def get_yearly_report():
-    conn = sqlite3.connect('app_data.db')
+def iter_search_records(text, column='broj_sasije', mode='contains', batch_size=1000,
+                        start=None, end=None, tip_usluge_id=None):
+    """Yield search results one row at a time, fetching batch_size rows per step.
+
+    Same filtering as search_records, but the result set is never held in
+    memory as a whole, which makes it suitable for exporting large listings.
+    start and end ('yyyy-MM-dd', end exclusive) and tip_usluge_id narrow the
+    search further.
+    """
+    cursor = _search_cursor(text, column, mode, start, end, tip_usluge_id)
+    archive = attach_archive(get_connection())
+    try:
+        rows = itertools.chain.from_iterable(iter(lambda: cursor.fetchmany(batch_size), []))
+        if archive is not None:
+            rows = heapq.merge(rows, archive.iter_search(get_connection(), text, column, mode, start=start, end=end,
+                                                         tip_usluge_id=tip_usluge_id),
+                               key=lambda row: row[0])
+        yield from rows
+    finally:
+        cursor.close()
+
+def search_records_page(text, after_id=0, limit=200, column='broj_sasije', mode='contains',
+                        start=None, end=None, tip_usluge_id=None):
+    """Return the next page of search results with id greater than after_id.
+
+    Keyset pagination: the caller passes the last id it has already seen, so
+    each page is an index seek on the primary key rather than an OFFSET scan.
+    start, end and tip_usluge_id are as in iter_search_records.
+    """
+    conn = get_connection()
     cursor = conn.cursor()
-    current_year = datetime.now().strftime('%Y')
-    cursor.execute('''
-        SELECT tip_usluge.naziv, COUNT(*), AVG(cena), SUM(cena)
-        FROM records
-        JOIN tip_usluge ON records.tip_usluge_id = tip_usluge.id
-        WHERE strftime('%Y', datum) = ?
-        GROUP BY tip_usluge.naziv
-    ''', (current_year,))
+    where, params = _listing_filter(conn, text, column, mode, start, end, tip_usluge_id)
+    cursor.execute(_service_types().record_select + f'''
+        WHERE records.id > ? {'AND ' + where if where else ''}
+        ORDER BY records.id
+        LIMIT ?
+    ''', (after_id,) + tuple(params) + (limit,))
     results = cursor.fetchall()
-    conn.close()
+    archive = attach_archive(conn)
+    if archive is not None:
+        results = _merge_by_id(results, archive.iter_search(conn, text, column, mode, after_id, start=start, end=end,
+                                                            tip_usluge_id=tip_usluge_id), limit)
     return results
 
-def search_records(broj_sasije):
-    conn = sqlite3.connect('app_data.db')
+def count_search_records(text, column='broj_sasije', mode='contains', start=None, end=None, tip_usluge_id=None):
+    """Return how many records iter_search_records would yield (archived ones included)."""
+    conn = get_connection()
+    where, params = _listing_filter(conn, text, column, mode, start, end, tip_usluge_id)
+    count = conn.execute(f'''
+        SELECT COUNT(*) FROM records {'WHERE ' + where if where else ''}
+    ''', params).fetchone()[0]
+    archive = attach_archive(conn)
+    if archive is not None:
+        count += archive.count(conn, text, column, mode, start, end, tip_usluge_id)
+    return count
+
+def search_records_by_ids(text, record_ids, column='broj_sasije', mode='contains'):
+    """Return those of record_ids that match the search, ordered by id."""
+    record_ids = list(record_ids)
+    conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT records.id, datum, broj_sasije, registarska_oznaka, marka_model, tip_usluge.naziv, opis_rada, cena
-        FROM records
-        JOIN tip_usluge ON records.tip_usluge_id = tip_usluge.id
-        WHERE broj_sasije LIKE ?
-    ''', ('%' + broj_sasije + '%',))
-    results = cursor.fetchall()
-    conn.close()
+    where, params = _search_filter(conn, text, column, mode)
+    results = []
+    # Delovi idu rastucim redom id-ja, pa je i spojen rezultat sortiran
+    for chunk in _id_chunks(record_ids):
+        cursor.execute(_service_types().record_select + f'''
+            WHERE records.id IN ({', '.join('?' * len(chunk))}) {'AND ' + where if where else ''}
+            ORDER BY records.id
+        ''', tuple(chunk) + tuple(params))
+        results.extend(cursor.fetchall())
+    archive = attach_archive(conn)
+    if archive is not None:
+        results = _merge_by_id(results, archive.iter_search(conn, text, column, mode, record_ids=record_ids))
     return results
 
 def get_all_records():
-    conn = sqlite3.connect('app_data.db')
+    conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT records.id, datum, broj_sasije, registarska_oznaka, marka_model, tip_usluge.naziv, opis_rada, cena
-        FROM records
-        JOIN tip_usluge ON records.tip_usluge_id = tip_usluge.id
+    cursor.execute(_service_types().record_select + '''
+        ORDER BY records.id
     ''')
     results = cursor.fetchall()
-    conn.close()
+    archive = attach_archive(conn)
+    if archive is not None:
+        results = _merge_by_id(results, archive.iter_search(conn, ''))
     return results
 
-def get_tip_usluge_list():
-    conn = sqlite3.connect('app_data.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT id, naziv FROM tip_usluge')
-    results = cursor.fetchall()
-    conn.close()
-    return results
+# Registar tipova usluge: tip_usluge se cita jednom po procesu i menja samo kroz funkcije ispod
+
+def _sql_text(value):
+    return "'" + value.replace("'", "''") + "'"
+
+class _ServiceTypes:
+    """Snapshot of tip_usluge; replaced as a whole whenever a service type changes."""
+
+    def __init__(self, rows):
+        self.rows = rows  # (id, naziv, aktivan) po id-ju
+        self.names = {tip_usluge_id: naziv for tip_usluge_id, naziv, _ in rows}
+        # Nazivi ulaze u upit kao konstante; id koji je dodao drugi proces se cita iz tabele
+        fallback = '(SELECT naziv FROM tip_usluge WHERE tip_usluge.id = records.tip_usluge_id)'
+        cases = ' '.join(f'WHEN {tip_usluge_id} THEN {_sql_text(naziv)}' for tip_usluge_id, naziv, _ in rows)
+        naziv_sql = f'CASE records.tip_usluge_id {cases} ELSE {fallback} END' if rows else fallback
+        self.record_select = RECORD_SELECT.format(tip_usluge_naziv=naziv_sql)
+
+def _service_types():
+    global _service_types_snapshot
+    snapshot = _service_types_snapshot
+    if snapshot is None:
+        with _service_types_lock:
+            if _service_types_snapshot is None:
+                rows = get_connection().execute('SELECT id, naziv, aktivan FROM tip_usluge ORDER BY id').fetchall()
+                _service_types_snapshot = _ServiceTypes(rows)
+            snapshot = _service_types_snapshot
+    return snapshot
+
+def reload_tip_usluge():
+    """Forget the memoized service types, e.g. after another process changed tip_usluge."""
+    global _service_types_snapshot
+    # Pod bravom, da ucitavanje koje je u toku ne vrati stari snimak
+    with _service_types_lock:
+        _service_types_snapshot = None
+
+def get_tip_usluge_list(include_retired=False):
+    """Return (id, naziv) of the service types offered for new records (all of them with include_retired)."""
+    return [(tip_usluge_id, naziv) for tip_usluge_id, naziv, aktivan in _service_types().rows
+            if aktivan or include_retired]
+
+def tip_usluge_names(tip_usluge_ids=()):
+    """Return {id: naziv} of every service type, retired ones included.
+
+    tip_usluge is read again once if any of tip_usluge_ids is unknown (a type
+    added by another process).
+    """
+    names = _service_types().names
+    if any(tip_usluge_id not in names for tip_usluge_id in tip_usluge_ids):
+        reload_tip_usluge()
+        names = _service_types().names
+    return names
+
+def _check_tip_usluge_naziv(conn, naziv, tip_usluge_id=None):
+    naziv = (naziv or '').strip()
+    if not naziv:
+        raise ValueError('Naziv tipa usluge ne sme biti prazan')
+    duplicate = conn.execute('SELECT id FROM tip_usluge WHERE upper(naziv) = upper(?) AND id IS NOT ?',
+                             (naziv, tip_usluge_id)).fetchone()
+    if duplicate is not None:
+        raise ValueError(f'Tip usluge {naziv} vec postoji')
+    return naziv
+
+def _tip_usluge_changed():
+    reload_tip_usluge()
+    # Nazivi u vec ucitanim listama su zastareli
+    _notify('reset', [])
+
+def add_tip_usluge(naziv):
+    """Add a service type and return its id; raises ValueError for an empty or duplicate name."""
+    conn = get_connection()
+    with conn:
+        naziv = _check_tip_usluge_naziv(conn, naziv)
+        tip_usluge_id = conn.execute('INSERT INTO tip_usluge (naziv) VALUES (?)', (naziv,)).lastrowid
+    _tip_usluge_changed()
+    return tip_usluge_id
+
+def rename_tip_usluge(tip_usluge_id, naziv):
+    """Rename a service type; existing records show the new name."""
+    conn = get_connection()
+    with conn:
+        naziv = _check_tip_usluge_naziv(conn, naziv, tip_usluge_id)
+        if conn.execute('UPDATE tip_usluge SET naziv = ? WHERE id = ?', (naziv, tip_usluge_id)).rowcount == 0:
+            raise ValueError(f'Nepoznat tip usluge {tip_usluge_id}')
+    _tip_usluge_changed()
+
+def retire_tip_usluge(tip_usluge_id, retired=True):
+    """Stop offering a service type for new records (retired=False brings it back).
+
+    Records that already use it keep it and still show up in reports.
+    """
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute('UPDATE tip_usluge SET aktivan = ? WHERE id = ?', (int(not retired), tip_usluge_id))
+        if cursor.rowcount == 0:
+            raise ValueError(f'Nepoznat tip usluge {tip_usluge_id}')
+    _tip_usluge_changed()
 
 def get_record_by_id(record_id):
     """Retrieve a single record by its ID."""
-    conn = sqlite3.connect('app_data.db')
+    conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT records.id, datum, broj_sasije, registarska_oznaka, marka_model, tip_usluge.naziv AS tip_usluge, opis_rada, cena
-        FROM records
-        JOIN tip_usluge ON records.tip_usluge_id = tip_usluge.id
+    cursor.execute(_service_types().record_select + '''
         WHERE records.id = ?
     ''', (record_id,))
     result = cursor.fetchone()
-    conn.close()
-    return result
\ No newline at end of file
+    archive = attach_archive(conn)
+    if result is None and archive is not None:
+        archived = archive.search(conn, '', record_ids=[record_id])
+        result = archived[0] if archived else None
+    return result
+
+def search_vehicles(prefix, limit=20):
+    """Return up to limit (id, broj_sasije, registarska_oznaka, marka_model) vehicles whose VIN starts with prefix."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    # LIKE 'abc%' je opseg na jedinstvenom NOCASE indeksu
+    cursor.execute('''
+        SELECT id, broj_sasije, registarska_oznaka, marka_model
+        FROM vehicles
+        WHERE broj_sasije LIKE ?
+        ORDER BY broj_sasije
+        LIMIT ?
+    ''', (prefix.replace('%', '').replace('_', '') + '%', limit))
+    results = cursor.fetchall()
+    return results
+
+def get_vehicle(broj_sasije):
+    """Return (id, broj_sasije, registarska_oznaka, marka_model) for a VIN, or None."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT id, broj_sasije, registarska_oznaka, marka_model FROM vehicles WHERE broj_sasije = ?
+    ''', (broj_sasije,))
+    result = cursor.fetchone()
+    return result
+
+def get_vehicle_history(broj_sasije):
+    """Return the service history of one car, or None if the VIN is unknown.
+
+    The result is a dict with the vehicle row, its services (record rows,
+    oldest first), total_spend and last_service (date of the newest service).
+    """
+    vehicle = get_vehicle(broj_sasije)
+    if vehicle is None:
+        return None
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(_service_types().record_select + '''
+        WHERE records.vehicle_id = ?
+        ORDER BY records.datum, records.id
+    ''', (vehicle[0],))
+    services = cursor.fetchall()
+    archive = attach_archive(conn)
+    if archive is not None:
+        services = sorted(services + archive.vehicle_services(conn, vehicle[0]), key=lambda row: (row[1], row[0]))
+    return {
+        'vehicle': vehicle,
+        'services': services,
+        'total_spend': sum(service[7] or 0 for service in services),
+        'last_service': services[-1][1] if services else None,
+    }
+
+
+# Javne funkcije se mere kada je ukljucena dijagnostika (diagnostics.enable())
+PROFILED_FUNCTIONS = (
+    'connect', 'rebuild_monthly_totals', 'insert_record', 'insert_records', 'update_record', 'update_records',
+    'delete_records', 'get_report', 'get_monthly_totals', 'get_monthly_report', 'get_yearly_report',
+    'search_records', 'iter_search_records', 'search_records_page', 'search_records_by_ids',
+    'count_search_records', 'archived_record_ids', 'get_all_records', 'get_tip_usluge_list',
+    'get_record_by_id', 'search_vehicles', 'get_vehicle', 'get_vehicle_history', 'add_tip_usluge',
+    'rename_tip_usluge', 'retire_tip_usluge',
+)
+for _name in PROFILED_FUNCTIONS:
+    globals()[_name] = profiled(globals()[_name])
+
+if SERVER_URL:
+    # Klijentski rezim: iste funkcije, ali preko HTTP-a (api_client.py)
+    import api_client
+    api_client.install(SERVER_URL)
+
+
+if __name__ == '__main__':
+    import sys
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if sys.argv[1:] == ['rebuild-totals']:
+        connect()
+        rebuild_monthly_totals()
+        print('monthly_totals rebuilt')
+    elif sys.argv[1:] == ['migrate']:
+        connect()
+        print(f'Schema version {schema_version()}')
+    elif sys.argv[1:2] == ['tip-usluge']:
+        connect()
+        command, args = (sys.argv[2:3] or ['list'])[0], sys.argv[3:]
+        if command == 'add' and len(args) == 1:
+            print(f'Added tip usluge {add_tip_usluge(args[0])}')
+        elif command == 'rename' and len(args) == 2:
+            rename_tip_usluge(int(args[0]), args[1])
+        elif command in ('retire', 'restore') and len(args) == 1:
+            retire_tip_usluge(int(args[0]), retired=command == 'retire')
+        elif command != 'list' or args:
+            sys.exit('Usage: python database.py tip-usluge [list | add NAZIV | rename ID NAZIV | retire ID | restore ID]')
+        active = dict(get_tip_usluge_list())
+        for tip_usluge_id, naziv in get_tip_usluge_list(include_retired=True):
+            print(f"{tip_usluge_id:4} {naziv}{'' if tip_usluge_id in active else ' (povucen)'}")
+    else:
+        print('Usage: python database.py rebuild-totals | migrate | tip-usluge ...')
@@ -0,0 +1,299 @@
+# diagnostics.py
+"""Opt-in instrumentation of the database layer.
+
+database.py wraps its public functions with profiled(). While profiling is
+off the wrapper only checks a flag; once enable() is called (or the app is
+started with DPFPA_PROFILE=1) every call records its latency, rows returned
+and the SQL statements it executed. Calls slower than the threshold go to
+the slow-query log together with EXPLAIN QUERY PLAN for their statements;
+statements that differ only in their literal values are kept once, with a
+count, so a batch insert does not fill the log.
+
+    DPFPA_PROFILE=1 DPFPA_SLOW_MS=50 python dpfpa.py
+"""
+import os
+import re
+import json
+import time
+import sqlite3
+import inspect
+import functools
+import threading
+import collections
+from datetime import datetime
+
+# Granice histograma latencije u milisekundama (poslednja korpa je sve preko)
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+SLOW_QUERY_MS = float(os.environ.get('DPFPA_SLOW_MS', 100))
+# Broj poslednjih sporih poziva koji se cuvaju
+SLOW_LOG_SIZE = 200
+# Najvise razlicitih upita koji se pamte po pozivu (ostali se samo broje)
+MAX_STATEMENTS = 20
+# Posle ovoliko upita u jednom pozivu (npr. executemany) ostali se samo broje, bez sablona
+MAX_TEMPLATED = 1000
+# Upiti za koje ima smisla EXPLAIN QUERY PLAN
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+
+_enabled = False
+_threshold_ms = SLOW_QUERY_MS
+_lock = threading.Lock()
+_stats = {}
+_slow_log = collections.deque(maxlen=SLOW_LOG_SIZE)
+_local = threading.local()
+# Trace callback dobija SQL sa upisanim vrednostima; bez njih se isti upit prepoznaje
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+class CallStats:
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.rows = 0
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+
+    def add(self, elapsed, rows, failed):
+        self.calls += 1
+        self.errors += failed
+        self.total_s += elapsed
+        self.max_s = max(self.max_s, elapsed)
+        if rows is not None:
+            self.rows += rows
+        elapsed_ms = elapsed * 1000
+        bucket = 0
+        while bucket < len(HISTOGRAM_BOUNDS_MS) and elapsed_ms > HISTOGRAM_BOUNDS_MS[bucket]:
+            bucket += 1
+        self.histogram[bucket] += 1
+
+    def percentile_ms(self, fraction):
+        """Upper bound of the histogram bucket holding the given fraction of calls."""
+        target = fraction * self.calls
+        seen = 0
+        for bucket, count in enumerate(self.histogram):
+            seen += count
+            if count and seen >= target:
+                return HISTOGRAM_BOUNDS_MS[bucket] if bucket < len(HISTOGRAM_BOUNDS_MS) else self.max_s * 1000
+        return 0.0
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_ms': self.total_s * 1000,
+            'avg_ms': self.total_s * 1000 / self.calls if self.calls else 0.0,
+            'p95_ms': self.percentile_ms(0.95),
+            'max_ms': self.max_s * 1000,
+            'rows': self.rows,
+            'histogram_ms': dict(zip([f'<={bound}' for bound in HISTOGRAM_BOUNDS_MS]
+                                     + [f'>{HISTOGRAM_BOUNDS_MS[-1]}'], self.histogram)),
+        }
+
+
+def is_enabled():
+    return _enabled
+
+
+def slow_query_ms():
+    return _threshold_ms
+
+
+def enable(threshold_ms=None):
+    """Start collecting stats; calls slower than threshold_ms are logged with their query plans."""
+    global _enabled, _threshold_ms
+    import database
+    if threshold_ms is not None:
+        _threshold_ms = threshold_ms
+    _enabled = True
+    database.set_trace_callback(_trace_sql)
+
+
+def disable():
+    global _enabled
+    import database
+    _enabled = False
+    database.set_trace_callback(None)
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+        _slow_log.clear()
+
+
+def get_stats():
+    """Return {function name: stats dict}, slowest total time first."""
+    with _lock:
+        stats = sorted(_stats.values(), key=lambda item: item.total_s, reverse=True)
+        return {item.name: item.as_dict() for item in stats}
+
+
+def get_slow_queries():
+    with _lock:
+        return list(_slow_log)
+
+
+def dump(path):
+    """Write stats and the slow-query log to path as JSON (for bug reports)."""
+    import database
+    data = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'db_path': database.DB_PATH,
+        'sqlite_version': sqlite3.sqlite_version,
+        'enabled': _enabled,
+        'slow_query_ms': _threshold_ms,
+        'functions': get_stats(),
+        'slow_queries': get_slow_queries(),
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    return path
+
+
+class CallSql:
+    """Distinct statements run by one call: template -> [example, count]."""
+
+    def __init__(self):
+        self.templates = {}
+        self.templated = 0
+        self.dropped = 0
+
+    def add(self, statement):
+        if self.templated >= MAX_TEMPLATED:
+            self.dropped += 1
+            return
+        self.templated += 1
+        template = _LITERALS.sub('?', statement)
+        seen = self.templates.get(template)
+        if seen is not None:
+            seen[1] += 1
+        elif len(self.templates) < MAX_STATEMENTS:
+            self.templates[template] = [statement, 1]
+        else:
+            self.dropped += 1
+
+
+def _trace_sql(statement):
+    # Trace callback konekcije: SQL ide pozivu koji je trenutno aktivan na ovoj niti
+    calls = getattr(_local, 'calls', None)
+    if calls and not getattr(_local, 'explaining', False) and not statement.startswith('--'):
+        calls[-1].add(statement)
+
+
+def _row_count(result):
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple):
+        return 1
+    if result is None:
+        return 0
+    return None
+
+
+def _explain(statements):
+    import database
+    plans = []
+    _local.explaining = True
+    try:
+        conn = database.get_connection()
+        for statement in statements:
+            if not statement.lstrip().upper().startswith(EXPLAINABLE):
+                plans.append([])
+                continue
+            try:
+                plan = conn.execute('EXPLAIN QUERY PLAN ' + statement).fetchall()
+            except sqlite3.Error as e:
+                plan = [(0, 0, 0, f'EXPLAIN failed: {e}')]
+            plans.append([row[3] for row in plan])
+    finally:
+        _local.explaining = False
+    return plans
+
+
+def _record(name, args, kwargs, sql, elapsed, rows, failed):
+    with _lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = CallStats(name)
+        stats.add(elapsed, rows, failed)
+    if elapsed * 1000 < _threshold_ms:
+        return
+    entry = {
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'function': name,
+        'ms': elapsed * 1000,
+        'args': repr((args, kwargs))[:500],
+        'rows': rows,
+        'sql': list(sql.templates),
+        'counts': [count for _, count in sql.templates.values()],
+        'sql_dropped': sql.dropped,
+        # Jedan EXPLAIN po sablonu, nad prvim stvarnim upitom
+        'plans': _explain([example for example, _ in sql.templates.values()]),
+    }
+    with _lock:
+        _slow_log.append(entry)
+
+
+def _begin():
+    calls = getattr(_local, 'calls', None)
+    if calls is None:
+        calls = _local.calls = []
+    sql = CallSql()
+    calls.append(sql)
+    return sql, time.perf_counter()
+
+
+def _end(name, args, kwargs, call, rows, failed):
+    sql, start = call
+    elapsed = time.perf_counter() - start
+    # Po identitetu: generator moze da se zavrsi posle poziva koji su krenuli kasnije
+    calls = _local.calls
+    for position in range(len(calls) - 1, -1, -1):
+        if calls[position] is sql:
+            del calls[position]
+            break
+    _record(name, args, kwargs, sql, elapsed, rows, failed)
+
+
+def profiled(func):
+    """Wrap a database function so its calls are measured while profiling is enabled."""
+    name = func.__name__
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            if not _enabled:
+                yield from func(*args, **kwargs)
+                return
+            # Meri se ceo prolaz kroz rezultate, ne samo otvaranje kursora
+            rows = 0
+            failed = True
+            call = _begin()
+            try:
+                for row in func(*args, **kwargs):
+                    rows += 1
+                    yield row
+                failed = False
+            except GeneratorExit:
+                # Pozivalac je prestao da cita ranije; to nije greska
+                failed = False
+                raise
+            finally:
+                _end(name, args, kwargs, call, rows, failed)
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return func(*args, **kwargs)
+        call = _begin()
+        result = None
+        failed = True
+        try:
+            result = func(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            _end(name, args, kwargs, call, _row_count(result) if not failed else None, failed)
+    return wrapper
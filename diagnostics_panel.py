@@ -0,0 +1,113 @@
+# diagnostics_panel.py
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QCheckBox, QTableWidget, QTableWidgetItem,
+    QPlainTextEdit, QLabel, QFileDialog, QMessageBox, QHeaderView
+)
+from PyQt5.QtGui import QIcon
+from PyQt5.QtCore import QTimer
+from datetime import datetime
+import diagnostics
+
+STATS_HEADERS = ['Funkcija', 'Poziva', 'Ukupno ms', 'Prosek ms', 'p95 ms', 'Max ms', 'Redova', 'Greske']
+STATS_FIELDS = ['calls', 'total_ms', 'avg_ms', 'p95_ms', 'max_ms', 'rows', 'errors']
+# Osvezavanje tabele dok je panel otvoren
+REFRESH_MS = 1000
+
+
+class DiagnosticsPanel(QWidget):
+    """Shows the database call stats and slow-query log collected by diagnostics."""
+
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle('Dijagnostika baze')
+        self.setWindowIcon(QIcon('./tb.ico'))
+        self.setMinimumSize(800, 500)
+        self.initUI()
+        self.refresh()
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(REFRESH_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start()
+
+    def initUI(self):
+        layout = QVBoxLayout()
+
+        top_layout = QHBoxLayout()
+        self.enabled_checkbox = QCheckBox('Merenje ukljuceno')
+        self.enabled_checkbox.setChecked(diagnostics.is_enabled())
+        self.enabled_checkbox.toggled.connect(self.toggle_enabled)
+        self.threshold_label = QLabel()
+        self.reset_button = QPushButton('Resetuj')
+        self.reset_button.clicked.connect(self.reset)
+        self.dump_button = QPushButton('Sacuvaj u fajl')
+        self.dump_button.clicked.connect(self.dump_to_file)
+        top_layout.addWidget(self.enabled_checkbox)
+        top_layout.addWidget(self.threshold_label)
+        top_layout.addStretch()
+        top_layout.addWidget(self.reset_button)
+        top_layout.addWidget(self.dump_button)
+
+        self.stats_table = QTableWidget(0, len(STATS_HEADERS))
+        self.stats_table.setHorizontalHeaderLabels(STATS_HEADERS)
+        self.stats_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.stats_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+
+        self.slow_log = QPlainTextEdit()
+        self.slow_log.setReadOnly(True)
+
+        layout.addLayout(top_layout)
+        layout.addWidget(self.stats_table, 2)
+        layout.addWidget(QLabel('Spori upiti:'))
+        layout.addWidget(self.slow_log, 1)
+        self.setLayout(layout)
+
+    def refresh(self):
+        self.threshold_label.setText(f'prag: {diagnostics.slow_query_ms():g} ms')
+        stats = diagnostics.get_stats()
+        self.stats_table.setRowCount(len(stats))
+        for row, (name, values) in enumerate(stats.items()):
+            self.stats_table.setItem(row, 0, QTableWidgetItem(name))
+            for column, field in enumerate(STATS_FIELDS, start=1):
+                value = values[field]
+                text = f'{value:.2f}' if isinstance(value, float) else str(value)
+                self.stats_table.setItem(row, column, QTableWidgetItem(text))
+
+        lines = []
+        for entry in reversed(diagnostics.get_slow_queries()):
+            lines.append(f"{entry['time']}  {entry['function']}  {entry['ms']:.1f} ms  {entry['rows']} redova")
+            for statement, count, plan in zip(entry['sql'], entry['counts'], entry['plans']):
+                repeated = f'{count}x ' if count > 1 else ''
+                lines.append('    ' + repeated + ' '.join(statement.split()))
+                lines.extend('      ' + step for step in plan)
+            if entry['sql_dropped']:
+                lines.append(f"    ... i jos {entry['sql_dropped']} upita")
+        text = '\n'.join(lines)
+        if text != self.slow_log.toPlainText():
+            self.slow_log.setPlainText(text)
+
+    def toggle_enabled(self, checked):
+        if checked:
+            diagnostics.enable()
+        else:
+            diagnostics.disable()
+
+    def reset(self):
+        diagnostics.reset()
+        self.refresh()
+
+    def dump_to_file(self):
+        default_name = 'dpfpa_diagnostics_' + datetime.now().strftime('%Y%m%d_%H%M%S') + '.json'
+        path, _ = QFileDialog.getSaveFileName(self, 'Sacuvaj dijagnostiku', default_name, 'JSON (*.json)')
+        if not path:
+            return
+        try:
+            diagnostics.dump(path)
+        except OSError as e:
+            QMessageBox.warning(self, 'Error', str(e))
+            return
+        QMessageBox.information(self, 'Sacuvano', f'Dijagnostika je sacuvana u {path}')
+
+    def closeEvent(self, event):
+        self.refresh_timer.stop()
+        super().closeEvent(event)
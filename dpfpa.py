@@ -1,22 +1,41 @@
 # main
 import sys
 import os
-import matplotlib.pyplot as plt
+import logging
+import threading
+from functools import partial
 from PyQt5.QtWidgets import (
-    QApplication, QWidget, QVBoxLayout, QPushButton, QTableWidget, QTableWidgetItem, QHBoxLayout, QMessageBox,
-    QLineEdit, QAbstractItemView, QMenu, QAction, QFileDialog
+    QApplication, QWidget, QVBoxLayout, QPushButton, QTableView, QHBoxLayout, QMessageBox,
+    QLineEdit, QAbstractItemView, QMenu, QAction, QFileDialog, QProgressBar, QShortcut, QLabel
 )
-from PyQt5.QtGui import QIcon
-from PyQt5.QtCore import Qt, QPoint
+from PyQt5.QtGui import QIcon, QKeySequence
+from PyQt5.QtCore import Qt, QPoint, QTimer, QThreadPool
 from database import (
-    connect, search_records, delete_records, get_monthly_report,
-    get_yearly_report, insert_record, get_tip_usluge_list, get_record_by_id
+    SERVER_URL, connect, add_change_listener, delete_records, get_monthly_report,
+    get_yearly_report, insert_record, get_tip_usluge_list, get_record_by_id, get_vehicle_history,
+    search_records_by_ids, archived_record_ids
 )
 from insert_form import InsertForm
-from fpdf import FPDF
-from datetime import datetime
-import tempfile
-import webbrowser
+from records_model import RecordsTableModel
+from search_cache import SearchCache, CACHE_ROW_LIMIT
+from workers import JobQueue, SearchJob
+
+# Pauza posle poslednjeg pritiska tastera pre nego sto se pokrene pretraga
+SEARCH_DEBOUNCE_MS = 250
+# Dnevnik aplikacije, pored baze
+LOG_PATH = 'dpfpa.log'
+
+
+def prewarm_report_modules():
+    """Import the heavy report dependencies (matplotlib, fpdf) ahead of first use."""
+    import reports
+    import webbrowser  # noqa: F401
+    # Ucitava i fontTools koji fpdf koristi za DejaVu fontove
+    try:
+        reports.new_pdf()
+    except FileNotFoundError:
+        pass
+
 
 class MainWindow(QWidget):
     def __init__(self):
@@ -26,6 +45,18 @@ class MainWindow(QWidget):
 
         self.setWindowIcon(QIcon('./tb.ico'))  # Replace 'tb.ico' with the path to your icon file
 
+        # Pozadinski poslovi za generisanje PDF-ova
+        self.jobs = JobQueue(self)
+
+        # Pretraga dok se kuca: kes rezultata i pozadinska nit za upite
+        self.search_cache = SearchCache()
+        add_change_listener(self.search_cache.clear)
+        self.search_pool = QThreadPool(self)
+        self.search_pool.setMaxThreadCount(1)
+        self.search_generation = 0
+        self.search_epoch = 0
+        self.search_job = None
+
         self.initUI()
 
     def initUI(self):
@@ -42,41 +73,81 @@ class MainWindow(QWidget):
 
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText('Unesi Broj šasije za pretragu')
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.live_search)
+        self.search_input.textChanged.connect(self.search_timer.start)
 
         self.search_button = QPushButton('Trazi')
         self.search_button.clicked.connect(self.search)
 
+        self.export_button = QPushButton('Izvoz')
+        self.export_button.clicked.connect(self.export_listing)
+
         top_layout.addWidget(self.insert_button)
         top_layout.addWidget(self.report_button)
         top_layout.addWidget(self.search_input)
         top_layout.addWidget(self.search_button)
+        top_layout.addWidget(self.export_button)
+
+        # Napredak PDF poslova, vidljiv samo dok neki posao radi
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setMaximumWidth(120)
+        self.cancel_jobs_button = QPushButton('Otkazi')
+        self.cancel_jobs_button.clicked.connect(self.jobs.cancel_all)
+        self.jobs.active_changed.connect(self.update_job_status)
+        self.update_job_status(0)
+        top_layout.addWidget(self.progress_bar)
+        top_layout.addWidget(self.cancel_jobs_button)
 
         # Table to display records
-        self.table = QTableWidget()
-        self.table.setColumnCount(8)
-        self.table.setHorizontalHeaderLabels(['ID', 'Datum', 'Broj šasije', 'Registarska oznaka',
-                                              'Marka/Model', 'Tip usluge', 'Opis rada', 'Cena'])
+        self.model = RecordsTableModel(self)
+        self.model.load_failed.connect(self.show_load_error)
+        self.table = QTableView()
+        self.table.setModel(self.model)
         self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
-        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.setSelectionMode(QAbstractItemView.ExtendedSelection)
         self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
 
         # Enable custom context menu
         self.table.setContextMenuPolicy(Qt.CustomContextMenu)
         self.table.customContextMenuRequested.connect(self.open_context_menu)
 
+        # Greska pri ucitavanju tabele (npr. server nije dostupan), do sledece pretrage
+        self.load_error_label = QLabel()
+        self.load_error_label.setStyleSheet('color: red')
+        self.load_error_label.hide()
+
         main_layout.addLayout(top_layout)
+        main_layout.addWidget(self.load_error_label)
         main_layout.addWidget(self.table)
 
         self.setLayout(main_layout)
 
-        # Load all records initially
-        self.search()
+        # Panel sa merenjima upita nad bazom
+        self.diagnostics_shortcut = QShortcut(QKeySequence('Ctrl+Shift+D'), self)
+        self.diagnostics_shortcut.activated.connect(self.open_diagnostics)
+
+        # Load all records once the window is shown, then warm up the report
+        # modules in the background so the first 'Izvestaj' click is fast
+        QTimer.singleShot(0, self.search)
+        QTimer.singleShot(0, self.start_prewarm)
+
+    def start_prewarm(self):
+        threading.Thread(target=prewarm_report_modules, daemon=True).start()
 
     def open_insert_form(self):
+        # Tabela se sama azurira preko obavestenja iz baze (RecordsTableModel)
         self.insert_form = InsertForm()
-        self.insert_form.record_inserted.connect(self.search)
         self.insert_form.show()
 
+    def open_diagnostics(self):
+        from diagnostics_panel import DiagnosticsPanel
+        self.diagnostics_panel = DiagnosticsPanel()
+        self.diagnostics_panel.show()
+
     def show_reports_menu(self):
         # Create a menu to select between Monthly and Yearly reports
         menu = QMessageBox(self)
@@ -84,6 +155,7 @@ class MainWindow(QWidget):
         menu.setText('Izaberi koji izvestaj zelis:')
         monthly_button = menu.addButton('Mesecni Izvestaj', QMessageBox.ActionRole)
         yearly_button = menu.addButton('Godisnji Izvestaj', QMessageBox.ActionRole)
+        trend_button = menu.addButton('Trend (5 godina)', QMessageBox.ActionRole)
         cancel_button = menu.addButton('Cancel', QMessageBox.RejectRole)
         menu.exec_()
 
@@ -91,6 +163,8 @@ class MainWindow(QWidget):
             self.show_report('mesecni')
         elif menu.clickedButton() == yearly_button:
             self.show_report('godisnji')
+        elif menu.clickedButton() == trend_button:
+            self.show_report('trend')
         else:
             pass  # Do nothing if cancelled
 
@@ -103,6 +177,10 @@ class MainWindow(QWidget):
             report_data = get_yearly_report()
             report_title = 'Godisnji Izvestaj'
             self.generate_pdf_report(report_data, report_title)
+        elif report_type == 'trend':
+            # Podaci se citaju i sabiraju u pozadinskom poslu, zajedno sa PDF-om
+            from analytics import trend_range, TREND_YEARS
+            self.generate_trend_report(*trend_range(), f'Trend Izvestaj ({TREND_YEARS} godina)')
         else:
             return
 
@@ -111,124 +189,186 @@ class MainWindow(QWidget):
             QMessageBox.information(self, 'Nema podataka', 'Nema podataka za selektovani period.')
             return
 
-        # Kreiranje PDF-a
-        pdf = FPDF()
+        # PDF se pravi u pozadini, prozor ostaje upotrebljiv
+        from reports import build_report_pdf
+        self.jobs.submit(build_report_pdf, report_data, report_title,
+                         on_finished=self.open_pdf, on_failed=self.show_job_error,
+                         on_progress=self.progress_bar.setValue)
 
-        # Dodavanje DejaVu fontova (obični i podebljani)
-        font_path_regular = './DejaVuSans.ttf'
-        font_path_bold = './DejaVuSans-Bold.ttf'
-        if not os.path.exists(font_path_regular) or not os.path.exists(font_path_bold):
-            QMessageBox.warning(self, 'Error', 'Nedostaje font fajl (DejaVuSans.ttf ili DejaVuSans-Bold.ttf)')
+    def generate_trend_report(self, start, end, report_title):
+        if SERVER_URL:
+            # Trend cita celu bazu, pa ga u klijentskom rezimu pravi server
+            from api_client import download_trend_report as build_trend_report_pdf
+        else:
+            from reports import build_trend_report_pdf
+        self.jobs.submit(build_trend_report_pdf, start, end, report_title,
+                         on_finished=self.open_pdf, on_failed=self.show_job_error,
+                         on_progress=self.progress_bar.setValue)
+
+    def export_listing(self):
+        from export_form import ExportForm
+        form = ExportForm(self.search_text(), self)
+        if not form.exec_():
             return
+        path, selected_filter = QFileDialog.getSaveFileName(
+            self, 'Izvoz spiska', 'spisak.pdf', 'PDF (*.pdf);;CSV (*.csv);;Excel (*.xlsx)')
+        if not path:
+            return
+        fmt = selected_filter.split('*.')[-1].rstrip(')')
+        if not path.lower().endswith('.' + fmt):
+            path += '.' + fmt
+
+        # Redovi se citaju i upisuju u delovima, pa i ceo spisak ide u pozadini
+        from listing_export import export_listing
+        self.jobs.submit(partial(export_listing, fmt=fmt, **form.filters()), path,
+                         on_finished=self.export_finished, on_failed=self.show_job_error,
+                         on_progress=self.progress_bar.setValue)
+
+    def export_finished(self, path):
+        if path.lower().endswith('.pdf'):
+            self.open_pdf(path)
+        else:
+            QMessageBox.information(self, 'Izvoz', f'Spisak je sacuvan u {path}')
+
+    def open_pdf(self, path):
+        import webbrowser
+        webbrowser.open(path)
+
+    def show_job_error(self, message):
+        QMessageBox.warning(self, 'Error', message)
+
+    def update_job_status(self, active_jobs):
+        self.progress_bar.setVisible(active_jobs > 0)
+        self.cancel_jobs_button.setVisible(active_jobs > 0)
+        if active_jobs == 0:
+            self.progress_bar.setValue(0)
+
+    def closeEvent(self, event):
+        self.cancel_live_search()
+        self.search_pool.waitForDone()
+        self.jobs.cancel_all()
+        self.jobs.wait()
+        super().closeEvent(event)
 
-        pdf.add_font("DejaVu", "", font_path_regular)
-        pdf.add_font("DejaVu", "B", font_path_bold)
-
-        # Stranica 1 - Pie chart
-        pdf.add_page()
-        pdf.set_font("DejaVu", 'B', 16)
-        pdf.cell(0, 10, report_title, ln=True, align='C')
-        pdf.ln(10)
-
-        # Dodavanje pie chart-a
-        chart_path = self.create_chart_with_legend(report_data, report_title)
-        pdf.image(chart_path, x=10, y=40, w=pdf.w - 20)
-
-        # Datum generisanja u donjem desnom uglu druge stranice
-        pdf.set_y(-15)
-        pdf.set_font("DejaVu", '', 10)
-        pdf.cell(0, 10, f'Datum generisanja: {datetime.now().strftime("%Y-%m-%d")}', align='R')
-        pdf.ln(10)
-
-        # Stranica 2 - Tabela sa podacima
-        # pdf.add_page()
-        pdf.set_font("DejaVu", 'B', 12)
-        pdf.cell(60, 10, 'Tip usluge', border=1)
-        pdf.cell(30, 10, 'Kolicina', border=1, align='R')
-        pdf.cell(50, 10, 'Prosecna Cena', border=1, align='R')
-        pdf.cell(50, 10, 'Ukupno Zaradjeno', border=1, align='R')
-        pdf.ln()
-
-        # Podaci u tabeli
-        pdf.set_font("DejaVu", '', 12)
-        for row in report_data:
-            tip_usluge, count, avg_cena, sum_cena = row
-            pdf.cell(60, 10, str(tip_usluge), border=1)
-            pdf.cell(30, 10, str(count), border=1, align='R')
-            pdf.cell(50, 10, f'{avg_cena:.2f}', border=1, align='R')
-            pdf.cell(50, 10, str(sum_cena), border=1, align='R')
-            pdf.ln()
-
-        # Kreiranje privremenog fajla i otvaranje
-        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp_file:
-            pdf.output(tmp_file.name)
-            webbrowser.open(tmp_file.name)
-
-        # Brisanje pie chart slike
-        if os.path.exists(chart_path):
-            os.remove(chart_path)
-
-    def create_chart_with_legend(self, report_data, report_title):
-        # Kreiranje pie chart-a
-        tip_usluge = [row[0] for row in report_data]
-        sum_cena = [row[3] for row in report_data]
-
-        plt.figure(figsize=(8, 8))
-        wedges, texts, autotexts = plt.pie(sum_cena, autopct='%1.1f%%', startangle=140)
-
-        # Dodavanje legende
-        plt.legend(wedges, tip_usluge, title="Tip usluge", loc="center left", bbox_to_anchor=(1, 0, 0.5, 1))
-        plt.axis('equal')  # Jednaki aspekt da bi pie chart bio krug
-
-        # Čuvanje slike pie chart-a
-        chart_path = 'chart.png'
-        plt.savefig(chart_path, bbox_inches='tight')  # `bbox_inches='tight'` da smanji praznine oko grafa
-        plt.close()
-
-        return chart_path
+    def search_text(self):
+        # Isti tekst ide i u kes i u bazu, da bi davali iste rezultate
+        return self.search_input.text().strip()
+
+    def show_load_error(self, message):
+        self.load_error_label.setText(f'Zapisi nisu ucitani: {message}')
+        self.load_error_label.show()
 
     def search(self):
-        broj_sasije = self.search_input.text()
-        results = search_records(broj_sasije)
-        self.table.setRowCount(len(results))
-        for row_idx, row_data in enumerate(results):
-            for col_idx, col_data in enumerate(row_data):
-                self.table.setItem(row_idx, col_idx, QTableWidgetItem(str(col_data)))
+        self.search_timer.stop()
+        self.cancel_live_search()
+        broj_sasije = self.search_text()
+        self.model.set_query(broj_sasije)
+
+    def live_search(self):
+        self.cancel_live_search()
+        text = self.search_text()
+        if not text:
+            self.model.set_query(text)
+            return
+        rows = self.search_cache.get(text)
+        if rows is not None:
+            self.model.set_rows(text, rows)
+            return
+        # Upis posle ovog trenutka cini rezultat zastarelim za kes (vidi SearchCache.put)
+        self.search_epoch = self.search_cache.epoch
+        job = SearchJob(self.search_generation, text, CACHE_ROW_LIMIT)
+        job.signals.finished.connect(self.live_search_finished)
+        job.signals.failed.connect(self.live_search_failed)
+        self.search_job = job
+        self.search_pool.start(job)
+
+    def cancel_live_search(self):
+        # Noviji upit zamenjuje stari; rezultat starog se ignorise
+        self.search_generation += 1
+        self.load_error_label.hide()
+        if self.search_job is not None:
+            self.search_job.cancel()
+            self.search_job = None
+
+    def live_search_finished(self, generation, text, rows):
+        if generation != self.search_generation:
+            return
+        self.search_job = None
+        if rows is None:
+            # Previse rezultata za kes, tabela ih ucitava postepeno
+            self.model.set_query(text)
+        else:
+            self.search_cache.put(text, rows, self.search_epoch)
+            self.model.set_rows(text, rows)
+
+    def live_search_failed(self, generation, message):
+        if generation == self.search_generation:
+            self.search_job = None
+            self.model.set_query(self.search_text())
+
+    def selected_record_ids(self):
+        rows = sorted(index.row() for index in self.table.selectionModel().selectedRows())
+        return [self.model.record_id(row) for row in rows]
 
     def open_context_menu(self, position):
-        indexes = self.table.selectedIndexes()
-        if indexes:
-            selected_row = indexes[0].row()
-            record_id_item = self.table.item(selected_row, 0)  # ID is in column 0
-            record_id = int(record_id_item.text())
-
-            # Create the context menu
-            menu = QMenu()
-            
+        record_ids = self.selected_record_ids()
+        if not record_ids:
+            return
+
+        # Arhivirani zapisi (archive.py) se samo citaju i stampaju
+        read_only = bool(archived_record_ids(record_ids))
+
+        # Create the context menu
+        menu = QMenu()
+        if len(record_ids) == 1:
+            record_id = record_ids[0]
+
             # Delete action
             delete_action = QAction('Obrisi', self)
             delete_action.triggered.connect(lambda: self.delete_record(record_id))
+            delete_action.setEnabled(not read_only)
             menu.addAction(delete_action)
-            
+
             # Edit action
-            edit_action = QAction('Izmeni', self)
+            edit_action = QAction('Izmeni (arhivirano)' if read_only else 'Izmeni', self)
             edit_action.triggered.connect(lambda: self.edit_record(record_id))
+            edit_action.setEnabled(not read_only)
             menu.addAction(edit_action)
-            
+
             # Print action
             print_action = QAction('Stampaj (PDF)', self)
             print_action.triggered.connect(lambda: self.print_record(record_id))
             menu.addAction(print_action)
 
-            # Display the menu
-            menu.exec_(self.table.viewport().mapToGlobal(position))
+            # Vehicle history action
+            history_action = QAction('Istorija vozila', self)
+            history_action.triggered.connect(lambda: self.show_vehicle_history(record_id))
+            menu.addAction(history_action)
+        else:
+            # Vise izabranih zapisa: svaka akcija je jedan upit / jedan PDF
+            count = len(record_ids)
+            delete_action = QAction(f'Obrisi izabrane ({count})', self)
+            delete_action.triggered.connect(lambda: self.delete_selected_records(record_ids))
+            delete_action.setEnabled(not read_only)
+            menu.addAction(delete_action)
+
+            edit_action = QAction(f'Izmeni tip usluge / cenu ({count}{", ima arhiviranih" if read_only else ""})', self)
+            edit_action.triggered.connect(lambda: self.bulk_edit_records(record_ids))
+            edit_action.setEnabled(not read_only)
+            menu.addAction(edit_action)
+
+            print_action = QAction(f'Stampaj izabrane (PDF, {count})', self)
+            print_action.triggered.connect(lambda: self.print_records(record_ids))
+            menu.addAction(print_action)
+
+        # Display the menu
+        menu.exec_(self.table.viewport().mapToGlobal(position))
 
     def edit_record(self, record_id):
         # Fetch record details for editing
         record_data = get_record_by_id(record_id)
         if record_data:
             self.insert_form = InsertForm(record_id=record_id, record_data=record_data)
-            self.insert_form.record_inserted.connect(self.search)
             self.insert_form.show()
         else:
             QMessageBox.warning(self, 'Error', 'Record not found for editing.')
@@ -240,50 +380,36 @@ class MainWindow(QWidget):
             QMessageBox.warning(self, 'Error', 'Record not found for printing.')
             return
 
-        # Create the PDF document
-        pdf = FPDF()
-        pdf.add_page()
-
-        # Load DejaVu font
-        font_path = './DejaVuSans.ttf'
-        pdf.add_font("DejaVu", "", font_path)
-        pdf.set_font("DejaVu", '', 12)
-
-        # Title
-        pdf.set_font("DejaVu", '', 14)
-        pdf.cell(0, 10, f'Servis broj: {record_id}', ln=True, align='L')
-        pdf.ln(5)
-
-        # Define headers and correct values to ensure they align correctly
-        headers = ['Broj', 'Datum', 'Broj šasije', 'Registarska oznaka', 'Marka/Model', 'Tip usluge', 'Cena']
-        values = [record_data[0], record_data[1], record_data[2], record_data[3], record_data[4], record_data[5], record_data[7]]  # Assuming record_data[7] is Cena and record_data[6] is Opis rada
-
-        # Adding main table data without "Opis rada"
-        for header, value in zip(headers, values):
-            pdf.set_font("DejaVu", '', 12)
-            pdf.cell(50, 10, f"{header}:", border=1, align='L')
-            pdf.cell(0, 10, str(value), border=1, align='L')
-            pdf.ln()
-
-        # Separate section for "Opis rada"
-        pdf.ln(5)
-        pdf.set_font("DejaVu", "", 12)
-        pdf.cell(0, 10, 'Opis rada:', ln=True)
-        pdf.set_font("DejaVu", '', 12)
-        pdf.multi_cell(0, 10, record_data[6], border=1, align='L')  # Assuming "Opis rada" is at index 6
-
-        # Signature line
-        pdf.ln(20)
-        pdf.cell(140)
-        pdf.cell(50, 10, '_________________________', 0, 1, 'R')
-        pdf.cell(140)
-        pdf.cell(50, 10, 'Potpis', 0, 1, 'R')
-
-        # Create a temporary file and open it in the system's PDF viewer
-        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp_file:
-            pdf.output(tmp_file.name)
-            webbrowser.open(tmp_file.name)
+        from reports import build_work_order_pdf
+        self.jobs.submit(build_work_order_pdf, record_data,
+                         on_finished=self.open_pdf, on_failed=self.show_job_error,
+                         on_progress=self.progress_bar.setValue)
+
+    def print_records(self, record_ids):
+        records = search_records_by_ids('', record_ids)
+        if not records:
+            QMessageBox.warning(self, 'Error', 'Records not found for printing.')
+            return
+
+        # Svi radni nalozi u jednom PDF-u
+        from reports import build_work_orders_pdf
+        self.jobs.submit(build_work_orders_pdf, records,
+                         on_finished=self.open_pdf, on_failed=self.show_job_error,
+                         on_progress=self.progress_bar.setValue)
+
+    def bulk_edit_records(self, record_ids):
+        from bulk_edit_form import BulkEditForm
+        BulkEditForm(record_ids, self).exec_()
 
+    def show_vehicle_history(self, record_id):
+        record_data = get_record_by_id(record_id)
+        history = get_vehicle_history(record_data[2]) if record_data else None
+        if history is None:
+            QMessageBox.warning(self, 'Error', 'Vozilo nije pronadjeno.')
+            return
+        from vehicle_history import VehicleHistory
+        self.vehicle_history = VehicleHistory(history)
+        self.vehicle_history.show()
 
     def delete_record(self, record_id):
         reply = QMessageBox.question(self, 'Potvrdi Brisanje',
@@ -292,10 +418,24 @@ class MainWindow(QWidget):
         if reply == QMessageBox.Yes:
             delete_records([record_id])
             QMessageBox.information(self, 'Success', f'Record ID {record_id} je obrisan.')
-            self.search()
+
+    def delete_selected_records(self, record_ids):
+        reply = QMessageBox.question(self, 'Potvrdi Brisanje',
+                                     f'Da li si siguran da zelis da obrises {len(record_ids)} zapisa?',
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply == QMessageBox.Yes:
+            # Jedna transakcija za sve izabrane zapise
+            delete_records(record_ids)
+            QMessageBox.information(self, 'Success', f'{len(record_ids)} zapisa je obrisano.')
 
 
 if __name__ == '__main__':
+    # Prozorska verzija nema konzolu, pa poruke (migracije, backup) idu u fajl
+    logging.basicConfig(filename=LOG_PATH, level=logging.INFO,
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    if os.environ.get('DPFPA_PROFILE'):
+        import diagnostics
+        diagnostics.enable()
     connect()  # Initialize the database
     app = QApplication(sys.argv)
     window = MainWindow()
@@ -0,0 +1,68 @@
+# export_form.py
+from PyQt5.QtWidgets import (
+    QDialog, QFormLayout, QLabel, QCheckBox, QComboBox, QDateEdit, QDialogButtonBox, QMessageBox
+)
+from PyQt5.QtGui import QIcon
+from PyQt5.QtCore import QDate
+from database import get_tip_usluge_list
+
+
+class ExportForm(QDialog):
+    """Choose the filters for a listing export (listing_export.export_listing)."""
+
+    def __init__(self, search='', parent=None):
+        super().__init__(parent)
+        self.search = search
+        self.setWindowTitle('Izvoz spiska')
+        self.setWindowIcon(QIcon('./tb.ico'))
+        self.initUI()
+
+    def initUI(self):
+        layout = QFormLayout()
+
+        # Izvozi se ono sto je trenutno u polju za pretragu
+        self.search_label = QLabel(self.search.strip() or 'Svi zapisi')
+
+        self.tip_usluge_input = QComboBox()
+        self.tip_usluge_input.addItem('Svi', None)
+        for tip in get_tip_usluge_list(include_retired=True):
+            self.tip_usluge_input.addItem(tip[1], tip[1])  # filtrira se po nazivu
+
+        self.period_check = QCheckBox('Period:')
+        today = QDate.currentDate()
+        self.start_input = QDateEdit()
+        self.start_input.setCalendarPopup(True)
+        self.start_input.setDate(QDate(today.year(), 1, 1))
+        self.end_input = QDateEdit()
+        self.end_input.setCalendarPopup(True)
+        self.end_input.setDate(today)
+        for date_input in (self.start_input, self.end_input):
+            date_input.setEnabled(False)
+            self.period_check.toggled.connect(date_input.setEnabled)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.submit)
+        buttons.rejected.connect(self.reject)
+
+        layout.addRow('Broj šasije:', self.search_label)
+        layout.addRow('Tip usluge:', self.tip_usluge_input)
+        layout.addRow(self.period_check, self.start_input)
+        layout.addRow('do:', self.end_input)
+        layout.addRow(buttons)
+        self.setLayout(layout)
+
+    def submit(self):
+        if self.period_check.isChecked() and self.start_input.date() > self.end_input.date():
+            QMessageBox.warning(self, 'Error', 'Pocetni datum je posle krajnjeg.')
+            return
+        self.accept()
+
+    def filters(self):
+        """Keyword arguments for export_listing."""
+        start = end = None
+        if self.period_check.isChecked():
+            start = self.start_input.date().toString('yyyy-MM-dd')
+            # Krajnji dan je ukljucen, export_listing ocekuje granicu bez njega
+            end = self.end_input.date().addDays(1).toString('yyyy-MM-dd')
+        return {'search': self.search, 'start': start, 'end': end,
+                'tip_usluge': self.tip_usluge_input.currentData()}
@@ -1,13 +1,15 @@
 # insert_form.py
-import os
-import shutil
-from datetime import datetime, timedelta
 from PyQt5.QtWidgets import (
-    QWidget, QFormLayout, QLabel, QLineEdit, QPushButton, QMessageBox, QComboBox, QTextEdit, QDateEdit
+    QWidget, QFormLayout, QLabel, QLineEdit, QPushButton, QMessageBox, QComboBox, QTextEdit, QDateEdit,
+    QCompleter
 )
 from PyQt5.QtGui import QIcon
-from PyQt5.QtCore import QDate, pyqtSignal
-from database import insert_record, update_record, get_tip_usluge_list
+from PyQt5.QtCore import Qt, QDate, QStringListModel, pyqtSignal
+from database import SERVER_URL, insert_record, update_record, get_tip_usluge_list, search_vehicles, get_vehicle
+from backup import backup_in_background
+
+# Predlozi za broj sasije se traze tek posle ovoliko znakova
+COMPLETER_MIN_CHARS = 3
 
 class InsertForm(QWidget):
     record_inserted = pyqtSignal()
@@ -29,26 +31,11 @@ class InsertForm(QWidget):
             self.populate_form(record_data)
 
     def backup_database_if_old(self):
-        db_path = 'app_data.db'
-        
-        # Check if the database file exists
-        if os.path.exists(db_path):
-            # Get the modification time of the database file
-            modification_time = datetime.fromtimestamp(os.path.getmtime(db_path))
-            current_time = datetime.now()
-            
-            # Check if the file is older than one day
-            if current_time - modification_time > timedelta(days=30):
-                # Create a backup filename with a timestamp
-                backup_filename = f"backup_app_data_{modification_time.strftime('%Y%m%d_%H%M%S')}.db"
-                backup_path = os.path.join('backups', backup_filename)
-
-                # Ensure the backups directory exists
-                os.makedirs('backups', exist_ok=True)
-
-                # Copy the database file to the backup location
-                shutil.copy2(db_path, backup_path)
-                print(f"Backup created: {backup_path}")
+        # U klijentskom rezimu bazu cuva server
+        if SERVER_URL:
+            return
+        # Provera i kopiranje rade u pozadinskoj niti, forma se otvara odmah
+        backup_in_background()
 
     def initUI(self):
         layout = QFormLayout()
@@ -58,11 +45,19 @@ class InsertForm(QWidget):
         self.datum_input.setDate(QDate.currentDate())
 
         self.broj_sasije_input = QLineEdit()
+        # Predlozi iz tabele vozila; izbor popunjava tablice i model
+        self.vehicle_completer = QCompleter(QStringListModel(self), self)
+        self.vehicle_completer.setCaseSensitivity(Qt.CaseInsensitive)
+        self.vehicle_completer.activated[str].connect(self.fill_vehicle)
+        self.broj_sasije_input.setCompleter(self.vehicle_completer)
+        self.broj_sasije_input.textEdited.connect(self.update_vehicle_suggestions)
+        self.broj_sasije_input.editingFinished.connect(
+            lambda: self.fill_vehicle(self.broj_sasije_input.text(), only_empty=True))
         self.registarska_oznaka_input = QLineEdit()
         self.marka_model_input = QLineEdit()
 
         self.tip_usluge_input = QComboBox()
-        tipovi_usluge = get_tip_usluge_list()
+        tipovi_usluge = get_tip_usluge_list()  # iz registra, bez upita nad bazom
         for tip in tipovi_usluge:
             self.tip_usluge_input.addItem(tip[1], tip[0])  # tip[1]=naziv, tip[0]=id
 
@@ -83,6 +78,28 @@ class InsertForm(QWidget):
 
         self.setLayout(layout)
 
+    def update_vehicle_suggestions(self, text):
+        if len(text) < COMPLETER_MIN_CHARS:
+            return
+        try:
+            vehicles = search_vehicles(text)
+        except Exception:
+            # Predlozi nisu obavezni (npr. server nije dostupan)
+            return
+        self.vehicle_completer.model().setStringList([vehicle[1] for vehicle in vehicles])
+
+    def fill_vehicle(self, broj_sasije, only_empty=False):
+        try:
+            vehicle = get_vehicle(broj_sasije.strip()) if broj_sasije.strip() else None
+        except Exception:
+            return
+        if vehicle is None:
+            return
+        if not only_empty or not self.registarska_oznaka_input.text():
+            self.registarska_oznaka_input.setText(vehicle[2])
+        if not only_empty or not self.marka_model_input.text():
+            self.marka_model_input.setText(vehicle[3])
+
     def submit_record(self):
         datum = self.datum_input.date().toString('yyyy-MM-dd')
         broj_sasije = self.broj_sasije_input.text()
@@ -118,6 +135,14 @@ class InsertForm(QWidget):
         self.broj_sasije_input.setText(record_data[2])
         self.registarska_oznaka_input.setText(record_data[3])
         self.marka_model_input.setText(record_data[4])
-        self.tip_usluge_input.setCurrentIndex(self.tip_usluge_input.findData(record_data[5]))
+        # record_data[5] je naziv; povucen tip usluge se nudi samo zapisima koji ga vec imaju
+        index = self.tip_usluge_input.findText(record_data[5])
+        if index < 0:
+            for tip_id, naziv in get_tip_usluge_list(include_retired=True):
+                if naziv == record_data[5]:
+                    self.tip_usluge_input.addItem(naziv, tip_id)
+                    index = self.tip_usluge_input.count() - 1
+                    break
+        self.tip_usluge_input.setCurrentIndex(index)
         self.opis_rada_input.setPlainText(record_data[6])
         self.cena_input.setText(str(record_data[7]))
\ No newline at end of file
@@ -0,0 +1,608 @@
+# listing_export.py
+"""Streaming export of a record listing to PDF, CSV or XLSX.
+
+Rows come from iter_search_records (the same search as the table on screen,
+optionally narrowed to a period and a service type) and are written to disk
+as they arrive, so memory use does not depend on the number of records:
+
+- CSV: one line per record, UTF-8 with BOM so Excel detects the encoding.
+- XLSX: sheet XML is streamed into the zip file with inline strings (no
+  shared string table); a new sheet starts every XLSX_SHEET_ROWS rows.
+- PDF: a small writer below emits each page as soon as it is full. FPDF
+  keeps every page in memory until output(), which does not scale to
+  hundreds of thousands of rows. The DejaVu fonts are subset once at the
+  end to the characters actually used.
+
+    python listing_export.py spisak.pdf [--search DPF --column all] [--od 2026-01-01 --do 2027-01-01] [--tip DPF]
+"""
+import io
+import os
+import re
+import csv
+import zlib
+import hashlib
+import zipfile
+import argparse
+import itertools
+import threading
+from datetime import date, datetime
+from xml.sax.saxutils import escape
+from fontTools import ttLib
+from database import connect, iter_search_records, count_search_records, get_tip_usluge_list, SEARCH_COLUMNS
+
+HEADERS = ['Broj', 'Datum', 'Broj šasije', 'Registarska oznaka', 'Marka/Model', 'Tip usluge', 'Opis rada', 'Cena']
+FORMATS = ('pdf', 'csv', 'xlsx')
+
+# Redova po koraku kursora i koliko cesto se javlja napredak
+BATCH_SIZE = 2000
+PROGRESS_EVERY = 5000
+
+# Excel dozvoljava 1048576 redova po listu (jedan je zaglavlje)
+XLSX_SHEET_ROWS = 1000000
+XLSX_COLUMN_WIDTHS = [8, 11, 20, 16, 18, 14, 60, 10]
+# Datum se u Excel-u cuva kao broj dana od 1899-12-30
+EXCEL_EPOCH = date(1899, 12, 30).toordinal()
+
+# PDF: A4 polozeno, mere u tackama (1/72 inca)
+PAGE_WIDTH = 842
+PAGE_HEIGHT = 595
+MARGIN = 28
+FONT_SIZE = 8
+ROW_HEIGHT = 12
+PDF_COLUMN_WIDTHS = [45, 55, 105, 88, 100, 80, 253, 60]
+PDF_ALIGN_RIGHT = (0, 7)
+CELL_PADDING = 2
+ELLIPSIS = '…'
+# Najvise zapamcenih celija po koloni (iste vrednosti se ne mere i ne kodiraju ponovo)
+CELL_CACHE_SIZE = 1000
+
+# Znakovi koji nisu dozvoljeni u XML-u
+_XML_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_font_cache = {}
+_font_cache_lock = threading.Lock()
+_excel_dates = {}
+
+
+def _detect_format(path, fmt):
+    fmt = fmt or os.path.splitext(path)[1].lower().lstrip('.')
+    if fmt not in FORMATS:
+        raise ValueError(f'Nepoznat format izvoza: {fmt} (pdf, csv ili xlsx)')
+    return fmt
+
+
+def describe_filters(search='', column='broj_sasije', mode='contains', start=None, end=None, tip_usluge=None):
+    """Human readable summary of the listing filters (shown under the PDF title)."""
+    parts = []
+    if search:
+        where = 'sve kolone' if column is None else column
+        parts.append(f"pretraga '{search}' ({where}, {mode})")
+    if start or end:
+        parts.append(f"period {start or '...'} - {end or '...'}")
+    if tip_usluge:
+        parts.append(f'tip usluge {tip_usluge}')
+    text = ', '.join(parts)
+    return text[:1].upper() + text[1:] if text else 'Svi zapisi'
+
+
+def _tip_usluge_id(tip_usluge):
+    """Id of the service type with this name (retired ones included), or None if there is none."""
+    for tip in get_tip_usluge_list(include_retired=True):
+        if tip[1] == tip_usluge:
+            return tip[0]
+    return None
+
+
+def _listing_rows(search, column, mode, start, end, tip_usluge, progress):
+    """Yield matching records in id order, reporting progress by rows written."""
+    tip_usluge_id = None
+    if tip_usluge:
+        tip_usluge_id = _tip_usluge_id(tip_usluge)
+        if tip_usluge_id is None:
+            return
+    # Period i tip usluge filtrira vec SQL upit (idx_records_datum), pa brojanje vazi za iste redove
+    filters = {'start': start or None, 'end': end or None, 'tip_usluge_id': tip_usluge_id}
+    total = count_search_records(search, column, mode, **filters) if progress is not None else 0
+    rows = iter_search_records(search, column, mode, batch_size=BATCH_SIZE, **filters)
+    for index, row in enumerate(rows, start=1):
+        if progress is not None and index % PROGRESS_EVERY == 0:
+            progress(min(99, 100 * index // max(total, 1)))
+        yield row
+
+
+def export_listing(path, search='', column='broj_sasije', mode='contains', start=None, end=None,
+                   tip_usluge=None, fmt=None, title='Spisak servisa', progress=None):
+    """Write every record matching the filters to path and return the path.
+
+    search, column and mode are as in search_records; start and end
+    ('yyyy-MM-dd', end exclusive) and tip_usluge (a name) narrow the listing
+    further. fmt is 'pdf', 'csv' or 'xlsx', by default taken from the
+    extension. progress, if given, is called with a percentage; if it raises
+    (see workers.JobCancelled) the partial file is removed.
+    """
+    fmt = _detect_format(path, fmt)
+    rows = _listing_rows(search, column, mode, start, end, tip_usluge, progress)
+    try:
+        if fmt == 'csv':
+            _write_csv(path, rows)
+        elif fmt == 'xlsx':
+            _write_xlsx(path, rows)
+        else:
+            _write_pdf(path, rows, title, describe_filters(search, column, mode, start, end, tip_usluge))
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    if progress is not None:
+        progress(100)
+    return path
+
+
+# CSV
+
+def _write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADERS)
+        writer.writerows(rows)
+
+
+# XLSX
+
+XLSX_NAMESPACE = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+XLSX_RELATIONSHIPS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+XLSX_STYLES = f'''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="{XLSX_NAMESPACE}">
+<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy\\-mm\\-dd"/></numFmts>
+<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>
+<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>
+<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>
+<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>
+</styleSheet>'''
+
+
+def _xlsx_text(value):
+    if value is None:
+        return '<c/>'
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{_XML_ILLEGAL.sub("", escape(str(value)))}</t></is></c>'
+
+
+def _xlsx_number(value):
+    return '<c/>' if value is None else f'<c><v>{value}</v></c>'
+
+
+def _xlsx_date(value):
+    # Razlicitih datuma ima malo, pa se pretvaranje pamti
+    serial = _excel_dates.get(value)
+    if serial is None:
+        try:
+            serial = date.fromisoformat(value).toordinal() - EXCEL_EPOCH
+        except (TypeError, ValueError):
+            return _xlsx_text(value)
+        if len(_excel_dates) < 100000:
+            _excel_dates[value] = serial
+    return f'<c s="1"><v>{serial}</v></c>'
+
+
+def _xlsx_row(row):
+    record_id, datum, broj_sasije, registarska_oznaka, marka_model, tip_usluge, opis_rada, cena = row
+    return ''.join((
+        '<row>', _xlsx_number(record_id), _xlsx_date(datum), _xlsx_text(broj_sasije),
+        _xlsx_text(registarska_oznaka), _xlsx_text(marka_model), _xlsx_text(tip_usluge), _xlsx_text(opis_rada),
+        _xlsx_number(cena), '</row>',
+    ))
+
+
+def _write_xlsx_sheet(archive, number, rows):
+    """Stream one worksheet; returns the number of data rows written."""
+    count = 0
+    columns = ''.join(f'<col min="{index}" max="{index}" width="{width}" customWidth="1"/>'
+                      for index, width in enumerate(XLSX_COLUMN_WIDTHS, start=1))
+    header = ''.join(f'<c t="inlineStr" s="2"><is><t>{escape(name)}</t></is></c>' for name in HEADERS)
+    with archive.open(f'xl/worksheets/sheet{number}.xml', 'w', force_zip64=True) as sheet:
+        sheet.write((
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<worksheet xmlns="{XLSX_NAMESPACE}">'
+            '<sheetViews><sheetView workbookViewId="0">'
+            '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/></sheetView></sheetViews>'
+            f'<cols>{columns}</cols><sheetData><row>{header}</row>'
+        ).encode('utf-8'))
+        while True:
+            chunk = [_xlsx_row(row) for row in itertools.islice(rows, BATCH_SIZE)]
+            if not chunk:
+                break
+            sheet.write(''.join(chunk).encode('utf-8'))
+            count += len(chunk)
+        sheet.write(f'</sheetData><autoFilter ref="A1:H{count + 1}"/></worksheet>'.encode('utf-8'))
+    return count
+
+
+def _write_xlsx(path, rows):
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        sheets = 0
+        while True:
+            sheets += 1
+            count = _write_xlsx_sheet(archive, sheets, itertools.islice(rows, XLSX_SHEET_ROWS))
+            if count < XLSX_SHEET_ROWS:
+                break
+            # Pun list; sledeci se pravi samo ako ima jos redova
+            first = next(rows, None)
+            if first is None:
+                break
+            rows = itertools.chain([first], rows)
+
+        names = ['Spisak'] + [f'Spisak {number}' for number in range(2, sheets + 1)]
+        archive.writestr('[Content_Types].xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            + ''.join(f'<Override PartName="/xl/worksheets/sheet{number}.xml" '
+                      'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                      for number in range(1, sheets + 1))
+            + '</Types>'))
+        archive.writestr('_rels/.rels', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'<Relationship Id="rId1" Type="{XLSX_RELATIONSHIPS}/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'))
+        archive.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<workbook xmlns="{XLSX_NAMESPACE}" xmlns:r="{XLSX_RELATIONSHIPS}"><sheets>'
+            + ''.join(f'<sheet name="{name}" sheetId="{number}" r:id="rId{number}"/>'
+                      for number, name in enumerate(names, start=1))
+            + '</sheets></workbook>'))
+        archive.writestr('xl/_rels/workbook.xml.rels', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + ''.join(f'<Relationship Id="rId{number}" Type="{XLSX_RELATIONSHIPS}/worksheet" '
+                      f'Target="worksheets/sheet{number}.xml"/>' for number in range(1, sheets + 1))
+            + f'<Relationship Id="rId{sheets + 1}" Type="{XLSX_RELATIONSHIPS}/styles" Target="styles.xml"/>'
+            '</Relationships>'))
+        archive.writestr('xl/styles.xml', XLSX_STYLES)
+
+
+# PDF
+
+class _Glyphs(dict):
+    """char -> value; characters missing from the font get the .notdef value."""
+
+    def __init__(self, missing):
+        super().__init__()
+        self.missing = missing
+
+    def __missing__(self, char):
+        return self.missing
+
+
+class _FontMetrics:
+    """Glyph ids and advance widths (1/1000 em) of a TrueType font, parsed once per process."""
+
+    def __init__(self, path):
+        font = ttLib.TTFont(path, lazy=True)
+        scale = 1000 / font['head'].unitsPerEm
+        metrics = font['hmtx'].metrics
+        glyph_ids = {name: gid for gid, name in enumerate(font.getGlyphOrder())}
+        self.codes = _Glyphs('0000')
+        self.widths = _Glyphs(metrics['.notdef'][0] * scale)
+        for code, name in font.getBestCmap().items():
+            self.codes[chr(code)] = '%04X' % glyph_ids[name]
+            self.widths[chr(code)] = metrics[name][0] * scale
+        head = font['head']
+        self.name = font['name'].getDebugName(6)
+        self.bbox = [round(value * scale) for value in (head.xMin, head.yMin, head.xMax, head.yMax)]
+        self.ascent = round(font['hhea'].ascent * scale)
+        self.descent = round(font['hhea'].descent * scale)
+        font.close()
+
+
+def _font_metrics(path):
+    key = os.path.abspath(path)
+    with _font_cache_lock:
+        if key not in _font_cache:
+            _font_cache[key] = _FontMetrics(path)
+        return _font_cache[key]
+
+
+class _PdfFont:
+    """One font of a streamed PDF: encodes text as glyph ids and remembers which characters were used."""
+
+    def __init__(self, path, number):
+        self.path = path
+        self.number = number
+        self.metrics = _font_metrics(path)
+        self.used = set()
+
+    def encode(self, text):
+        self.used.update(text)
+        return '<' + ''.join(map(self.metrics.codes.__getitem__, text)) + '>'
+
+    def width(self, text, size):
+        return sum(map(self.metrics.widths.__getitem__, text)) * size / 1000
+
+    def fit(self, text, width, size):
+        """Cut text with an ellipsis so it is at most width points wide."""
+        if self.width(text, size) <= width:
+            return text
+        limit = width * 1000 / size - self.metrics.widths[ELLIPSIS]
+        total = 0
+        for index, char in enumerate(text):
+            total += self.metrics.widths[char]
+            if total > limit:
+                return text[:index] + ELLIPSIS
+        return text
+
+    def embed(self, pdf):
+        """Write the font objects, with the font file subset to the used characters."""
+        from fontTools import subset
+        font = ttLib.TTFont(self.path)
+        options = subset.Options()
+        # Id-jevi glifova su vec upisani u stranice, pa moraju ostati isti
+        options.retain_gids = True
+        options.notdef_outline = True
+        # Tekst se ne oblikuje (bez ligatura i kerninga), pa OpenType tabele nisu potrebne
+        options.drop_tables += ['FFTM', 'GSUB', 'GPOS', 'GDEF']
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(unicodes=[ord(char) for char in self.used])
+        subsetter.subset(font)
+        data = io.BytesIO()
+        font.save(data)
+        data = data.getvalue()
+
+        glyphs = sorted({int(self.metrics.codes[char], 16): char for char in self.used}.items())
+        tag = ''.join(chr(65 + byte % 26) for byte in hashlib.md5(''.join(sorted(self.used)).encode()).digest()[:6])
+        name = f'/{tag}+{self.metrics.name}'
+        font_file = pdf.add_stream(data, f'/Length1 {len(data)}')
+        descriptor = pdf.add(
+            f'<< /Type /FontDescriptor /FontName {name} /Flags 32 /FontBBox [{" ".join(map(str, self.metrics.bbox))}]'
+            f' /ItalicAngle 0 /Ascent {self.metrics.ascent} /Descent {self.metrics.descent}'
+            f' /CapHeight {self.metrics.ascent} /StemV 80 /FontFile2 {font_file} 0 R >>')
+        widths = ' '.join(f'{gid} [{round(self.metrics.widths[char])}]' for gid, char in glyphs)
+        cid_font = pdf.add(
+            f'<< /Type /Font /Subtype /CIDFontType2 /BaseFont {name}'
+            ' /CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >>'
+            f' /FontDescriptor {descriptor} 0 R /W [{widths}] /CIDToGIDMap /Identity >>')
+        to_unicode = pdf.add_stream(_to_unicode_cmap(glyphs))
+        pdf.write(self.number,
+                  f'<< /Type /Font /Subtype /Type0 /BaseFont {name} /Encoding /Identity-H'
+                  f' /DescendantFonts [{cid_font} 0 R] /ToUnicode {to_unicode} 0 R >>')
+
+
+def _to_unicode_cmap(glyphs):
+    # Omogucava pretragu i kopiranje teksta iz PDF-a
+    lines = ['/CIDInit /ProcSet findresource begin', '12 dict begin', 'begincmap',
+             '/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def',
+             '/CMapName /Adobe-Identity-UCS def', '/CMapType 2 def',
+             '1 begincodespacerange', '<0000> <FFFF>', 'endcodespacerange']
+    glyphs = [(gid, char) for gid, char in glyphs if gid]
+    for start in range(0, len(glyphs), 100):
+        chunk = glyphs[start:start + 100]
+        lines.append(f'{len(chunk)} beginbfchar')
+        lines.extend(f'<{gid:04X}> <{char.encode("utf-16-be").hex().upper()}>' for gid, char in chunk)
+        lines.append('endbfchar')
+    lines += ['endcmap', 'CMapName currentdict /CMap defineresource pop', 'end', 'end']
+    return '\n'.join(lines).encode('ascii')
+
+
+class _PdfFile:
+    """Minimal PDF writer: objects go straight to the file, only their offsets are kept."""
+
+    def __init__(self, f):
+        self.f = f
+        self.offsets = [None]  # offsets[n] = pozicija objekta n u fajlu
+        f.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def reserve(self):
+        self.offsets.append(None)
+        return len(self.offsets) - 1
+
+    def write(self, number, body):
+        self.offsets[number] = self.f.tell()
+        self.f.write(f'{number} 0 obj\n{body}\nendobj\n'.encode('latin-1'))
+
+    def add(self, body):
+        number = self.reserve()
+        self.write(number, body)
+        return number
+
+    def write_stream(self, number, data, extra=''):
+        data = zlib.compress(data, 6)
+        self.offsets[number] = self.f.tell()
+        self.f.write(f'{number} 0 obj\n<< /Length {len(data)} /Filter /FlateDecode {extra}>>\nstream\n'.encode('latin-1'))
+        self.f.write(data)
+        self.f.write(b'\nendstream\nendobj\n')
+
+    def add_stream(self, data, extra=''):
+        number = self.reserve()
+        self.write_stream(number, data, extra)
+        return number
+
+    def close(self, root, info):
+        xref = self.f.tell()
+        self.f.write(f'xref\n0 {len(self.offsets)}\n0000000000 65535 f \n'.encode('latin-1'))
+        self.f.write(''.join(f'{offset:010d} 00000 n \n' for offset in self.offsets[1:]).encode('latin-1'))
+        self.f.write(f'trailer\n<< /Size {len(self.offsets)} /Root {root} 0 R /Info {info} 0 R >>\n'
+                     f'startxref\n{xref}\n%%EOF\n'.encode('latin-1'))
+
+
+def _pdf_text_string(text):
+    return '<FEFF' + text.encode('utf-16-be').hex().upper() + '>'
+
+
+class _ListingPdf:
+    """Lays out the listing table page by page and writes each page as soon as it is full."""
+
+    def __init__(self, f, title, subtitle):
+        from reports import FONT_PATH_REGULAR, FONT_PATH_BOLD
+        if not os.path.exists(FONT_PATH_REGULAR) or not os.path.exists(FONT_PATH_BOLD):
+            raise FileNotFoundError('Nedostaje font fajl (DejaVuSans.ttf ili DejaVuSans-Bold.ttf)')
+        self.pdf = _PdfFile(f)
+        self.pages_number = self.pdf.reserve()
+        self.resources_number = self.pdf.reserve()
+        self.total_pages_number = self.pdf.reserve()
+        self.regular = _PdfFont(FONT_PATH_REGULAR, self.pdf.reserve())
+        self.bold = _PdfFont(FONT_PATH_BOLD, self.pdf.reserve())
+        self.title = title
+        self.subtitle = subtitle
+        self.exported = datetime.now().strftime('%Y-%m-%d %H:%M')
+        self.page_numbers = []
+        self.graphics = []
+        self.text = []
+        self.y = None
+        self.font = None
+        self.rows_on_page = 0
+        self.count = 0
+        self.total = 0
+        self.column_x = list(itertools.accumulate([MARGIN] + PDF_COLUMN_WIDTHS[:-1]))
+        self.cells = [{} for _ in HEADERS]
+
+    def _set_font(self, font, size):
+        if self.font != (font, size):
+            self.font = (font, size)
+            self.text.append(f'/{"F2" if font is self.bold else "F1"} {size} Tf')
+
+    def _put(self, font, size, x, y, value, width=None, align='L'):
+        if width is not None:
+            value = font.fit(value, width - 2 * CELL_PADDING, size)
+            if align == 'R':
+                x += width - CELL_PADDING - font.width(value, size)
+            else:
+                x += CELL_PADDING
+        self._set_font(font, size)
+        self.text.append(f'1 0 0 1 {x:.2f} {y:.2f} Tm {font.encode(value)} Tj')
+
+    def _cell(self, column, value):
+        # Polozaj u redu i kodiran tekst zavise samo od kolone i vrednosti
+        cache = self.cells[column]
+        cell = cache.get(value)
+        if cell is None:
+            if len(cache) >= CELL_CACHE_SIZE:
+                cache.clear()
+            width = PDF_COLUMN_WIDTHS[column]
+            text = self.regular.fit(value, width - 2 * CELL_PADDING, FONT_SIZE)
+            x = self.column_x[column] + CELL_PADDING
+            if column in PDF_ALIGN_RIGHT:
+                x += width - 2 * CELL_PADDING - self.regular.width(text, FONT_SIZE)
+            cell = cache[value] = (f'1 0 0 1 {x:.2f} ', f' Tm {self.regular.encode(text)} Tj')
+        return cell
+
+    def _new_page(self):
+        top = PAGE_HEIGHT - MARGIN
+        self._put(self.bold, 12, MARGIN, top - 12, self.title)
+        exported = f'Izvezeno: {self.exported}'
+        self._put(self.regular, FONT_SIZE, PAGE_WIDTH - MARGIN - self.regular.width(exported, FONT_SIZE),
+                  top - 12, exported)
+        self._put(self.regular, FONT_SIZE, MARGIN, top - 26, self.subtitle)
+        # Zaglavlje tabele na svakoj strani
+        self.y = top - 34
+        self.graphics.append(f'0.85 g {MARGIN} {self.y - ROW_HEIGHT} {PAGE_WIDTH - 2 * MARGIN} {ROW_HEIGHT} re f')
+        x = MARGIN
+        for index, (header, width) in enumerate(zip(HEADERS, PDF_COLUMN_WIDTHS)):
+            self._put(self.bold, FONT_SIZE, x, self.y - 9, header, width, 'R' if index in PDF_ALIGN_RIGHT else 'L')
+            x += width
+        self.y -= ROW_HEIGHT
+        self.rows_on_page = 0
+
+    def _end_page(self):
+        page = len(self.page_numbers) + 1
+        label = f'Strana {page} od '
+        x = PAGE_WIDTH - MARGIN - 80
+        self._put(self.regular, FONT_SIZE, x, MARGIN - 10, label)
+        # Ukupan broj strana se zna tek na kraju; upisuje se u zajednicki XObject
+        self.graphics.append(f'q 1 0 0 1 {x + self.regular.width(label, FONT_SIZE):.2f} {MARGIN - 10} cm /N Do Q')
+        content = '\n'.join(self.graphics + ['0 g BT'] + self.text + ['ET']).encode('latin-1')
+        contents = self.pdf.add_stream(content)
+        self.page_numbers.append(self.pdf.add(
+            f'<< /Type /Page /Parent {self.pages_number} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}]'
+            f' /Resources {self.resources_number} 0 R /Contents {contents} 0 R >>'))
+        self.graphics = []
+        self.text = []
+        self.y = None
+        self.font = None
+
+    def _room(self):
+        return self.y is not None and self.y - ROW_HEIGHT >= MARGIN
+
+    def add_row(self, row):
+        if not self._room():
+            if self.y is not None:
+                self._end_page()
+            self._new_page()
+        if self.rows_on_page % 2:
+            self.graphics.append(f'0.95 g {MARGIN} {self.y - ROW_HEIGHT} {PAGE_WIDTH - 2 * MARGIN} {ROW_HEIGHT} re f')
+        self._set_font(self.regular, FONT_SIZE)
+        baseline = f'{self.y - 9:.2f}'
+        for column, value in enumerate(row):
+            if value is not None and value != '':
+                prefix, suffix = self._cell(column, str(value))
+                self.text.append(prefix + baseline + suffix)
+        self.y -= ROW_HEIGHT
+        self.rows_on_page += 1
+        self.count += 1
+        self.total += row[7] or 0
+
+    def close(self):
+        if not self._room():
+            if self.y is not None:
+                self._end_page()
+            self._new_page()
+        summary = f'Ukupno zapisa: {self.count}    Zbir cena: {self.total}' if self.count else \
+            'Nema zapisa za izabrane uslove.'
+        self._put(self.bold, FONT_SIZE, MARGIN + CELL_PADDING, self.y - 10, summary)
+        self._end_page()
+
+        pdf = self.pdf
+        pdf.write_stream(self.total_pages_number,
+                         f'BT /F1 {FONT_SIZE} Tf {self.regular.encode(str(len(self.page_numbers)))} Tj ET'
+                         .encode('latin-1'),
+                         f'/Type /XObject /Subtype /Form /BBox [0 -5 100 {FONT_SIZE + 5}]'
+                         f' /Resources << /Font << /F1 {self.regular.number} 0 R >> >> ')
+        self.regular.embed(pdf)
+        self.bold.embed(pdf)
+        pdf.write(self.resources_number,
+                  f'<< /Font << /F1 {self.regular.number} 0 R /F2 {self.bold.number} 0 R >>'
+                  f' /XObject << /N {self.total_pages_number} 0 R >> >>')
+        kids = ' '.join(f'{number} 0 R' for number in self.page_numbers)
+        pdf.write(self.pages_number, f'<< /Type /Pages /Kids [{kids}] /Count {len(self.page_numbers)} >>')
+        catalog = pdf.add(f'<< /Type /Catalog /Pages {self.pages_number} 0 R >>')
+        info = pdf.add(f'<< /Title {_pdf_text_string(self.title)} /Producer (DPF PA)'
+                       f" /CreationDate (D:{datetime.now().strftime('%Y%m%d%H%M%S')}) >>")
+        pdf.close(catalog, info)
+
+
+def _write_pdf(path, rows, title, subtitle):
+    with open(path, 'wb') as f:
+        listing = _ListingPdf(f, title, subtitle)
+        for row in rows:
+            listing.add_row(row)
+        listing.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Izvoz spiska servisa u PDF, CSV ili XLSX')
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=FORMATS)
+    parser.add_argument('--search', default='', help='tekst pretrage (kao u polju za pretragu)')
+    parser.add_argument('--column', default='broj_sasije', choices=list(SEARCH_COLUMNS) + ['all'])
+    parser.add_argument('--mode', default='contains', choices=['contains', 'prefix', 'exact'])
+    parser.add_argument('--od', dest='start', help='od datuma (yyyy-MM-dd)')
+    parser.add_argument('--do', dest='end', help='do datuma, ne ukljucujuci (yyyy-MM-dd)')
+    parser.add_argument('--tip', dest='tip_usluge', help='samo ovaj tip usluge (naziv)')
+    parser.add_argument('--title', default='Spisak servisa')
+    args = parser.parse_args()
+
+    connect()
+    column = None if args.column == 'all' else args.column
+    export_listing(args.path, args.search, column, args.mode, args.start, args.end, args.tip_usluge,
+                   args.format, args.title, progress=lambda percent: print(f'{percent}%', end='\r'))
+    print(f'Izvezeno u {args.path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+# records_model.py
+from bisect import bisect_left
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, pyqtSignal
+from database import search_records_page, search_records_by_ids, add_change_listener, remove_change_listener
+
+HEADERS = ['ID', 'Datum', 'Broj šasije', 'Registarska oznaka',
+           'Marka/Model', 'Tip usluge', 'Opis rada', 'Cena']
+
+# Broj redova koji se ucitava odjednom
+PAGE_SIZE = 200
+
+
+class RecordsTableModel(QAbstractTableModel):
+    """Table model over search results, loaded lazily one page at a time.
+
+    Rows are fetched with keyset pagination (id > last loaded id) as the view
+    scrolls, so only the pages the user actually reaches are materialized.
+    Inserts, updates and deletes reported by the data layer patch only the
+    affected rows, so scroll position and selection are kept. A page that
+    cannot be loaded (e.g. the server is down in client mode) is reported
+    through load_failed instead of raising inside a Qt callback.
+    """
+
+    # (kind, record ids) from database change listeners, delivered on the GUI thread
+    records_changed = pyqtSignal(str, object)
+    load_failed = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        self._ids = []  # record ids of _rows, ascending
+        self._query = ''
+        self._exhausted = True
+        self.records_changed.connect(self._apply_change)
+        self._change_listener = self.records_changed.emit
+        add_change_listener(self._change_listener)
+        self.destroyed.connect(lambda: remove_change_listener(self._change_listener))
+
+    def set_query(self, text):
+        """Reset the model to the results of a new search."""
+        self.beginResetModel()
+        self._query = text
+        self._rows = []
+        self._exhausted = False
+        self._rows.extend(self._next_page())
+        self._ids = [row[0] for row in self._rows]
+        self.endResetModel()
+
+    def set_rows(self, text, rows):
+        """Show an already complete result (e.g. from the search cache) for text."""
+        self.beginResetModel()
+        self._query = text
+        self._rows = list(rows)
+        self._ids = [row[0] for row in self._rows]
+        self._exhausted = True
+        self.endResetModel()
+
+    def refresh(self):
+        self.set_query(self._query)
+
+    def record_id(self, row):
+        return self._rows[row][0]
+
+    def _next_page(self):
+        after_id = self._rows[-1][0] if self._rows else 0
+        try:
+            page = search_records_page(self._query, after_id=after_id, limit=PAGE_SIZE)
+        except Exception as e:
+            # Izuzetak iz fetchMore ili slota bi oborio celu aplikaciju
+            self._exhausted = True
+            self.load_failed.emit(str(e))
+            return []
+        if len(page) < PAGE_SIZE:
+            self._exhausted = True
+        return page
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        return str(self._rows[index.row()][index.column()])
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        page = self._next_page()
+        if not page:
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+        self._rows.extend(page)
+        self._ids.extend(row[0] for row in page)
+        self.endInsertRows()
+
+    def _row_of(self, record_id):
+        position = bisect_left(self._ids, record_id)
+        if position < len(self._ids) and self._ids[position] == record_id:
+            return position
+        return None
+
+    def _in_loaded_range(self, record_id):
+        # Zapisi iza poslednje ucitane stranice stizu kasnije preko fetchMore
+        return self._exhausted or (bool(self._ids) and record_id < self._ids[-1])
+
+    def _remove_row(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._rows[row]
+        del self._ids[row]
+        self.endRemoveRows()
+
+    def _insert_row(self, record):
+        row = bisect_left(self._ids, record[0])
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._rows.insert(row, record)
+        self._ids.insert(row, record[0])
+        self.endInsertRows()
+
+    def _apply_change(self, kind, record_ids):
+        if kind == 'reset':
+            self.refresh()
+            return
+        if kind == 'deleted':
+            for record_id in record_ids:
+                row = self._row_of(record_id)
+                if row is not None:
+                    self._remove_row(row)
+            return
+
+        # Inserted or updated: re-read just these ids, filtered by the current search
+        try:
+            matching = {record[0]: record for record in search_records_by_ids(self._query, record_ids)}
+        except Exception as e:
+            self.load_failed.emit(str(e))
+            return
+        for record_id in record_ids:
+            row = self._row_of(record_id)
+            record = matching.get(record_id)
+            if row is not None and record is not None:
+                self._rows[row] = record
+                self.dataChanged.emit(self.index(row, 0), self.index(row, len(HEADERS) - 1))
+            elif row is not None:
+                self._remove_row(row)
+            elif record is not None and self._in_loaded_range(record_id):
+                self._insert_row(record)
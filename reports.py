@@ -0,0 +1,326 @@
+# reports.py
+import io
+import os
+import tempfile
+from datetime import datetime
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.ticker import FuncFormatter
+from fpdf import FPDF
+
+FONT_PATH_REGULAR = './DejaVuSans.ttf'
+FONT_PATH_BOLD = './DejaVuSans-Bold.ttf'
+
+# Format grafika u izvestaju: 'png' (raster) ili 'svg' (vektorski, manji i ostriji PDF)
+CHART_FORMAT = 'png'
+CHART_DPI = 100
+
+# Fiksni deo radnog naloga: labele i sirine kolona se ne menjaju po zapisu
+WORK_ORDER_HEADERS = ['Broj', 'Datum', 'Broj šasije', 'Registarska oznaka', 'Marka/Model', 'Tip usluge', 'Cena']
+WORK_ORDER_FIELDS = [0, 1, 2, 3, 4, 5, 7]  # indeksi u record_data; 6 je Opis rada
+WORK_ORDER_LABEL_WIDTH = 50
+
+
+def _progress(progress, value):
+    if progress is not None:
+        progress(value)
+
+
+def _temp_pdf_path():
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp_file:
+        return tmp_file.name
+
+
+def new_pdf(bold=True):
+    """Create an FPDF document with the DejaVu fonts registered."""
+    # Dodavanje DejaVu fontova (obični i podebljani)
+    if not os.path.exists(FONT_PATH_REGULAR) or (bold and not os.path.exists(FONT_PATH_BOLD)):
+        raise FileNotFoundError('Nedostaje font fajl (DejaVuSans.ttf ili DejaVuSans-Bold.ttf)')
+    pdf = FPDF()
+    pdf.add_font("DejaVu", "", FONT_PATH_REGULAR)
+    if bold:
+        pdf.add_font("DejaVu", "B", FONT_PATH_BOLD)
+    return pdf
+
+
+def create_chart_with_legend(report_data, report_title, fmt=CHART_FORMAT):
+    """Render the pie chart into an in-memory buffer (PNG or SVG) for pdf.image."""
+    # Kreiranje pie chart-a; tipovi bez ijedne cene (ukupno None) nemaju udeo u zaradi
+    priced = [row for row in report_data if row[3]]
+    tip_usluge = [row[0] for row in priced]
+    sum_cena = [row[3] for row in priced]
+
+    # Figure bez pyplot-a: nema globalnog stanja, bezbedno iz vise niti
+    fig = Figure(figsize=(8, 8))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    if priced:
+        wedges, texts, autotexts = ax.pie(sum_cena, autopct='%1.1f%%', startangle=140)
+
+        # Dodavanje legende
+        ax.legend(wedges, tip_usluge, title="Tip usluge", loc="center left", bbox_to_anchor=(1, 0, 0.5, 1))
+        ax.axis('equal')  # Jednaki aspekt da bi pie chart bio krug
+    else:
+        ax.text(0.5, 0.5, 'Nema unetih cena', ha='center', va='center')
+        ax.axis('off')
+
+    # Slika ide u memoriju umesto u chart.png
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt, dpi=CHART_DPI, bbox_inches='tight')  # `bbox_inches='tight'` da smanji praznine oko grafa
+    buffer.seek(0)
+    return buffer
+
+
+def _chart_buffer(fig, fmt=CHART_FORMAT):
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt, dpi=CHART_DPI, bbox_inches='tight')
+    buffer.seek(0)
+    return buffer
+
+
+def _new_chart(figsize=(10, 4.5)):
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.yaxis.set_major_formatter(FuncFormatter(lambda value, _: f'{value:,.0f}'))
+    return fig, ax
+
+
+def _month_ticks(ax, months):
+    # Oznaka za januar svake godine, da ose ostanu citljive; za kratke periode svaki mesec
+    ticks = [index for index, month in enumerate(months) if month.endswith('-01')]
+    if len(months) <= 24 or len(ticks) < 2:
+        ticks = list(range(0, len(months), max(1, len(months) // 12)))
+    ax.set_xticks(ticks)
+    ax.set_xticklabels([months[index] for index in ticks], rotation=45, ha='right')
+
+
+def create_trend_charts(trends, fmt=CHART_FORMAT):
+    """Render the trend report charts; returns a dict of in-memory images."""
+    months = trends.months
+    positions = range(len(months))
+    charts = {}
+
+    fig, ax = _new_chart()
+    ax.plot(positions, trends.revenue, marker='.')
+    ax.set_title('Prihod po mesecu')
+    ax.grid(True, alpha=0.3)
+    _month_ticks(ax, months)
+    charts['revenue'] = _chart_buffer(fig, fmt)
+
+    fig, ax = _new_chart()
+    ax.bar(positions, trends.services)
+    ax.set_title('Broj servisa po mesecu')
+    _month_ticks(ax, months)
+    charts['services'] = _chart_buffer(fig, fmt)
+
+    fig, ax = _new_chart((10, 5))
+    width = 0.8 / max(len(trends.years), 1)
+    for index, year in enumerate(trends.years):
+        ax.bar([position + index * width for position in range(len(trends.service_names))],
+               trends.service_revenue[:, index], width=width, label=str(year))
+    ax.set_xticks([position + width * (len(trends.years) - 1) / 2 for position in range(len(trends.service_names))])
+    ax.set_xticklabels(trends.service_names)
+    ax.set_title('Prihod po tipu usluge i godini')
+    ax.legend()
+    charts['service_revenue'] = _chart_buffer(fig, fmt)
+
+    fig, ax = _new_chart()
+    ax.plot(positions, trends.average_ticket, marker='.', color='tab:green')
+    ax.set_title('Prosecna cena servisa')
+    ax.grid(True, alpha=0.3)
+    _month_ticks(ax, months)
+    charts['average_ticket'] = _chart_buffer(fig, fmt)
+
+    fig, ax = _new_chart()
+    growth = [0 if value != value else value for value in trends.revenue_growth]  # NaN -> 0
+    ax.bar(positions, growth, color=['tab:green' if value >= 0 else 'tab:red' for value in growth])
+    ax.axhline(0, color='black', linewidth=0.5)
+    ax.set_title('Promena prihoda u odnosu na prethodni mesec (%)')
+    _month_ticks(ax, months)
+    charts['revenue_growth'] = _chart_buffer(fig, fmt)
+    return charts
+
+
+def _percent(value):
+    return '-' if value != value else f'{value:+.1f}%'
+
+
+def _table(pdf, headers, widths, rows, aligns):
+    pdf.set_font("DejaVu", 'B', 10)
+    for header, width, align in zip(headers, widths, aligns):
+        pdf.cell(width, 8, header, border=1, align=align)
+    pdf.ln()
+    pdf.set_font("DejaVu", '', 10)
+    for row in rows:
+        for value, width, align in zip(row, widths, aligns):
+            pdf.cell(width, 8, str(value), border=1, align=align)
+        pdf.ln()
+
+
+def build_trend_report_pdf(start, end, report_title, progress=None, chart_format=CHART_FORMAT):
+    """Compute trends for [start, end) and render a multi-page PDF; returns its path."""
+    from analytics import compute_trends
+    trends = compute_trends(start, end)
+    _progress(progress, 30)
+    charts = create_trend_charts(trends, fmt=chart_format)
+    _progress(progress, 70)
+
+    pdf = new_pdf()
+    chart_width = pdf.w - 20
+
+    # Stranica 1 - prihod i broj servisa po mesecu
+    pdf.add_page()
+    pdf.set_font("DejaVu", 'B', 16)
+    pdf.cell(0, 10, report_title, ln=True, align='C')
+    pdf.set_font("DejaVu", '', 11)
+    pdf.cell(0, 7, f'Period: {trends.months[0]} - {trends.months[-1]}    '
+                   f'Datum generisanja: {datetime.now().strftime("%Y-%m-%d")}', ln=True, align='C')
+    pdf.cell(0, 7, f'Servisa: {trends.record_count}    Ukupno zaradjeno: {trends.total_revenue:.0f}    '
+                   f'Prosecna cena: {trends.total_average_ticket:.2f}', ln=True, align='C')
+    pdf.image(charts['revenue'], x=10, w=chart_width)
+    pdf.image(charts['services'], x=10, w=chart_width)
+
+    # Stranica 2 - tipovi usluge po godinama
+    pdf.add_page()
+    pdf.set_font("DejaVu", 'B', 14)
+    pdf.cell(0, 10, 'Tipovi usluge', ln=True)
+    pdf.image(charts['service_revenue'], x=10, w=chart_width)
+    years = trends.years[-3:]
+    year_columns = [trends.years.index(year) for year in years]
+    rows = [[name] + [f'{trends.service_revenue[index, column]:.0f}' for column in year_columns]
+            + [_percent(trends.service_growth[index])]
+            for index, name in enumerate(trends.service_names)]
+    widths = [50] + [35] * len(years) + [35]
+    _table(pdf, ['Tip usluge'] + [str(year) for year in years] + ['Rast 12m'], widths, rows,
+           ['L'] + ['R'] * (len(years) + 1))
+
+    # Stranica 3 - prosecna cena i mesecna promena
+    pdf.add_page()
+    pdf.image(charts['average_ticket'], x=10, w=chart_width)
+    pdf.image(charts['revenue_growth'], x=10, w=chart_width)
+
+    # Stranica 4 - top vozila i modeli
+    pdf.add_page()
+    pdf.set_font("DejaVu", 'B', 14)
+    pdf.cell(0, 10, 'Top vozila', ln=True)
+    _table(pdf, ['Broj šasije', 'Marka/Model', 'Servisa', 'Ukupno'], [60, 60, 25, 45],
+           [(vin, model, count, f'{total:.0f}') for vin, model, count, total in trends.top_vehicles],
+           ['L', 'L', 'R', 'R'])
+    pdf.ln(8)
+    pdf.set_font("DejaVu", 'B', 14)
+    pdf.cell(0, 10, 'Top marke/modeli', ln=True)
+    _table(pdf, ['Marka/Model', 'Servisa', 'Ukupno'], [120, 25, 45],
+           [(model, count, f'{total:.0f}') for model, count, total in trends.top_models],
+           ['L', 'R', 'R'])
+    _progress(progress, 90)
+
+    output_path = _temp_pdf_path()
+    pdf.output(output_path)
+    _progress(progress, 100)
+    return output_path
+
+
+def build_report_pdf(report_data, report_title, progress=None, chart_format=CHART_FORMAT):
+    """Render a report to a temporary PDF file and return its path.
+
+    progress, if given, is called with a percentage between steps; it may
+    raise to abort the job (see workers.JobCancelled).
+    """
+    # Kreiranje PDF-a
+    pdf = new_pdf()
+    _progress(progress, 20)
+
+    # Stranica 1 - Pie chart
+    pdf.add_page()
+    pdf.set_font("DejaVu", 'B', 16)
+    pdf.cell(0, 10, report_title, ln=True, align='C')
+    pdf.ln(10)
+
+    # Dodavanje pie chart-a
+    chart = create_chart_with_legend(report_data, report_title, fmt=chart_format)
+    _progress(progress, 60)
+    pdf.image(chart, x=10, y=40, w=pdf.w - 20)
+
+    # Datum generisanja u donjem desnom uglu druge stranice
+    pdf.set_y(-15)
+    pdf.set_font("DejaVu", '', 10)
+    pdf.cell(0, 10, f'Datum generisanja: {datetime.now().strftime("%Y-%m-%d")}', align='R')
+    pdf.ln(10)
+
+    # Stranica 2 - Tabela sa podacima
+    # pdf.add_page()
+    pdf.set_font("DejaVu", 'B', 12)
+    pdf.cell(60, 10, 'Tip usluge', border=1)
+    pdf.cell(30, 10, 'Kolicina', border=1, align='R')
+    pdf.cell(50, 10, 'Prosecna Cena', border=1, align='R')
+    pdf.cell(50, 10, 'Ukupno Zaradjeno', border=1, align='R')
+    pdf.ln()
+
+    # Podaci u tabeli
+    pdf.set_font("DejaVu", '', 12)
+    for row in report_data:
+        tip_usluge, count, avg_cena, sum_cena = row
+        pdf.cell(60, 10, str(tip_usluge), border=1)
+        pdf.cell(30, 10, str(count), border=1, align='R')
+        # Bez ijedne unete cene nema ni proseka ni zbira
+        pdf.cell(50, 10, f'{avg_cena:.2f}' if avg_cena is not None else '-', border=1, align='R')
+        pdf.cell(50, 10, str(sum_cena) if sum_cena is not None else '-', border=1, align='R')
+        pdf.ln()
+    _progress(progress, 80)
+
+    output_path = _temp_pdf_path()
+    pdf.output(output_path)
+    _progress(progress, 100)
+    return output_path
+
+
+def add_work_order_page(pdf, record_data):
+    """Lay out one work order on a new page of pdf (see build_work_orders_pdf)."""
+    record_id = record_data[0]
+    pdf.add_page()
+
+    # Title
+    pdf.set_font("DejaVu", '', 14)
+    pdf.cell(0, 10, f'Servis broj: {record_id}', ln=True, align='L')
+    pdf.ln(5)
+
+    # Adding main table data without "Opis rada"
+    pdf.set_font("DejaVu", '', 12)
+    for header, field in zip(WORK_ORDER_HEADERS, WORK_ORDER_FIELDS):
+        pdf.cell(WORK_ORDER_LABEL_WIDTH, 10, f"{header}:", border=1, align='L')
+        pdf.cell(0, 10, str(record_data[field]), border=1, align='L')
+        pdf.ln()
+
+    # Separate section for "Opis rada"
+    pdf.ln(5)
+    pdf.cell(0, 10, 'Opis rada:', ln=True)
+    pdf.multi_cell(0, 10, record_data[6], border=1, align='L')
+
+    # Signature line
+    pdf.ln(20)
+    pdf.cell(140)
+    pdf.cell(50, 10, '_________________________', 0, 1, 'R')
+    pdf.cell(140)
+    pdf.cell(50, 10, 'Potpis', 0, 1, 'R')
+
+
+def build_work_order_pdf(record_data, progress=None):
+    """Render one work order (record tuple from get_record_by_id) and return the PDF path."""
+    return build_work_orders_pdf([record_data], progress=progress)
+
+
+def build_work_orders_pdf(records, progress=None):
+    """Render many work orders into one PDF, one page each, and return its path.
+
+    All pages share one document, so the fonts are subset and embedded once.
+    """
+    pdf = new_pdf(bold=False)
+    for index, record_data in enumerate(records, start=1):
+        add_work_order_page(pdf, record_data)
+        _progress(progress, 90 * index // len(records))
+
+    output_path = _temp_pdf_path()
+    pdf.output(output_path)
+    _progress(progress, 100)
+    return output_path
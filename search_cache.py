@@ -0,0 +1,87 @@
+# search_cache.py
+import threading
+from collections import OrderedDict
+
+# Broj upita koji se pamte
+CACHE_SIZE = 32
+# Veci rezultati se ne kesiraju; tabela ih onda ucitava stranicu po stranicu
+CACHE_ROW_LIMIT = 20000
+# Kolona po kojoj se pretrazuje (broj sasije) u redu iz search_records
+SEARCH_FIELD = 2
+
+
+def cacheable(text):
+    """Whether a plain substring check gives the same rows as the LIKE query for text.
+
+    LIKE treats % and _ as wildcards and folds case for ASCII letters only,
+    so such queries always go to the database.
+    """
+    return text.isascii() and '%' not in text and '_' not in text
+
+
+def _normalize(text):
+    return text.lower()
+
+
+class SearchCache:
+    """LRU cache of chassis-number search results.
+
+    A query that is not cached can still be answered from a cached shorter
+    query it contains: every record matching 'WVWZ' also matches 'WVW', so
+    the narrower result is filtered in Python from the cached superset.
+    The cache must be cleared whenever records change (see clear()); every
+    clear starts a new epoch, and put() drops rows read in an earlier one,
+    so a search that was already running during a write cannot bring its
+    stale rows back. Texts are used as given: the caller strips the query
+    once and passes the same text to search_records.
+    """
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self.epoch = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, text):
+        """Return cached rows for text, or None if it has to be queried."""
+        if not cacheable(text):
+            return None
+        key = _normalize(text)
+        with self._lock:
+            rows = self._entries.get(key)
+            if rows is not None:
+                self._entries.move_to_end(key)
+                return rows
+            # Najduzi kesirani upit koji je sadrzan u novom je najuzi nadskup
+            supersets = [cached for cached in self._entries if cached and cached in key]
+            if not supersets:
+                return None
+            superset = max(supersets, key=len)
+            self._entries.move_to_end(superset)
+            source = self._entries[superset]
+            epoch = self.epoch
+        rows = [row for row in source if key in str(row[SEARCH_FIELD]).lower()]
+        if epoch != self.epoch:
+            # Zapisi su se promenili dok se filtrirao nadskup
+            return None
+        self.put(text, rows, epoch)
+        return rows
+
+    def put(self, text, rows, epoch=None):
+        """Cache rows for text; epoch is self.epoch from before the rows were read."""
+        if len(rows) > CACHE_ROW_LIMIT or not cacheable(text):
+            return
+        key = _normalize(text)
+        with self._lock:
+            if epoch is not None and epoch != self.epoch:
+                return
+            self._entries[key] = rows
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self, *_):
+        """Drop all entries; usable directly as a database change listener."""
+        with self._lock:
+            self._entries.clear()
+            self.epoch += 1
@@ -0,0 +1,496 @@
+# server.py
+"""Local HTTP/JSON server over the records database, for several workstations.
+
+    python server.py [--host 0.0.0.0 --token TAJNA] [--port 8765] [--db app_data.db]
+
+One PC runs the server next to app_data.db; the others start the desktop
+app with DPFPA_SERVER=http://<host>:8765 (see api_client.py). When a token
+is set (--token or DPFPA_TOKEN), every request must carry it in the
+X-DPFPA-Token header; listening on anything but loopback requires one.
+
+Reads run on a pool of READERS threads, each with its own connection (WAL
+lets them proceed while a write is in progress). All writes go through one
+writer thread; writes that arrive together are handled in one batch, and
+concurrent inserts are merged into a single insert_records transaction.
+GET responses carry an ETag and are cached until the database changes
+(PRAGMA data_version), so repeated requests from the clients are answered
+with 304 or from memory without touching SQLite.
+"""
+import os
+import re
+import hmac
+import json
+import asyncio
+import logging
+import hashlib
+import argparse
+import collections
+from urllib.parse import urlsplit, parse_qsl, unquote
+from concurrent.futures import ThreadPoolExecutor
+
+# Server je uvek lokalni pristup bazi, nikad klijent drugog servera
+os.environ.pop('DPFPA_SERVER', None)
+import database
+
+DEFAULT_PORT = 8765
+# Broj niti za citanje (svaka ima svoju konekciju)
+READERS = 4
+# Najvise upisa koji se obradjuju u jednom prolazu pisaca
+WRITE_BATCH_MAX = 200
+# Broj GET odgovora koji se pamte
+RESPONSE_CACHE_SIZE = 256
+# Broj poslednjih izmena koje klijenti mogu da dohvate preko /changes
+CHANGE_LOG_SIZE = 1000
+CHANGES_TIMEOUT = 25
+TOKEN_HEADER = 'X-DPFPA-Token'
+LOOPBACK_HOSTS = ('127.0.0.1', 'localhost', '::1')
+# Koliko cesto server proverava da li je vreme za mesecni backup (sekundi)
+BACKUP_CHECK_INTERVAL = 3600
+MAX_BODY = 16 * 1024 * 1024
+
+RECORD_FIELDS = ['datum', 'broj_sasije', 'registarska_oznaka', 'marka_model', 'tip_usluge_id', 'opis_rada', 'cena']
+
+STATUS_TEXT = {200: 'OK', 201: 'Created', 304: 'Not Modified', 400: 'Bad Request', 401: 'Unauthorized',
+               404: 'Not Found', 405: 'Method Not Allowed', 409: 'Conflict', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _record_values(data):
+    """Convert a JSON record object to the insert/update argument tuple."""
+    if not isinstance(data, dict):
+        raise HttpError(400, 'Record must be a JSON object')
+    missing = [field for field in RECORD_FIELDS if field not in data]
+    if missing:
+        raise HttpError(400, f'Missing fields: {", ".join(missing)}')
+    return tuple(data[field] for field in RECORD_FIELDS)
+
+
+def _ids(value):
+    if isinstance(value, str):
+        value = [part for part in value.split(',') if part]
+    try:
+        return [int(record_id) for record_id in value]
+    except (TypeError, ValueError):
+        raise HttpError(400, 'ids must be a list of integers')
+
+
+def _int(params, name, default=None):
+    try:
+        return int(params[name]) if name in params else default
+    except ValueError:
+        raise HttpError(400, f'{name} must be an integer')
+
+
+def _search_args(params):
+    column = params.get('column', 'broj_sasije') or None
+    return params.get('q', ''), column, params.get('mode', 'contains')
+
+
+def _listing_args(params):
+    # Period (end iskljucen) i tip usluge za izvoz spiska, svaki opciono
+    return {'start': params.get('start'), 'end': params.get('end'), 'tip_usluge_id': _int(params, 'tip_usluge_id')}
+
+
+def _pdf_bytes(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+
+def _found(value):
+    if value is None:
+        raise HttpError(404, 'Not found')
+    return value
+
+
+# Citanja: (regex, funkcija(params, match)) -> JSON vrednost ili bytes (PDF)
+def _get_records(params, match):
+    text, column, mode = _search_args(params)
+    return database.search_records_page(text, after_id=_int(params, 'after_id', 0),
+                                        limit=min(_int(params, 'limit', 200), 5000), column=column, mode=mode,
+                                        **_listing_args(params))
+
+
+def _search(params, match):
+    text, column, mode = _search_args(params)
+    return database.search_records(text, column=column, mode=mode, limit=_int(params, 'limit'))
+
+
+def _by_ids(params, match):
+    text, column, mode = _search_args(params)
+    return database.search_records_by_ids(text, _ids(params.get('ids', '')), column=column, mode=mode)
+
+
+def _report(params, match):
+    if 'start' not in params or 'end' not in params:
+        raise HttpError(400, 'start and end are required')
+    return database.get_report(params['start'], params['end'])
+
+
+def _monthly_totals(params, match):
+    return database.get_monthly_totals(params.get('start', '0000-00-00'), params.get('end', '9999-99-99'))
+
+
+def _trend_pdf(params, match):
+    from reports import build_trend_report_pdf
+    if 'start' not in params or 'end' not in params:
+        raise HttpError(400, 'start and end are required')
+    return _pdf_bytes(build_trend_report_pdf(params['start'], params['end'], params.get('title', 'Trend Izvestaj')))
+
+
+def _work_order_pdf(params, match):
+    from reports import build_work_order_pdf
+    return _pdf_bytes(build_work_order_pdf(_found(database.get_record_by_id(int(match.group(1))))))
+
+
+def _work_orders_pdf(data):
+    from reports import build_work_orders_pdf
+    if not isinstance(data, dict):
+        raise HttpError(400, 'Expected a JSON object')
+    return _pdf_bytes(build_work_orders_pdf(_found(database.search_records_by_ids('', _ids(data.get('ids', []))) or None)))
+
+
+READ_ROUTES = [
+    (r'/health', lambda params, match: {'schema_version': database.schema_version()}),
+    (r'/records', _get_records),
+    (r'/records/search', _search),
+    (r'/records/by-ids', _by_ids),
+    (r'/records/count', lambda params, match: database.count_search_records(*_search_args(params),
+                                                                            **_listing_args(params))),
+    (r'/records/archived', lambda params, match: database.archived_record_ids(_ids(params.get('ids', '')))),
+    (r'/records/(\d+)', lambda params, match: _found(database.get_record_by_id(int(match.group(1))))),
+    (r'/records/(\d+)/work-order\.pdf', _work_order_pdf),
+    (r'/tip-usluge', lambda params, match: database.get_tip_usluge_list(params.get('include_retired') == '1')),
+    (r'/reports', _report),
+    (r'/reports/monthly', lambda params, match: database.get_monthly_report()),
+    (r'/reports/yearly', lambda params, match: database.get_yearly_report()),
+    (r'/reports/monthly-totals', _monthly_totals),
+    (r'/reports/trend\.pdf', _trend_pdf),
+    (r'/vehicles', lambda params, match: database.search_vehicles(params.get('prefix', ''),
+                                                                  min(_int(params, 'limit', 20), 1000))),
+    (r'/vehicles/([^/]+)', lambda params, match: _found(database.get_vehicle(match.group(1)))),
+    (r'/vehicles/([^/]+)/history', lambda params, match: _found(database.get_vehicle_history(match.group(1)))),
+]
+
+# Upisi: (metoda, regex, naziv operacije). Operacija dobija (telo, match) u niti pisca.
+WRITE_ROUTES = [
+    ('POST', r'/records', 'insert'),
+    ('POST', r'/records/batch', 'insert_many'),
+    ('PUT', r'/records/(\d+)', 'update'),
+    ('DELETE', r'/records/(\d+)', 'delete_one'),
+    ('POST', r'/records/update', 'update_many'),
+    ('POST', r'/records/delete', 'delete_many'),
+    ('POST', r'/tip-usluge', 'insert_tip_usluge'),
+    ('PUT', r'/tip-usluge/(\d+)', 'rename_tip_usluge'),
+    ('POST', r'/tip-usluge/(\d+)/retire', 'retire_tip_usluge'),
+]
+
+
+class ApiServer:
+    def __init__(self, readers=READERS, backups=True, token=None):
+        self.read_pool = ThreadPoolExecutor(readers, thread_name_prefix='api-read')
+        # Jedini pisac: sve izmene baze idu kroz ovu nit i njenu konekciju
+        self.write_pool = ThreadPoolExecutor(1, thread_name_prefix='api-write')
+        self.read_routes = [(re.compile(pattern + '$'), handler) for pattern, handler in READ_ROUTES]
+        self.write_routes = [(method, re.compile(pattern + '$'), op) for method, pattern, op in WRITE_ROUTES]
+        self.cache = collections.OrderedDict()  # target -> (data_version, etag, content_type, body)
+        self.changes = collections.deque(maxlen=CHANGE_LOG_SIZE)
+        self.change_seq = 0
+        self.stats = collections.Counter()
+        self.backups = backups
+        self.token = token.encode('utf-8') if token else None
+        self.loop = None
+        self.write_queue = None
+        self.changed = None
+
+    async def start(self, host, port):
+        self.loop = asyncio.get_running_loop()
+        self.write_queue = asyncio.Queue()
+        self.changed = asyncio.Condition()
+        database.add_change_listener(self._on_change)
+        self.loop.create_task(self._writer())
+        if self.backups:
+            self.loop.create_task(self._backup_loop())
+        return await asyncio.start_server(self._handle_client, host, port)
+
+    async def _backup_loop(self):
+        # Klijenti ne prave backup, pa to radi server (isto pravilo kao InsertForm)
+        from backup import backup_in_background
+        while True:
+            backup_in_background()
+            await asyncio.sleep(BACKUP_CHECK_INTERVAL)
+
+    # Izmene i verzija podataka
+
+    def _on_change(self, kind, record_ids):
+        # Poziva se u niti pisca
+        self.loop.call_soon_threadsafe(self.loop.create_task, self._log_change(kind, record_ids))
+
+    async def _log_change(self, kind, record_ids):
+        async with self.changed:
+            self.change_seq += 1
+            self.changes.append((self.change_seq, kind, record_ids))
+            self.changed.notify_all()
+
+    def _data_version(self):
+        # Menja se kad god neka druga konekcija (pisac, drugi proces) upise nesto
+        return database.get_connection().execute('PRAGMA data_version').fetchone()[0]
+
+    async def _changes(self, params):
+        since = _int(params, 'since')
+        timeout = min(_int(params, 'timeout', CHANGES_TIMEOUT), 60)
+        async with self.changed:
+            if since is not None and since == self.change_seq:
+                try:
+                    await asyncio.wait_for(self.changed.wait_for(lambda: self.change_seq > since), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            first = self.changes[0][0] if self.changes else self.change_seq + 1
+            result = {'seq': self.change_seq, 'changes': [], 'reset': False}
+            if since is not None:
+                # Izmene su ispale iz dnevnika ili je server u medjuvremenu restartovan
+                result['reset'] = since < first - 1 or since > self.change_seq
+                result['changes'] = [[seq, kind, ids] for seq, kind, ids in self.changes if seq > since]
+            return result
+
+    # HTTP
+
+    async def _handle_client(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY:
+                    await self._send(writer, 413, {}, b'', False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                status, extra_headers, payload = await self.dispatch(method, target, headers, body)
+                await self._send(writer, status, extra_headers, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _send(self, writer, status, headers, payload, keep_alive):
+        lines = [f'HTTP/1.1 {status} {STATUS_TEXT.get(status, "")}',
+                 f'Content-Length: {len(payload)}',
+                 f'Connection: {"keep-alive" if keep_alive else "close"}']
+        lines += [f'{name}: {value}' for name, value in headers.items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + payload)
+        await writer.drain()
+
+    async def dispatch(self, method, target, headers, body):
+        url = urlsplit(target)
+        path = unquote(url.path).rstrip('/') or '/'
+        # column= (prazno) znaci pretragu po svim kolonama, pa se prazne vrednosti zadrzavaju
+        params = dict(parse_qsl(url.query, keep_blank_values=True))
+        self.stats['requests'] += 1
+        try:
+            if self.token is not None and not hmac.compare_digest(
+                    headers.get(TOKEN_HEADER.lower(), '').encode('utf-8'), self.token):
+                raise HttpError(401, f'Missing or wrong {TOKEN_HEADER}')
+            if method == 'GET' and path == '/changes':
+                return self._json(200, await self._changes(params))
+            if method == 'GET' and path == '/stats':
+                return self._json(200, dict(self.stats))
+            if method == 'GET':
+                return await self._read(target, path, params, headers)
+            if method == 'POST' and path == '/work-orders.pdf':
+                # Samo citanje, pa ide na niti za citanje a ne kroz pisca
+                data = json.loads(body) if body else None
+                pdf = await self.loop.run_in_executor(self.read_pool, _work_orders_pdf, data)
+                return 200, {'Content-Type': 'application/pdf'}, pdf
+            for route_method, pattern, op in self.write_routes:
+                match = pattern.match(path)
+                if match and route_method == method:
+                    data = json.loads(body) if body else None
+                    result = await self._write(op, data, match)
+                    return self._json(201 if method == 'POST' and op.startswith('insert') else 200, result)
+            raise HttpError(404, f'No route for {method} {path}')
+        except HttpError as e:
+            return self._json(e.status, {'error': str(e)})
+        except database.ArchivedRecordError as e:
+            return self._json(409, {'error': str(e), 'ids': e.record_ids})
+        except (ValueError, TypeError) as e:
+            return self._json(400, {'error': str(e)})
+        except Exception as e:
+            self.stats['errors'] += 1
+            return self._json(500, {'error': f'{type(e).__name__}: {e}'})
+
+    def _json(self, status, value, headers=None):
+        body = json.dumps(value, ensure_ascii=False).encode('utf-8')
+        return status, dict(headers or {}, **{'Content-Type': 'application/json; charset=utf-8'}), body
+
+    async def _read(self, target, path, params, headers):
+        for pattern, handler in self.read_routes:
+            match = pattern.match(path)
+            if match:
+                break
+        else:
+            raise HttpError(404, f'No route for GET {path}')
+
+        version = self._data_version()
+        cached = self.cache.get(target)
+        if cached is not None and cached[0] == version:
+            self.cache.move_to_end(target)
+            self.stats['cache_hits'] += 1
+            _, etag, content_type, body = cached
+        else:
+            result = await self.loop.run_in_executor(self.read_pool, handler, params, match)
+            if isinstance(result, bytes):
+                content_type, body = 'application/pdf', result
+            else:
+                _, response_headers, body = self._json(200, result)
+                content_type = response_headers['Content-Type']
+            etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+            self.cache[target] = (version, etag, content_type, body)
+            while len(self.cache) > RESPONSE_CACHE_SIZE:
+                self.cache.popitem(last=False)
+
+        if headers.get('if-none-match') == etag:
+            self.stats['not_modified'] += 1
+            return 304, {'ETag': etag}, b''
+        return 200, {'ETag': etag, 'Content-Type': content_type}, body
+
+    # Upisi
+
+    async def _write(self, op, data, match):
+        future = self.loop.create_future()
+        await self.write_queue.put((op, data, match, future))
+        return await future
+
+    async def _writer(self):
+        while True:
+            batch = [await self.write_queue.get()]
+            while not self.write_queue.empty() and len(batch) < WRITE_BATCH_MAX:
+                batch.append(self.write_queue.get_nowait())
+            self.stats['write_batches'] += 1
+            self.stats['writes'] += len(batch)
+            results = await self.loop.run_in_executor(self.write_pool, self._run_writes, batch)
+            for (_, _, _, future), (ok, value) in zip(batch, results):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    def _run_writes(self, batch):
+        """Execute one batch on the writer thread; returns (ok, result or exception) per item."""
+        results = [None] * len(batch)
+        # Svi pojedinacni unosi iz ovog prolaza idu u jednu transakciju
+        inserts = []
+        for index, (op, data, match, _) in enumerate(batch):
+            if op == 'insert':
+                try:
+                    inserts.append((index, _record_values(data)))
+                except HttpError as e:
+                    results[index] = (False, e)
+        if inserts:
+            try:
+                record_ids = database.insert_records([values for _, values in inserts])
+                for (index, _), record_id in zip(inserts, record_ids):
+                    results[index] = (True, {'id': record_id})
+            except Exception:
+                # Jedan los zapis ne sme da obori ostale: ponovi jedan po jedan
+                for index, values in inserts:
+                    results[index] = self._call(lambda: {'id': database.insert_record(*values)})
+
+        for index, (op, data, match, _) in enumerate(batch):
+            if op != 'insert':
+                results[index] = self._call(lambda: self._apply_write(op, data, match))
+        return results
+
+    def _call(self, func):
+        try:
+            return True, func()
+        except Exception as e:
+            return False, e
+
+    def _apply_write(self, op, data, match):
+        if op == 'insert_many':
+            if not isinstance(data, list):
+                raise HttpError(400, 'Expected a list of records')
+            return {'ids': database.insert_records([_record_values(item) for item in data])}
+        if op == 'update':
+            record_id = int(match.group(1))
+            _found(database.get_record_by_id(record_id))
+            database.update_record(record_id, *_record_values(data))
+            return {'id': record_id}
+        if op == 'delete_one':
+            database.delete_records([int(match.group(1))])
+            return {'deleted': 1}
+        if not isinstance(data, dict):
+            raise HttpError(400, 'Expected a JSON object')
+        if op == 'insert_tip_usluge':
+            return {'id': database.add_tip_usluge(data.get('naziv'))}
+        if op == 'rename_tip_usluge':
+            database.rename_tip_usluge(int(match.group(1)), data.get('naziv'))
+            return {'id': int(match.group(1))}
+        if op == 'retire_tip_usluge':
+            database.retire_tip_usluge(int(match.group(1)), bool(data.get('retired', True)))
+            return {'id': int(match.group(1))}
+        record_ids = _ids(data.get('ids', []))
+        if op == 'update_many':
+            database.update_records(record_ids, tip_usluge_id=data.get('tip_usluge_id'), cena=data.get('cena'))
+            return {'updated': len(record_ids)}
+        if op == 'delete_many':
+            database.delete_records(record_ids)
+            return {'deleted': len(record_ids)}
+        raise HttpError(404, f'Unknown operation {op}')
+
+
+async def serve(host, port, readers=READERS, backups=True, token=None):
+    api = ApiServer(readers, backups, token)
+    server = await api.start(host, port)
+    addresses = ', '.join(str(sock.getsockname()) for sock in server.sockets)
+    print(f'Serving {database.DB_PATH} on {addresses}', flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP/JSON server nad bazom servisnih zapisa')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--db', default=database.DB_PATH)
+    parser.add_argument('--readers', type=int, default=READERS)
+    parser.add_argument('--no-backup', action='store_true', help='bez automatskog backup-a (probne baze)')
+    parser.add_argument('--token', default=os.environ.get('DPFPA_TOKEN'),
+                        help=f'deljena tajna koju klijenti salju u {TOKEN_HEADER} (podrazumevano DPFPA_TOKEN)')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s: %(message)s')
+    # Bez tokena bi svako na mrezi mogao da cita i menja bazu
+    if args.host not in LOOPBACK_HOSTS and not args.token:
+        parser.error(f'--host {args.host} requires --token (or DPFPA_TOKEN)')
+
+    database.set_db_path(args.db)
+    database.connect(backup=not args.no_backup)
+    try:
+        asyncio.run(serve(args.host, args.port, args.readers, not args.no_backup, args.token))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
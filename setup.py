@@ -21,6 +21,10 @@ setup(
         base=base,
         icon='tb.ico',    # This is where you specify the icon
         target_name='dpfpa.exe'  # Optional: specify the name of the executable
+    ), Executable(
+        'server.py',
+        icon='tb.ico',
+        target_name='dpfpa_server.exe'  # Console app, see "Multiple workstations" in README.md
     )]
 )
 
@@ -0,0 +1,31 @@
+# tests/conftest.py
+import random
+from datetime import date, timedelta
+
+import pytest
+
+import database
+
+
+@pytest.fixture
+def db(tmp_path):
+    """A fresh, migrated database in tmp_path; yields its path."""
+    path = str(tmp_path / 'test.db')
+    database.set_db_path(path)
+    database.connect(backup=False)
+    try:
+        yield path
+    finally:
+        database.close_connections()
+
+
+def sample_rows(count, first=date(2021, 1, 1), days=4 * 365, seed=1):
+    """count deterministic records (insert_records tuples) spread over days from first."""
+    rng = random.Random(seed)
+    rows = []
+    for index in range(count):
+        vin = f'WVWZZZ1K{rng.randrange(100):02d}M{index % 50:06d}'
+        rows.append(((first + timedelta(days=rng.randrange(days))).isoformat(), vin, f'NS {index % 50:03d}-AA',
+                     rng.choice(['VW Golf', 'Škoda Octavia', 'Fiat Punto']), rng.randint(1, 5),
+                     f'Zamena ulja č/ć {index}', rng.choice([None, 1500, 4200, 12000])))
+    return rows
@@ -0,0 +1,81 @@
+# tests/test_archive.py
+"""Archiving: reads across both files, writes to archived records, interrupted moves."""
+import os
+import sys
+import subprocess
+
+import pytest
+
+import database
+from conftest import sample_rows
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CUTOFF = '2023-01-01'
+WHOLE_RANGE = ('2020-01-01', '2026-01-01')
+
+# Segment prve godine se upise, pa proces umre pre brisanja iz zive baze
+INTERRUPTED_RUN = '''
+import os, sys
+import database, archive
+database.set_db_path(sys.argv[1])
+database.connect(backup=False)
+archive._delete_live = lambda conn, record_ids: os._exit(3)
+archive.archive_records(sys.argv[2], backup=False, vacuum=False)
+'''
+
+
+def _snapshot():
+    return {
+        'ids': [row[0] for row in database.get_all_records()],
+        'report': database.get_report(*WHOLE_RANGE),
+        'partial_report': database.get_report('2021-02-03', '2024-05-06'),
+        'monthly': database.get_monthly_totals(*WHOLE_RANGE),
+        'count': database.count_search_records('', None),
+        'search': database.search_records('NS 00', column=None),
+    }
+
+
+def _live_count():
+    return database.get_connection().execute('SELECT COUNT(*) FROM records').fetchone()[0]
+
+
+def test_archived_records_read_like_live_ones(db):
+    import archive
+    database.insert_records(sample_rows(500))
+    before = _snapshot()
+    moved = archive.archive_records(CUTOFF, backup=False, vacuum=False)
+    assert moved > 0 and _live_count() == 500 - moved
+    assert _snapshot() == before
+    page = database.search_records_page('', after_id=0, limit=100, column=None)
+    assert [row[0] for row in page] == before['ids'][:100]
+
+
+def test_writes_to_archived_records_are_rejected(db):
+    import archive
+    database.insert_records(sample_rows(200))
+    archive.archive_records(CUTOFF, backup=False, vacuum=False)
+    conn = database.get_connection()
+    archived_id = conn.execute('SELECT min_id FROM archive.segments').fetchone()[0]
+    with pytest.raises(database.ArchivedRecordError) as error:
+        database.delete_records([archived_id])
+    assert error.value.record_ids == [archived_id]
+    with pytest.raises(database.ArchivedRecordError):
+        database.update_records([archived_id], cena=1)
+    assert database.get_record_by_id(archived_id) is not None
+
+
+def test_interrupted_move_is_never_counted_twice(db):
+    database.insert_records(sample_rows(500))
+    before = _snapshot()
+    database.close_connections()
+
+    result = subprocess.run([sys.executable, '-c', INTERRUPTED_RUN, db, CUTOFF], cwd=ROOT)
+    assert result.returncode == 3
+
+    # Bez connect(): segment je u arhivi, a isti zapisi jos u zivoj tabeli
+    assert _live_count() == 500
+    assert _snapshot() == before
+
+    database.connect(backup=False)
+    assert _live_count() < 500
+    assert _snapshot() == before
@@ -0,0 +1,67 @@
+# tests/test_backup.py
+"""Backups are verified copies; damaged ones are rejected and old ones pruned."""
+import os
+import gzip
+import sqlite3
+
+import pytest
+
+import backup
+import database
+from conftest import sample_rows
+
+
+def _count(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM records').fetchone()[0]
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_backup_is_a_verified_copy(db, tmp_path, compress):
+    database.insert_records(sample_rows(300))
+    backup_dir = str(tmp_path / 'backups')
+    steps = []
+    path = backup.create_backup(backup_dir=backup_dir, compress=compress,
+                                progress=lambda remaining, total: steps.append(remaining))
+    assert steps and steps[-1] == 0
+    assert backup.list_backups(backup_dir) == [path]
+    assert os.listdir(backup_dir) == [os.path.basename(path)]  # bez .partial ostataka
+    backup.verify_backup(path)
+    assert not backup.backup_due(backup_dir)
+
+    if compress:
+        plain = str(tmp_path / 'plain.db')
+        with gzip.open(path, 'rb') as src, open(plain, 'wb') as out:
+            out.write(src.read())
+        path = plain
+    assert _count(path) == 300
+
+
+@pytest.mark.parametrize('damage', ['page', 'header', 'gzip'])
+def test_damaged_backup_is_rejected(db, tmp_path, damage):
+    database.insert_records(sample_rows(300))
+    path = backup.create_backup(backup_dir=str(tmp_path), compress=damage == 'gzip')
+    with open(path, 'r+b') as f:
+        if damage == 'gzip':
+            f.truncate(os.path.getsize(path) // 2)
+        elif damage == 'page':
+            f.seek(3 * 4096)
+            f.write(b'\xff' * 4096)
+        else:
+            f.seek(0)
+            f.write(b'\x00' * 100)
+    with pytest.raises(backup.BackupError):
+        backup.verify_backup(path)
+
+
+def test_prune_keeps_the_newest(tmp_path):
+    names = [f'{backup.BACKUP_PREFIX}202401{day:02d}_120000.db' for day in range(1, 8)]
+    for name in names + ['notes.txt', f'{backup.BACKUP_PREFIX}20240108_120000.db.partial']:
+        (tmp_path / name).write_bytes(b'')
+    removed = backup.prune_backups(str(tmp_path), keep=3)
+    assert sorted(os.path.basename(path) for path in removed) == names[:4]
+    assert [os.path.basename(path) for path in backup.list_backups(str(tmp_path))] == names[:3:-1]
+    assert backup.backup_due(str(tmp_path / 'missing'))
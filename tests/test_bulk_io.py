@@ -0,0 +1,92 @@
+# tests/test_bulk_io.py
+"""Bulk import validation, export/import round trips and the deferred search index."""
+import json
+
+import pytest
+
+import database
+import bulk_io
+from conftest import sample_rows
+
+CSV = '''datum,broj_sasije,registarska_oznaka,marka_model,tip_usluge,opis_rada,cena
+2024-03-01,WVWZZZ1KZAM000001,NS 001-AA,VW Golf,dpf,Čišćenje filtera,12000
+2024-03-02,,NS 002-AA,VW Golf,DPF,Bez sasije,
+2024-3-2,WVWZZZ1KZAM000003,NS 003-AA,VW Golf,DPF,Kratak datum,
+2024-02-30,WVWZZZ1KZAM000004,NS 004-AA,VW Golf,DPF,Nepostojeci dan,
+2024-03-05,WVWZZZ1KZAM000005,NS 005-AA,VW Golf,LIMARIJA,Nepoznat tip,
+2024-03-06,WVWZZZ1KZAM000006,NS 006-AA,VW Golf,GUME,Cena nije broj,hiljadu
+2024-03-07,WVWZZZ1KZAM000007,NS 007-AA,"Škoda Octavia, 1.9",  gume  ,"Zarez, ""navodnici""",
+'''
+
+
+def _records_without_ids():
+    return [row[1:] for row in database.get_all_records()]
+
+
+def test_invalid_rows_are_reported_and_skipped(db, tmp_path):
+    path = tmp_path / 'records.csv'
+    path.write_text(CSV, encoding='utf-8-sig')
+    result = bulk_io.import_records(str(path), chunk_size=2)
+    assert result.inserted == 2
+    assert [line for line, _ in result.errors] == [3, 4, 5, 6, 7]
+    assert 'broj_sasije' in result.errors[0][1]
+    assert 'yyyy-mm-dd' in result.errors[1][1]
+    assert 'LIMARIJA' in result.errors[3][1]
+    assert _records_without_ids() == [
+        ('2024-03-01', 'WVWZZZ1KZAM000001', 'NS 001-AA', 'VW Golf', 'DPF', 'Čišćenje filtera', 12000),
+        ('2024-03-07', 'WVWZZZ1KZAM000007', 'NS 007-AA', 'Škoda Octavia, 1.9', 'GUME', 'Zarez, "navodnici"', None),
+    ]
+
+
+def test_jsonl_with_broken_lines(db, tmp_path):
+    path = tmp_path / 'records.jsonl'
+    good = {'datum': '2024-03-01', 'broj_sasije': 'WVWZZZ1KZAM000001', 'registarska_oznaka': 'NS 001-AA',
+            'marka_model': 'VW Golf', 'tip_usluge': 'MEHANIKA', 'cena': 4200}
+    path.write_text('\n'.join([json.dumps(good), '{"datum": ', '', '[1, 2]', json.dumps(good)]) + '\n',
+                    encoding='utf-8')
+    result = bulk_io.import_records(str(path))
+    assert result.inserted == 2
+    assert [line for line, _ in result.errors] == [2, 4]
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'jsonl'])
+def test_export_import_round_trip(db, tmp_path, fmt):
+    database.insert_records(sample_rows(300))
+    exported = _records_without_ids()
+    path = str(tmp_path / f'records.{fmt}')
+    progress = []
+    assert bulk_io.export_records(path, progress=progress.append, progress_every=100) == 300
+    assert progress == [100, 200, 300, 300]
+
+    database.set_db_path(str(tmp_path / 'copy.db'))
+    database.connect(backup=False)
+    result = bulk_io.import_records(path, chunk_size=64)
+    assert (result.inserted, result.errors) == (300, [])
+    assert _records_without_ids() == exported
+
+
+def test_deferred_index_is_rebuilt(db, tmp_path):
+    path = str(tmp_path / 'records.jsonl')
+    database.insert_records(sample_rows(200))
+    bulk_io.export_records(path)
+    before = database.search_records('č/ć 17', column='opis_rada')
+
+    result = bulk_io.import_records(path, defer_index=True)
+    assert result.inserted == 200
+    conn = database.get_connection()
+    # Okidac je vracen, indeks ponovo izgradjen i uvezeni zapisi se pronalaze
+    assert database.repair_search_index(conn) is False
+    found = database.search_records('č/ć 17', column='opis_rada')
+    assert before and [row[6] for row in found] == [row[6] for row in before] * 2
+    conn.execute("INSERT INTO records_fts (records_fts) VALUES ('integrity-check')")
+
+
+def test_interrupted_deferred_import_is_repaired_on_connect(db):
+    database.insert_records(sample_rows(50))
+    # Proces je pao usred uvoza sa search_index_deferred: okidac za upis u indeks ne postoji
+    database.get_connection().execute('DROP TRIGGER records_fts_ai')
+    database.insert_records([('2024-01-01', 'XYZZZZ0QQQ0000001', 'SU 777-QQ', 'Lada Niva', 1, 'Posle pada', 10)])
+    assert database.search_records('ZZZ0QQQ', column=None) == []
+
+    database.connect(backup=False)
+    assert [row[2] for row in database.search_records('ZZZ0QQQ', column=None)] == ['XYZZZZ0QQQ0000001']
@@ -0,0 +1,109 @@
+# tests/test_listing_export.py
+"""Round trips of the streamed listing: the PDF and XLSX writers are hand-rolled, so read them back."""
+import os
+import re
+import csv
+import zipfile
+from datetime import date
+from xml.etree import ElementTree
+
+import pypdf
+import pytest
+
+import database
+import listing_export
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRICKY = 'A&B <tag> "navodnici" (zagrade) \\kosa\\ Čšžćđ ŠĐŽ'
+XLSX = '{' + listing_export.XLSX_NAMESPACE + '}'
+
+
+@pytest.fixture
+def listing(db, monkeypatch):
+    """300 records; every seventh one has TRICKY as its description, every third one no price."""
+    monkeypatch.chdir(ROOT)  # fontovi se traze relativno
+    rows = [(f'2024-01-{index % 28 + 1:02d}', f'WVWZZZ{index:011d}', f'NS {index:03d}-ŠĐ', 'Škoda & <Fiat>',
+             index % 5 + 1, TRICKY if index % 7 == 0 else f'Opis {index} žaba', None if index % 3 == 0 else index * 10)
+            for index in range(300)]
+    database.insert_records(rows)
+    return database.search_records('', column=None)
+
+
+def _to_unicode(font):
+    cmap = font['/ToUnicode'].get_data().decode('ascii')
+    return {int(gid, 16): bytes.fromhex(text).decode('utf-16-be')
+            for block in re.findall(r'beginbfchar(.*?)endbfchar', cmap, re.S)
+            for gid, text in re.findall(r'<([0-9A-F]{4})> <([0-9A-F]+)>', block)}
+
+
+def test_pdf_round_trip(listing, tmp_path):
+    path = str(tmp_path / 'spisak.pdf')
+    listing_export.export_listing(path, column=None, title='Spisak (test) \\ & <sve>')
+    reader = pypdf.PdfReader(path)
+    pages = [page.extract_text() for page in reader.pages]
+
+    assert reader.metadata.title == 'Spisak (test) \\ & <sve>'
+    assert len(pages) > 1
+    for number, text in enumerate(pages, start=1):
+        assert f'Strana {number} od' in text
+    # Ukupan broj strana je u zajednickom XObject-u, koji extract_text ne cita
+    total = reader.pages[0]['/Resources']['/XObject']['/N'].get_object()
+    glyphs = _to_unicode(total['/Resources']['/Font']['/F1'].get_object())
+    hex_text = re.search(rb'<([0-9A-F]+)> Tj', total.get_data()).group(1).decode()
+    assert ''.join(glyphs[int(hex_text[i:i + 4], 16)] for i in range(0, len(hex_text), 4)) == str(len(pages))
+
+    text = '\n'.join(pages)
+    assert 'Broj šasije' in text and 'NS 299-ŠĐ' in text and 'Škoda & <Fiat>' in text
+    assert TRICKY in text
+    assert f'Ukupno zapisa: 300    Zbir cena: {sum(row[7] or 0 for row in listing)}' in text
+
+
+def test_xlsx_round_trip(listing, tmp_path, monkeypatch):
+    monkeypatch.setattr(listing_export, 'XLSX_SHEET_ROWS', 120)
+    path = str(tmp_path / 'spisak.xlsx')
+    listing_export.export_listing(path, column=None)
+
+    with zipfile.ZipFile(path) as archive:
+        # Svaki deo paketa mora biti ispravan XML
+        parts = {name: ElementTree.fromstring(archive.read(name)) for name in archive.namelist()}
+    sheets = sorted(name for name in parts if name.startswith('xl/worksheets/'))
+    assert sheets == ['xl/worksheets/sheet1.xml', 'xl/worksheets/sheet2.xml', 'xl/worksheets/sheet3.xml']
+    assert [sheet.get('name') for sheet in parts['xl/workbook.xml'].iter(XLSX + 'sheet')] == \
+        ['Spisak', 'Spisak 2', 'Spisak 3']
+
+    exported = []
+    for name in sheets:
+        header, *rows = parts[name].iter(XLSX + 'row')
+        assert [cell.findtext(f'{XLSX}is/{XLSX}t') for cell in header] == listing_export.HEADERS
+        for row in rows:
+            cells = list(row)
+            values = [cell.findtext(f'{XLSX}is/{XLSX}t') if cell.get('t') == 'inlineStr' else cell.findtext(XLSX + 'v')
+                      for cell in cells]
+            record_id, serial, *texts, cena = values
+            datum = date.fromordinal(int(serial) + listing_export.EXCEL_EPOCH).isoformat()
+            exported.append((int(record_id), datum, *texts, int(cena) if cena is not None else None))
+    assert exported == listing
+
+
+def test_csv_round_trip(listing, tmp_path):
+    path = str(tmp_path / 'spisak.csv')
+    listing_export.export_listing(path, column=None)
+    with open(path, 'rb') as f:
+        assert f.read(3) == b'\xef\xbb\xbf'  # BOM, da Excel prepozna UTF-8
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        header, *rows = csv.reader(f)
+    assert header == listing_export.HEADERS
+    assert rows == [[str(value) if value is not None else '' for value in row] for row in listing]
+
+
+def test_filters_and_empty_listing(listing, tmp_path):
+    path = str(tmp_path / 'dpf.csv')
+    listing_export.export_listing(path, column=None, start='2024-01-05', end='2024-01-10', tip_usluge='DPF')
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        rows = list(csv.reader(f))[1:]
+    expected = [row for row in listing if '2024-01-05' <= row[1] < '2024-01-10' and row[5] == 'DPF']
+    assert [int(row[0]) for row in rows] == [row[0] for row in expected] and expected
+
+    path = str(tmp_path / 'prazno.pdf')
+    listing_export.export_listing(path, search='NEMA TAKVOG', column=None)
+    assert 'Nema zapisa za izabrane uslove.' in pypdf.PdfReader(path).pages[0].extract_text()
@@ -0,0 +1,121 @@
+# tests/test_migrations.py
+"""Schema migrations: upgrading a pre-user_version database, rollback of a failed step, newer files."""
+import os
+import sqlite3
+
+import pytest
+
+import backup
+import database
+
+# Sema iz prvog izdanja aplikacije, pre PRAGMA user_version
+BASELINE_SCHEMA = '''
+    CREATE TABLE records (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        datum TEXT NOT NULL,
+        broj_sasije TEXT NOT NULL,
+        registarska_oznaka TEXT NOT NULL,
+        marka_model TEXT NOT NULL,
+        tip_usluge_id INTEGER NOT NULL,
+        opis_rada TEXT,
+        cena INTEGER,
+        FOREIGN KEY (tip_usluge_id) REFERENCES tip_usluge(id)
+    );
+    CREATE TABLE tip_usluge (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        naziv TEXT NOT NULL
+    );
+    INSERT INTO tip_usluge (naziv) VALUES ('MEHANIKA'), ('DPF'), ('GUME'), ('DOPUNA KLIME'), ('SERVIS KLIME');
+'''
+BASELINE_ROWS = [
+    ('2023-05-02', 'WVWZZZ1KZAM000001', 'NS 001-AA', 'VW Golf', 2, 'Čišćenje DPF filtera', 12000),
+    ('2023-05-20', 'WVWZZZ1KZAM000001', 'NS 001-AB', 'VW Golf', 1, 'Kočnice', None),
+    ('2023-06-11', 'TMBZZZ1ZZ9M000002', 'BG 123-ŠĐ', 'Škoda Octavia', 1, 'Zamena ulja', 4200),
+]
+
+
+@pytest.fixture
+def baseline_db(tmp_path):
+    path = str(tmp_path / 'app_data.db')
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.executemany('''
+        INSERT INTO records (datum, broj_sasije, registarska_oznaka, marka_model, tip_usluge_id, opis_rada, cena)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', BASELINE_ROWS)
+    conn.commit()
+    conn.close()
+    database.set_db_path(path)
+    try:
+        yield path
+    finally:
+        database.close_connections()
+
+
+def _objects(conn):
+    return {row[0] for row in conn.execute('SELECT name FROM sqlite_master')}
+
+
+def test_baseline_database_is_upgraded(baseline_db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # backup ide u ./backups
+    database.connect()
+    assert database.schema_version() == database.SCHEMA_VERSION
+
+    # Pre migracije se pravi proverena kopija
+    backups = backup.list_backups()
+    assert len(backups) == 1
+    backup.verify_backup(backups[0])
+    copy = sqlite3.connect(backups[0])
+    assert copy.execute('PRAGMA user_version').fetchone()[0] == 0
+    assert copy.execute('SELECT COUNT(*) FROM records').fetchone()[0] == len(BASELINE_ROWS)
+    copy.close()
+
+    conn = database.get_connection()
+    assert {'vehicles', 'monthly_totals', 'records_fts'} <= _objects(conn)
+    assert [row[1:] for row in database.get_all_records()] == [
+        (datum, vin, plate, model, database.tip_usluge_names([tip])[tip], opis, cena)
+        for datum, vin, plate, model, tip, opis, cena in BASELINE_ROWS]
+    # Postojeci zapisi su i u pretraznom indeksu, u tabeli vozila i u mesecnim zbirovima
+    assert [row[0] for row in database.search_records('enje', column='opis_rada')] == [1]
+    assert database.get_vehicle('WVWZZZ1KZAM000001')[2:] == ('NS 001-AB', 'VW Golf')
+    assert database.get_monthly_totals('2023-05-01', '2023-07-01') == [
+        ('2023-05', 'DPF', 1, 12000), ('2023-05', 'MEHANIKA', 1, 0), ('2023-06', 'MEHANIKA', 1, 4200)]
+    assert [naziv for _, naziv in database.get_tip_usluge_list()] == \
+        ['MEHANIKA', 'DPF', 'GUME', 'DOPUNA KLIME', 'SERVIS KLIME']
+
+    # Tekuca baza: samo citanje user_version, bez novog backup-a
+    database.connect()
+    assert len(backup.list_backups()) == 1
+
+
+def test_failed_step_is_rolled_back(baseline_db, monkeypatch):
+    def broken_vehicles(cursor):
+        database.create_vehicles(cursor)
+        raise sqlite3.OperationalError('disk I/O error')
+
+    migrations = [(target, description, broken_vehicles if target == 3 else upgrade)
+                  for target, description, upgrade in database.MIGRATIONS]
+    monkeypatch.setattr(database, 'MIGRATIONS', migrations)
+    with pytest.raises(sqlite3.OperationalError):
+        database.connect(backup=False)
+
+    # Koraci 1 i 2 su ostali, od koraka 3 nema ni traga
+    conn = database.get_connection()
+    assert database.schema_version() == 2
+    assert 'vehicles' not in _objects(conn)
+    assert 'vehicle_id' not in {row[1] for row in conn.execute('PRAGMA table_info(records)')}
+    assert conn.execute('SELECT COUNT(*) FROM records').fetchone()[0] == len(BASELINE_ROWS)
+
+    monkeypatch.undo()
+    database.connect(backup=False)
+    assert database.schema_version() == database.SCHEMA_VERSION
+    assert database.get_vehicle('TMBZZZ1ZZ9M000002') is not None
+
+
+def test_newer_schema_is_refused(db):
+    conn = database.get_connection()
+    conn.execute(f'PRAGMA user_version = {database.SCHEMA_VERSION + 1}')
+    with pytest.raises(database.SchemaError):
+        database.connect(backup=False)
+    assert database.schema_version() == database.SCHEMA_VERSION + 1
+    assert not os.path.exists(os.path.join(os.path.dirname(db), backup.BACKUP_DIR))
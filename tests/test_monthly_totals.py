@@ -0,0 +1,56 @@
+# tests/test_monthly_totals.py
+"""monthly_totals stays equal to a GROUP BY over records through every kind of write."""
+import database
+from conftest import sample_rows
+
+GROUPED = '''
+    SELECT substr(datum, 1, 7), tip_usluge_id, COUNT(*), COUNT(cena), coalesce(SUM(cena), 0)
+    FROM records
+    GROUP BY substr(datum, 1, 7), tip_usluge_id
+    ORDER BY 1, 2
+'''
+
+
+def _totals():
+    return database.get_connection().execute('''
+        SELECT mesec, tip_usluge_id, broj, broj_cena, ukupno FROM monthly_totals WHERE broj > 0 ORDER BY 1, 2
+    ''').fetchall()
+
+
+def _grouped():
+    return database.get_connection().execute(GROUPED).fetchall()
+
+
+def test_triggers_follow_every_write(db):
+    record_ids = database.insert_records(sample_rows(400))
+    assert _totals() == _grouped()
+
+    database.insert_record('2022-02-28', 'WVWZZZ1KZAM999999', 'NS 999-ZZ', 'VW Golf', 3, 'Gume', None)
+    # Promena meseca, tipa i cene jednog zapisa, pa grupne izmene i brisanje
+    database.update_record(record_ids[0], '2024-12-31', 'WVWZZZ1KZAM999999', 'NS 999-ZZ', 'VW Golf', 4, 'Klima', 7000)
+    database.update_records(record_ids[10:60], tip_usluge_id=2)
+    database.update_records(record_ids[40:90], cena=1000)
+    database.delete_records(record_ids[100:250])
+    assert _totals() == _grouped()
+
+    database.rebuild_monthly_totals()
+    assert _totals() == _grouped()
+
+
+def test_reports_match_records(db):
+    database.insert_records(sample_rows(400))
+    conn = database.get_connection()
+    names = database.tip_usluge_names()
+    for start, end in (database.year_range(2022), database.quarter_range(2023, 2), database.month_range(2021, 7),
+                       ('2021-03-15', '2023-11-02')):
+        expected = sorted(
+            (names[tip], broj, ukupno / broj_cena if broj_cena else None, ukupno if broj_cena else None)
+            for tip, broj, broj_cena, ukupno in conn.execute('''
+                SELECT tip_usluge_id, COUNT(*), COUNT(cena), coalesce(SUM(cena), 0)
+                FROM records WHERE datum >= ? AND datum < ? GROUP BY tip_usluge_id
+            ''', (start, end)))
+        assert database.get_report(start, end) == expected
+
+    monthly = database.get_monthly_totals(*database.year_range(2022))
+    assert monthly == sorted((mesec, names[tip], broj, ukupno) for mesec, tip, broj, _, ukupno in _grouped()
+                             if mesec.startswith('2022'))
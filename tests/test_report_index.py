@@ -0,0 +1,23 @@
+# tests/test_report_index.py
+"""The report query must stay answerable from idx_records_datum alone."""
+import database
+
+
+def test_report_uses_covering_datum_index(tmp_path):
+    database.set_db_path(str(tmp_path / 'report.db'))
+    try:
+        database.connect(backup=False)
+        conn = database.get_connection()
+        statements = []
+        database.set_trace_callback(statements.append)
+        try:
+            # Opseg koji nije ceo mesec ide na records, ne na monthly_totals
+            database.get_report('2024-01-02', '2024-03-15')
+        finally:
+            database.set_trace_callback(None)
+        report_sql = [sql for sql in statements if 'FROM records' in sql and 'GROUP BY tip_usluge_id' in sql]
+        assert len(report_sql) == 1
+        plan = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + report_sql[0])]
+        assert any('USING COVERING INDEX idx_records_datum' in step for step in plan), plan
+    finally:
+        database.close_connections()
@@ -0,0 +1,51 @@
+# tests/test_report_pdf.py
+"""Reports over imported records, including records without a price."""
+import os
+
+import pypdf
+
+import database
+import bulk_io
+import reports
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CSV = '''datum,broj_sasije,registarska_oznaka,marka_model,tip_usluge,opis_rada,cena
+2024-03-01,WVWZZZ1KZAM000001,NS 001-AA,VW Golf,DPF,Čišćenje filtera,
+2024-03-02,WVWZZZ1KZAM000002,NS 002-AA,VW Golf,MEHANIKA,Kočnice,12000
+2024-03-03,WVWZZZ1KZAM000003,NS 003-AA,VW Golf,MEHANIKA,Pregled,
+'''
+
+
+def _pdf_text(path):
+    try:
+        return ''.join(page.extract_text() for page in pypdf.PdfReader(path).pages)
+    finally:
+        os.remove(path)
+
+
+def test_report_with_records_without_price(db, tmp_path, monkeypatch):
+    monkeypatch.chdir(ROOT)  # fontovi se traze relativno
+    path = tmp_path / 'records.csv'
+    path.write_text(CSV, encoding='utf-8')
+    result = bulk_io.import_records(str(path))
+    assert (result.inserted, result.errors) == (3, [])
+
+    report = database.get_report('2024-03-01', '2024-04-01')
+    assert report == [('DPF', 1, None, None), ('MEHANIKA', 2, 12000.0, 12000)]
+    text = _pdf_text(reports.build_report_pdf(report, 'Mart 2024'))
+    assert 'DPF' in text and '12000' in text
+
+    # Ni jedan tip nema cenu: grafik bez udela, tabela sa crticama
+    only_unpriced = database.get_report('2024-03-01', '2024-03-02')
+    assert only_unpriced == [('DPF', 1, None, None)]
+    assert 'DPF' in _pdf_text(reports.build_report_pdf(only_unpriced, 'Mart 2024'))
+
+
+def test_work_orders_batch_one_page_each(monkeypatch):
+    monkeypatch.chdir(ROOT)
+    records = [(record_id, '2024-03-01', 'WVWZZZ1KZAM000001', 'NS 001-AA', 'Škoda Octavia', 'DPF',
+                'Čišćenje filtera, žica', 4200) for record_id in range(1, 6)]
+    path = reports.build_work_orders_pdf(records)
+    assert len(pypdf.PdfReader(path).pages) == 5
+    text = _pdf_text(path)
+    assert 'Servis broj: 5' in text and 'Škoda Octavia' in text and 'Čišćenje' in text
@@ -0,0 +1,94 @@
+# tests/test_search.py
+"""Search strategies (b-tree range, FTS5 trigram, LIKE) agree, and keyset paging adds up."""
+import pytest
+
+import database
+from conftest import sample_rows
+
+QUERIES = [
+    ('NS 01', None), ('zzz1k1', 'broj_sasije'), ('Golf', 'marka_model'), ('č/ć 1', 'opis_rada'),
+    ('-AA', 'registarska_oznaka'), ('ulja', None), ('"', None), ('a', None), ('NEMA', None),
+]
+# Redosled kolona u redovima koje vraca search_records
+ROW_COLUMNS = ('id', 'datum', 'broj_sasije', 'registarska_oznaka', 'marka_model', 'tip_usluge', 'opis_rada', 'cena')
+
+
+@pytest.fixture
+def records(db):
+    database.insert_records(sample_rows(600))
+    return database.get_all_records()
+
+
+def _matches(rows, text, column, mode='contains'):
+    columns = [column] if column else database.SEARCH_COLUMNS
+    text = text.lower()
+    test = {'contains': lambda value: text in value, 'prefix': lambda value: value.startswith(text),
+            'exact': lambda value: value == text}[mode]
+    return [row for row in rows if any(test(row[ROW_COLUMNS.index(name)].lower()) for name in columns)]
+
+
+@pytest.mark.parametrize('text, column', QUERIES)
+def test_trigram_index_and_like_scan_agree(records, monkeypatch, text, column):
+    found = database.search_records(text, column=column)
+    assert found == _matches(records, text, column)
+    assert bool(found) == (text not in ('"', 'NEMA'))
+
+    # Isti upit bez FTS tabele ide na LIKE preko kolona
+    monkeypatch.setattr(database, '_has_search_index', lambda conn: False)
+    assert database.search_records(text, column=column) == found
+
+
+@pytest.mark.parametrize('mode', ['prefix', 'exact'])
+@pytest.mark.parametrize('column', database.INDEXED_COLUMNS)
+def test_indexed_prefix_and_exact_lookups(records, mode, column):
+    value = records[17][ROW_COLUMNS.index(column)]
+    text = value[:9].lower() if mode == 'prefix' else value.lower()
+    assert database.search_records(text, column=column, mode=mode) == _matches(records, text, column, mode)
+    where, _ = database._search_filter(database.get_connection(), text, column, mode)
+    assert 'COLLATE NOCASE' in where and 'records_fts' not in where
+
+
+def test_keyset_pages_add_up(records):
+    names = database.tip_usluge_names()
+    filters = {'start': '2022-01-01', 'end': '2023-07-01', 'tip_usluge_id': 2}
+    expected = [row for row in _matches(records, 'NS 0', None)
+                if filters['start'] <= row[1] < filters['end'] and row[5] == names[2]]
+    assert expected
+
+    pages = []
+    after_id = 0
+    while True:
+        page = database.search_records_page('NS 0', after_id=after_id, limit=7, column=None, **filters)
+        assert len(page) <= 7
+        if not page:
+            break
+        pages.append(page)
+        after_id = page[-1][0]
+    assert [row for page in pages for row in page] == expected
+    assert database.count_search_records('NS 0', None, **filters) == len(expected)
+    assert list(database.iter_search_records('NS 0', None, batch_size=5, **filters)) == expected
+
+    assert database.search_records_page('', after_id=0, limit=50, column=None) == records[:50]
+    assert database.count_search_records('', None) == len(records)
+
+
+def test_search_by_ids_and_limit(records):
+    record_ids = [row[0] for row in records[::3]]
+    assert database.search_records_by_ids('Golf', record_ids, column='marka_model') == \
+        [row for row in _matches(records, 'Golf', 'marka_model') if row[0] in set(record_ids)]
+    assert database.search_records('ulja', column=None, limit=25) == records[:25]
+
+
+def test_updates_reach_the_index(records):
+    record_id = records[5][0]
+    database.update_record(record_id, '2024-01-01', 'XYZZZZ0QQQ0000001', 'SU 777-QQ', 'Lada Niva', 1, 'Retko', 10)
+    assert [row[0] for row in database.search_records('ZZZ0QQQ', column=None)] == [record_id]
+    database.delete_records([record_id])
+    assert database.search_records('ZZZ0QQQ', column=None) == []
+
+
+def test_unknown_column_or_mode(db):
+    with pytest.raises(ValueError):
+        database.search_records('x', column='cena')
+    with pytest.raises(ValueError):
+        database.search_records('x', mode='regex')
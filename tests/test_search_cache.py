@@ -0,0 +1,51 @@
+# tests/test_search_cache.py
+"""SearchCache: superset filtering must agree with the database, and writes invalidate it."""
+from search_cache import SearchCache, cacheable
+
+
+def _row(record_id, vin):
+    return (record_id, '2024-01-01', vin, 'NS 001-AA', 'VW Golf', 'DPF', '', 1000)
+
+
+ROWS = [_row(1, 'WVWZZZ1KZAM000001'), _row(2, 'WVWZZZ1KZBM000002'), _row(3, 'TMBJJ7NE0F0000003')]
+
+
+def test_narrower_query_is_filtered_from_cached_superset():
+    cache = SearchCache()
+    cache.put('WVW', ROWS[:2])
+    assert cache.get('wvwzzz1kza') == [ROWS[0]]
+    # Rezultat filtriranja se i sam kesira
+    cache._entries.pop('wvw')
+    assert cache.get('WVWZZZ1KZA') == [ROWS[0]]
+    assert cache.get('TMB') is None
+
+
+def test_queries_the_database_treats_differently_are_not_cached():
+    cache = SearchCache()
+    cache.put('', ROWS)
+    for text in ('WVW_ZZ', '100%', 'Š'):
+        assert not cacheable(text)
+        assert cache.get(text) is None
+
+
+def test_clear_invalidates_entries_and_running_searches():
+    cache = SearchCache()
+    cache.put('WVW', ROWS[:2])
+    # Pretraga je pocela pre upisa...
+    epoch = cache.epoch
+    cache.clear('inserted', [4])
+    assert cache.get('WVW') is None and cache.get('WVWZZZ') is None
+    # ...pa njen rezultat ne sme da se vrati u kes
+    cache.put('WVW', ROWS[:2], epoch)
+    assert cache.get('WVW') is None
+    cache.put('WVW', ROWS[:2], cache.epoch)
+    assert cache.get('WVW') == ROWS[:2]
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SearchCache(size=2)
+    cache.put('AAA', [ROWS[0]])
+    cache.put('BBB', [ROWS[1]])
+    cache.get('AAA')
+    cache.put('CCC', [ROWS[2]])
+    assert cache.get('BBB') is None and cache.get('AAA') == [ROWS[0]]
@@ -0,0 +1,96 @@
+# tests/test_server.py
+"""Server requests through ApiServer.dispatch: token check, ETag revalidation, writes and errors."""
+import json
+import asyncio
+
+import server
+import database
+from conftest import sample_rows
+
+TOKEN = 'tajna'
+RECORD = {'datum': '2024-03-01', 'broj_sasije': 'WVWZZZ1KZAM999999', 'registarska_oznaka': 'NS 999-ŠĐ',
+          'marka_model': 'VW Golf', 'tip_usluge_id': 2, 'opis_rada': 'Čišćenje', 'cena': 12000}
+
+
+def _run(scenario, token=TOKEN):
+    """Run scenario(request, api) against a started ApiServer; request(method, target, body=None, headers=None)."""
+    async def main():
+        api = server.ApiServer(readers=2, backups=False, token=token)
+        listener = await api.start('127.0.0.1', 0)
+
+        async def request(method, target, body=None, headers=None):
+            headers = dict({server.TOKEN_HEADER.lower(): TOKEN}, **(headers or {}))
+            payload = json.dumps(body).encode('utf-8') if body is not None else b''
+            status, response_headers, data = await api.dispatch(method, target, headers, payload)
+            is_json = response_headers.get('Content-Type', '').startswith('application/json')
+            return status, response_headers, json.loads(data) if is_json else data
+
+        try:
+            await scenario(request, api)
+        finally:
+            listener.close()
+            await listener.wait_closed()
+            database.remove_change_listener(api._on_change)
+            api.read_pool.shutdown()
+            api.write_pool.shutdown()
+    asyncio.run(main())
+
+
+def test_token_is_required(db):
+    async def scenario(request, api):
+        for headers in ({server.TOKEN_HEADER.lower(): ''}, {server.TOKEN_HEADER.lower(): 'tajnA'}):
+            status, _, body = await request('GET', '/health', headers=headers)
+            assert status == 401 and server.TOKEN_HEADER in body['error']
+        status, _, _ = await request('POST', '/records', RECORD, headers={server.TOKEN_HEADER.lower(): 'x'})
+        assert status == 401
+        status, _, body = await request('GET', '/health')
+        assert (status, body) == (200, {'schema_version': database.SCHEMA_VERSION})
+        assert database.count_search_records('', None) == 0
+    _run(scenario)
+
+
+def test_etag_until_the_data_changes(db):
+    database.insert_records(sample_rows(50))
+
+    async def scenario(request, api):
+        target = '/records/search?q=NS%2000&column='
+        status, headers, first = await request('GET', target)
+        etag = headers['ETag']
+        assert status == 200 and len(first) == len(database.search_records('NS 00', column=None))
+
+        status, headers, body = await request('GET', target, headers={'if-none-match': etag})
+        assert (status, headers['ETag'], body) == (304, etag, b'')
+        assert api.stats['cache_hits'] == 1
+
+        status, _, created = await request('POST', '/records', dict(RECORD, registarska_oznaka='NS 000-QQ'))
+        assert status == 201
+        status, headers, body = await request('GET', target, headers={'if-none-match': etag})
+        assert status == 200 and headers['ETag'] != etag
+        assert [row[0] for row in body] == [row[0] for row in first] + [created['id']]
+
+        status, _, changes = await request('GET', '/changes?since=0')
+        assert changes['changes'] == [[1, 'inserted', [created['id']]]]
+    _run(scenario)
+
+
+def test_writes_and_errors(db):
+    async def scenario(request, api):
+        status, _, created = await request('POST', '/records/batch', [RECORD, dict(RECORD, cena=None)])
+        assert status == 201 and len(created['ids']) == 2
+        record_id = created['ids'][0]
+
+        status, _, _ = await request('PUT', f'/records/{record_id}', dict(RECORD, opis_rada='Izmenjeno'))
+        assert status == 200
+        status, _, record = await request('GET', f'/records/{record_id}')
+        assert record[6] == 'Izmenjeno'
+
+        status, _, body = await request('POST', '/records', {'datum': '2024-03-01'})
+        assert status == 400 and 'broj_sasije' in body['error']
+        assert (await request('GET', '/records/999999'))[0] == 404
+        assert (await request('GET', '/nema'))[0] == 404
+        assert (await request('GET', '/records?limit=mnogo'))[0] == 400
+
+        status, _, body = await request('POST', '/records/delete', {'ids': created['ids']})
+        assert (status, body) == (200, {'deleted': 2})
+        assert database.count_search_records('', None) == 0
+    _run(scenario, token=None)
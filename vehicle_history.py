@@ -0,0 +1,35 @@
+# vehicle_history.py
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QTableWidget, QTableWidgetItem, QHeaderView
+from PyQt5.QtGui import QIcon
+from records_model import HEADERS
+
+# Kolone servisa koje se prikazuju (vozilo je isto u svakom redu)
+HISTORY_FIELDS = [0, 1, 5, 6, 7]
+
+
+class VehicleHistory(QWidget):
+    """Service timeline, total spend and last service date of one vehicle."""
+
+    def __init__(self, history):
+        super().__init__()
+        vehicle = history['vehicle']
+        self.setWindowTitle(f'Istorija vozila {vehicle[1]}')
+        self.setWindowIcon(QIcon('./tb.ico'))
+        self.setMinimumSize(600, 400)
+
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel(
+            f"Broj šasije: {vehicle[1]}    Registarska oznaka: {vehicle[2]}    Marka/Model: {vehicle[3]}"))
+        layout.addWidget(QLabel(
+            f"Servisa: {len(history['services'])}    Ukupno: {history['total_spend']}    "
+            f"Poslednji servis: {history['last_service'] or '-'}"))
+
+        table = QTableWidget(len(history['services']), len(HISTORY_FIELDS))
+        table.setHorizontalHeaderLabels([HEADERS[field] for field in HISTORY_FIELDS])
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        table.horizontalHeader().setSectionResizeMode(HISTORY_FIELDS.index(6), QHeaderView.Stretch)
+        for row, service in enumerate(history['services']):
+            for column, field in enumerate(HISTORY_FIELDS):
+                table.setItem(row, column, QTableWidgetItem(str(service[field])))
+        layout.addWidget(table)
+        self.setLayout(layout)
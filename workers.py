@@ -0,0 +1,149 @@
+# workers.py
+import threading
+import traceback
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+import database
+
+# Broj PDF poslova koji mogu da rade istovremeno
+REPORT_WORKERS = 2
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when cancel() was requested."""
+
+
+class JobSignals(QObject):
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(str)   # path to the generated file
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+
+class PdfJob(QRunnable):
+    """Run a PDF builder function on a worker thread.
+
+    The builder is called as func(*args, progress=callback) and must return
+    the path of the written file. The progress callback emits the progress
+    signal and raises JobCancelled once cancel() has been called, so the
+    builder stops at its next step.
+    """
+
+    def __init__(self, func, *args):
+        super().__init__()
+        self.func = func
+        self.args = args
+        self.signals = JobSignals()
+        self._cancel_event = threading.Event()
+        self.setAutoDelete(False)
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def report_progress(self, value):
+        if self.is_cancelled():
+            raise JobCancelled()
+        self.signals.progress.emit(value)
+
+    def run(self):
+        try:
+            self.report_progress(0)
+            path = self.func(*self.args, progress=self.report_progress)
+        except JobCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            traceback.print_exc()
+            self.signals.failed.emit(str(e))
+        else:
+            if self.is_cancelled():
+                self.signals.cancelled.emit()
+            else:
+                self.signals.finished.emit(path)
+
+
+class JobQueue(QObject):
+    """Thread pool for PDF jobs; keeps track of running jobs so they can be cancelled."""
+
+    active_changed = pyqtSignal(int)
+
+    def __init__(self, parent=None, max_workers=REPORT_WORKERS):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_workers)
+        self.jobs = []
+
+    def submit(self, func, *args, on_finished=None, on_failed=None, on_progress=None):
+        job = PdfJob(func, *args)
+        if on_finished is not None:
+            job.signals.finished.connect(on_finished)
+        if on_failed is not None:
+            job.signals.failed.connect(on_failed)
+        if on_progress is not None:
+            job.signals.progress.connect(on_progress)
+        for signal in (job.signals.finished, job.signals.failed, job.signals.cancelled):
+            signal.connect(lambda *_, job=job: self._job_done(job))
+        self.jobs.append(job)
+        self.active_changed.emit(len(self.jobs))
+        self.pool.start(job)
+        return job
+
+    def cancel_all(self):
+        for job in self.jobs:
+            job.cancel()
+
+    def wait(self, msecs=-1):
+        return self.pool.waitForDone(msecs)
+
+    def _job_done(self, job):
+        if job in self.jobs:
+            self.jobs.remove(job)
+        self.active_changed.emit(len(self.jobs))
+
+
+class SearchSignals(QObject):
+    finished = pyqtSignal(int, str, object)   # generation, text, rows (None if over the limit)
+    failed = pyqtSignal(int, str)
+
+
+class SearchJob(QRunnable):
+    """Run search_records for the live search box on a worker thread.
+
+    Every job carries the generation number of the keystroke that started
+    it; the window ignores results from older generations. cancel()
+    interrupts the SQLite statement if it is still running. Any error
+    (SQLite, or the network in client mode) is reported through failed:
+    an exception escaping run() would abort the whole application.
+    """
+
+    def __init__(self, generation, text, limit):
+        super().__init__()
+        self.generation = generation
+        self.text = text
+        self.limit = limit
+        self.signals = SearchSignals()
+        self._conn = None
+        self._cancelled = False
+        self.setAutoDelete(False)
+
+    def cancel(self):
+        self._cancelled = True
+        if self._conn is not None:
+            self._conn.interrupt()
+
+    def run(self):
+        if self._cancelled:
+            return
+        try:
+            if not database.SERVER_URL:
+                self._conn = database.get_connection()
+            rows = database.search_records(self.text, limit=self.limit + 1)
+        except Exception as e:
+            if not self._cancelled:
+                self.signals.failed.emit(self.generation, str(e))
+            return
+        finally:
+            self._conn = None
+        if not self._cancelled:
+            self.signals.finished.emit(self.generation, self.text, rows if len(rows) <= self.limit else None)